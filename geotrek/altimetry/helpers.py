@@ -1,4 +1,8 @@
+from array import array
 import logging
+import math
+import struct
+import sys
 
 from django.contrib.gis.geos import GEOSGeometry
 from django.utils import translation
@@ -21,36 +25,54 @@ class AltimetryHelper(object):
 
         :precision:  geometry sampling in meters
         """
-        precision = precision or settings.ALTIMETRIC_PROFILE_PRECISION
-
-        if geometry3d.geom_type == 'Point':
-            return [[0, geometry3d.x, geometry3d.y, geometry3d.z]]
-
-        if geometry3d.geom_type == 'MultiLineString':
-            profile = []
-            for subcoords in geometry3d.coords:
-                subline = LineString(subcoords, srid=geometry3d.srid)
-                offset += subline.length
-                subprofile = AltimetryHelper.elevation_profile(subline, precision, offset)
-                profile.extend(subprofile)
-            return profile
-
-        # Add measure to 2D version of geometry3d
-        # Get distance from origin for each vertex
-        sql = """
-        WITH line2d AS (SELECT ST_Force2D('%(ewkt)s'::geometry) AS geom),
-             line_measure AS (SELECT ST_Addmeasure(geom, 0, ST_length(geom)) AS geom FROM line2d),
-             points2dm AS (SELECT (ST_DumpPoints(geom)).geom AS point FROM line_measure)
-        SELECT (%(offset)s + ST_M(point)) FROM points2dm;
-        """ % {'offset': offset, 'ewkt': geometry3d.ewkt}
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        pointsm = cursor.fetchall()
-        # Join (offset+distance, x, y, z) together
-        geom3dapi = geometry3d.transform(settings.API_SRID, clone=True)
-        assert len(pointsm) == len(geom3dapi.coords), 'Cannot map distance to xyz'
-        dxyz = [pointsm[i] + v for i, v in enumerate(geom3dapi.coords)]
-        return dxyz
+        return cls.elevation_profiles([geometry3d], offset=offset)[0]
+
+    @classmethod
+    def elevation_profiles(cls, geometries3d, offset=0):
+        """Extract elevation profiles of many 3D geometries at once.
+
+        Distances are computed from the geometries coordinates (no database round-trip),
+        and coordinates of all geometries are transformed to API_SRID in a single transformation.
+        Returns a list of profiles, made of [distance, x, y, z] steps.
+        """
+        profiles = [None] * len(geometries3d)
+        # Vertices and distances of linear geometries, by SRID
+        lines = {}
+        for i, geometry3d in enumerate(geometries3d):
+            if geometry3d.geom_type == 'Point':
+                profiles[i] = [[0, geometry3d.x, geometry3d.y, geometry3d.z]]
+                continue
+            if geometry3d.geom_type == 'MultiLineString':
+                parts = geometry3d.coords
+            else:
+                parts = [geometry3d.coords]
+            distances = []
+            part_offset = offset
+            for coords in parts:
+                if geometry3d.geom_type == 'MultiLineString':
+                    # Sub-lines distances start after their own length (as in previous versions)
+                    part_offset += LineString(coords).length
+                distances.extend(cls._cumulated_distances(coords, part_offset))
+            indices, vertices, all_distances = lines.setdefault(geometry3d.srid, ([], [], []))
+            indices.append((i, len(vertices), len(distances)))
+            vertices.extend(coord for coords in parts for coord in coords)
+            all_distances.extend(distances)
+
+        for srid, (indices, vertices, distances) in lines.items():
+            geom3dapi = LineString(vertices, srid=srid).transform(settings.API_SRID, clone=True)
+            coords = geom3dapi.coords
+            for i, start, count in indices:
+                profiles[i] = [(distances[j],) + coords[j] for j in range(start, start + count)]
+        return profiles
+
+    @classmethod
+    def _cumulated_distances(cls, coords, offset=0):
+        """Distance from origin of each vertex, in the geometry SRID (2D).
+        """
+        distances = [offset]
+        for (x1, y1, *z1), (x2, y2, *z2) in zip(coords, coords[1:]):
+            distances.append(distances[-1] + math.hypot(x2 - x1, y2 - y1))
+        return distances
 
     @classmethod
     def altimetry_limits(cls, profile):
@@ -127,87 +149,99 @@ class AltimetryHelper(object):
         return (xmin, ymin, xmax, ymax)
 
     @classmethod
-    def elevation_area(cls, geom):
-        xmin, ymin, xmax, ymax = cls._nice_extent(geom)
-        width = xmax - xmin
-        height = ymax - ymin
+    def dem_version(cls):
+        """Identifier of the loaded DEM, which changes when it is replaced.
+        Returns None if no DEM is present.
+        """
+        cursor = connection.cursor()
+        cursor.execute("SELECT oid, relfilenode FROM pg_class WHERE oid = to_regclass('mnt')")
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return '%s-%s' % row
+
+    @classmethod
+    def _area_step(cls, width, height, max_resolution):
         precision = settings.ALTIMETRIC_PROFILE_PRECISION
-        max_resolution = settings.ALTIMETRIC_AREA_MAX_RESOLUTION
         if width / precision > max_resolution:
             precision = int(width / max_resolution)
         if height / precision > 10000:
             precision = int(width / max_resolution)
         if height < precision or width < precision:
             precision = min([height, width])
-        cursor = connection.cursor()
-        cursor.execute("SELECT 1 FROM information_schema.tables WHERE table_name='mnt'")
-        if cursor.rowcount == 0:
-            logger.warning("No DEM present")
-            return {}
+        return precision
 
+    @classmethod
+    def _dem_block(cls, xmin, ymin, xmax, ymax, precision):
+        """Read the DEM pixels covering the extent at once, decimated to the
+        sampling precision if the DEM is more precise.
+        """
         sql = """
-            -- Author: Celian Garcia
-            WITH columns AS (
-                    SELECT generate_series({xmin}::int, {xmax}::int, {precision}) AS x
+            WITH extent AS (
+                    SELECT ST_MakeEnvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, %(srid)s) AS geom
                 ),
-                lines AS (
-                    SELECT generate_series({ymin}::int, {ymax}::int, {precision}) AS y
+                block AS (
+                    SELECT ST_Union(ST_Clip(mnt.rast, ST_Expand(extent.geom, 2 * GREATEST(%(precision)s, ABS(ST_ScaleX(mnt.rast)))))) AS rast
+                    FROM mnt, extent
+                    WHERE ST_Intersects(mnt.rast, ST_Expand(extent.geom, 2 * GREATEST(%(precision)s, ABS(ST_ScaleX(mnt.rast)))))
                 ),
-                resolution AS (
-                    SELECT x, y
-                    FROM (SELECT COUNT(x) AS x FROM columns) AS col,
-                         (SELECT COUNT(y) AS y FROM lines)   AS lin
-                ),
-                points2d AS (
-                    SELECT row_number() OVER () AS id,
-                           ST_SetSRID(ST_MakePoint(x, y), {srid}) AS geom,
-                           ST_Transform(ST_SetSRID(ST_MakePoint(x, y), {srid}), 4326) AS geomll
-                    FROM lines, columns
-                ),
-                draped AS (
-                    SELECT id, ST_Value(mnt.rast, p.geom)::int AS altitude
-                    FROM mnt, points2d AS p
-                    WHERE ST_Intersects(mnt.rast, p.geom)
-                ),
-                all_draped AS (
-                    SELECT geomll, geom, altitude
-                    FROM points2d LEFT JOIN draped ON (points2d.id = draped.id)
-                    ORDER BY points2d.id
-                ),
-                extent_latlng AS (
-                    SELECT ST_Envelope(ST_Union(geom)) AS extent,
-                           MIN(altitude) AS min_z,
-                           MAX(altitude) AS max_z,
-                           AVG(altitude) AS center_z
-                    FROM all_draped
+                decimated AS (
+                    SELECT CASE WHEN ABS(ST_ScaleX(rast)) < %(precision)s
+                                THEN ST_Rescale(rast, %(precision)s, -%(precision)s, 'NearestNeighbour')
+                                ELSE rast END AS rast
+                    FROM block
                 )
-            SELECT extent,
-                   ST_transform(extent, 4326),
-                   center_z,
-                   min_z,
-                   max_z,
-                   resolution.x AS resolution_w,
-                   resolution.y AS resolution_h,
-                   altitude
-            FROM extent_latlng, resolution, all_draped;
-        """.format(xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax,
-                   srid=settings.SRID, precision=precision)
-        cursor.execute(sql)
-        result = cursor.fetchall()
-        first = result[0]
-        envelop_native, envelop, center_z, min_z, max_z, resolution_w, resolution_h, a = first
+            SELECT ST_UpperLeftX(rast), ST_UpperLeftY(rast), ST_ScaleX(rast), ST_ScaleY(rast),
+                   ST_DumpValues(rast, 1),
+                   extent.geom,
+                   ST_Transform(extent.geom, 4326)
+            FROM decimated, extent;
+        """
+        cursor = connection.cursor()
+        cursor.execute(sql, {'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax,
+                             'srid': settings.SRID, 'precision': precision})
+        return cursor.fetchone()
+
+    @classmethod
+    def elevation_area(cls, geom, max_resolution=None):
+        """Altitudes of a regular grid of points around the geometry.
+
+        The DEM is read by blocks (one query), and sampled in place of the
+        points of the grid.
+
+        :max_resolution: maximum number of points by width/height
+        """
+        xmin, ymin, xmax, ymax = cls._nice_extent(geom)
+        max_resolution = max_resolution or settings.ALTIMETRIC_AREA_MAX_RESOLUTION
+        precision = cls._area_step(xmax - xmin, ymax - ymin, max_resolution)
+        if cls.dem_version() is None:
+            logger.warning("No DEM present")
+            return {}
+
+        xs = range(xmin, xmax + 1, int(precision))
+        ys = range(ymin, ymax + 1, int(precision))
+        ulx, uly, scalex, scaley, values, envelop_native, envelop = cls._dem_block(xs[0], ys[0], xs[-1], ys[-1], precision)
         envelop = GEOSGeometry(envelop, srid=4326)
         envelop_native = GEOSGeometry(envelop_native, srid=settings.SRID)
 
-        altitudes = []
-        row = []
-        for i, record in enumerate(result):
-            if i > 0 and i % resolution_w == 0:
-                altitudes.append(row)
-                row = []
-            elevation = (record[7] or 0.0) - min_z
-            row.append(elevation)
-        altitudes.append(row)
+        # Same pixel as ST_Value() for each point
+        grid = []
+        values = values or []
+        columns = [math.floor((x - ulx) / scalex) if values else -1 for x in xs]
+        for y in ys:
+            i = math.floor((y - uly) / scaley) if values else -1
+            row = values[i] if 0 <= i < len(values) else []
+            grid.append([row[j] if 0 <= j < len(row) else None for j in columns])
+
+        existing = [cls._round(value) for row in grid for value in row if value is not None]
+        if not existing:
+            logger.warning("No DEM values in area")
+            return {}
+        min_z = min(existing)
+        max_z = max(existing)
+        center_z = sum(existing) / len(existing)
+        altitudes = [[(cls._round(value) if value is not None else 0.0) - min_z for value in row]
+                     for row in grid]
 
         area = {
             'center': {
@@ -218,8 +252,8 @@ class AltimetryHelper(object):
                 'z': int(center_z)
             },
             'resolution': {
-                'x': resolution_w,
-                'y': resolution_h,
+                'x': len(xs),
+                'y': len(ys),
                 'step': precision
             },
             'size': {
@@ -253,3 +287,23 @@ class AltimetryHelper(object):
             'altitudes': altitudes
         }
         return area
+
+    @classmethod
+    def _round(cls, value):
+        """Round half away from zero, as PostgreSQL cast to integer"""
+        return int(math.copysign(math.floor(abs(value) + 0.5), value))
+
+    @classmethod
+    def elevation_area_binary(cls, area):
+        """Altitudes of an elevation area as a compact binary grid: width and
+        height (unsigned 16 bits integers), followed by altitudes relative to
+        the minimum altitude (signed 16 bits integers), row by row from south
+        to north, all little-endian.
+        """
+        if not area:
+            return b''
+        header = struct.pack('<HH', area['resolution']['x'], area['resolution']['y'])
+        grid = array('h', (int(value) for row in area['altitudes'] for value in row))
+        if sys.byteorder == 'big':
+            grid.byteswap()
+        return header + grid.tobytes()
@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from geotrek.altimetry.helpers import AltimetryHelper
+
+
+class Command(BaseCommand):
+    help = """Compare time of DEM area extraction, sampling the DEM point by point (ST_Value)
+    or reading DEM blocks at once (current implementation)."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('geom', nargs='?',
+                            help="WKT of the area geometry, in SRID setting (default: center of DEM)")
+        parser.add_argument('--resolution', type=int, default=settings.ALTIMETRIC_AREA_MAX_RESOLUTION,
+                            help="Maximum number of points by width/height")
+        parser.add_argument('--repeat', type=int, default=3, help="Number of runs (default: 3)")
+
+    def default_geom(self):
+        cursor = connection.cursor()
+        cursor.execute("SELECT ST_Centroid(ST_Extent(ST_Envelope(rast))) FROM mnt")
+        center = GEOSGeometry(cursor.fetchone()[0], srid=settings.SRID)
+        return center.buffer(5000).envelope.boundary
+
+    def point_by_point(self, geom, max_resolution):
+        xmin, ymin, xmax, ymax = AltimetryHelper._nice_extent(geom)
+        precision = AltimetryHelper._area_step(xmax - xmin, ymax - ymin, max_resolution)
+        sql = """
+            WITH points2d AS (
+                    SELECT row_number() OVER () AS id, ST_SetSRID(ST_MakePoint(x, y), %(srid)s) AS geom
+                    FROM generate_series(%(ymin)s, %(ymax)s, %(precision)s) AS y,
+                         generate_series(%(xmin)s, %(xmax)s, %(precision)s) AS x
+                ),
+                draped AS (
+                    SELECT id, ST_Value(mnt.rast, p.geom)::int AS altitude
+                    FROM mnt, points2d AS p
+                    WHERE ST_Intersects(mnt.rast, p.geom)
+                )
+            SELECT altitude FROM points2d LEFT JOIN draped ON (points2d.id = draped.id) ORDER BY points2d.id;
+        """
+        cursor = connection.cursor()
+        cursor.execute(sql, {'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax,
+                             'srid': settings.SRID, 'precision': int(precision)})
+        return len(cursor.fetchall())
+
+    def block(self, geom, max_resolution):
+        area = AltimetryHelper.elevation_area(geom, max_resolution)
+        return area['resolution']['x'] * area['resolution']['y']
+
+    def handle(self, *args, **options):
+        if AltimetryHelper.dem_version() is None:
+            raise CommandError("No DEM present")
+        if options['geom']:
+            geom = GEOSGeometry(options['geom'], srid=settings.SRID)
+        else:
+            geom = self.default_geom()
+
+        for name, func in (("point by point", self.point_by_point), ("by blocks", self.block)):
+            durations = []
+            for i in range(options['repeat']):
+                start = time.perf_counter()
+                count = func(geom, options['resolution'])
+                durations.append(time.perf_counter() - start)
+            self.stdout.write("{}: {} points, best of {} runs: {:.3f} s".format(
+                name, count, options['repeat'], min(durations)))
@@ -0,0 +1,86 @@
+from io import StringIO
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+
+class Command(BaseCommand):
+    help = """Compare time of DEM loading, and of elevation queries (ST_Value and ft_drape_line)
+    on loaded DEM, for several tile sizes.
+    Each DEM is loaded in a transaction which is rolled back: existing DEM is kept, but locked during benchmark."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('dem_path')
+        parser.add_argument('--tile-sizes', default='50,100,200,500',
+                            help="Comma separated tile sizes in pixels (default: 50,100,200,500)")
+        parser.add_argument('--overviews', help="Overview levels to create (see loaddem)")
+        parser.add_argument('--out-db', action='store_true', default=False,
+                            help="Register DEM as out-of-database raster (see loaddem)")
+        parser.add_argument('--samples', type=int, default=1000,
+                            help="Number of random points and lines to drape (default: 1000)")
+
+    def st_value(self, cursor, samples):
+        sql = """
+            WITH extent AS (SELECT ST_Extent(ST_Envelope(rast)) AS box FROM mnt),
+                 points AS (
+                    SELECT ST_SetSRID(ST_MakePoint(ST_XMin(box) + random() * (ST_XMax(box) - ST_XMin(box)),
+                                                   ST_YMin(box) + random() * (ST_YMax(box) - ST_YMin(box))),
+                                      %(srid)s) AS geom
+                    FROM extent, generate_series(1, %(samples)s)
+                 )
+            SELECT count(ST_Value(mnt.rast, p.geom)) FROM mnt, points AS p WHERE ST_Intersects(mnt.rast, p.geom);
+        """
+        cursor.execute("SELECT setseed(0.5)")
+        cursor.execute(sql, {'srid': settings.SRID, 'samples': samples})
+        return cursor.fetchone()[0]
+
+    def drape_line(self, cursor, samples):
+        # Random lines of about 1 km, inside DEM extent
+        sql = """
+            WITH extent AS (SELECT ST_Extent(ST_Envelope(rast)) AS box FROM mnt),
+                 starts AS (
+                    SELECT ST_XMin(box) + 1000 + random() * (ST_XMax(box) - ST_XMin(box) - 2000) AS x,
+                           ST_YMin(box) + 1000 + random() * (ST_YMax(box) - ST_YMin(box) - 2000) AS y,
+                           random() * 2 * pi() AS angle
+                    FROM extent, generate_series(1, %(samples)s)
+                 ),
+                 lines AS (
+                    SELECT ST_SetSRID(ST_MakeLine(ST_MakePoint(x, y),
+                                                  ST_MakePoint(x + 1000 * cos(angle), y + 1000 * sin(angle))),
+                                      %(srid)s) AS geom
+                    FROM starts
+                 )
+            SELECT count(*) FROM lines, ft_drape_line(lines.geom, %(step)s);
+        """
+        cursor.execute("SELECT setseed(0.5)")
+        cursor.execute(sql, {'srid': settings.SRID, 'samples': samples,
+                             'step': settings.ALTIMETRIC_PROFILE_PRECISION})
+        return cursor.fetchone()[0]
+
+    def handle(self, *args, **options):
+        args = ['--replace']
+        if options['overviews'] is not None:
+            args += ['--overviews', options['overviews']]
+        if options['out_db']:
+            args.append('--out-db')
+
+        for tile_size in options['tile_sizes'].split(','):
+            with transaction.atomic():
+                start = time.perf_counter()
+                call_command('loaddem', options['dem_path'], '--tile-size', tile_size, *args,
+                             verbosity=0, stdout=StringIO())
+                load_duration = time.perf_counter() - start
+
+                cursor = connection.cursor()
+                durations = []
+                for name, func in (("ST_Value", self.st_value), ("ft_drape_line", self.drape_line)):
+                    start = time.perf_counter()
+                    count = func(cursor, options['samples'])
+                    durations.append("{}: {} points in {:.3f} s".format(name, count, time.perf_counter() - start))
+                transaction.set_rollback(True)
+
+            self.stdout.write("tile size {}: loaded in {:.3f} s, {}".format(
+                tile_size, load_duration, ", ".join(durations)))
@@ -1,13 +1,55 @@
 from django.contrib.gis.gdal.error import GDALException
 from django.core.management.base import BaseCommand, CommandError
-from django.db import connection
+from django.db import connection, transaction
 from django.conf import settings
 from django.contrib.gis.gdal import GDALRaster
+from math import ceil
 import os.path
+import re
 from subprocess import call, PIPE
 import tempfile
 
 
+class CopyReader(object):
+    """
+    File-like object giving to COPY the data lines of a raster2pgsql dump,
+    until the end of data marker. Every line is a tile.
+    """
+    def __init__(self, sqlfile, progress):
+        self.sqlfile = sqlfile
+        self.progress = progress
+        self.done = False
+
+    def read(self, size=-1):
+        if self.done:
+            return b''
+        line = self.sqlfile.readline()
+        if not line or line.rstrip(b'\r\n') == b'\\.':
+            self.done = True
+            return b''
+        self.progress.step()
+        return line
+
+
+class Progress(object):
+    """
+    Report loaded tiles every 10% of expected tiles.
+    """
+    def __init__(self, stdout, expected, verbose):
+        self.stdout = stdout
+        self.expected = max(expected, 1)
+        self.verbose = verbose
+        self.count = 0
+        self.reported = 0
+
+    def step(self):
+        self.count += 1
+        percent = min(100, self.count * 100 // self.expected)
+        if self.verbose and percent >= self.reported + 10:
+            self.reported = percent - percent % 10
+            self.stdout.write('{} tiles loaded ({}%)\n'.format(self.count, self.reported))
+
+
 class Command(BaseCommand):
     help = 'Load DEM data (projecting and clipping it if necessary).\n'
     help += 'You may need to create a GDAL Virtual Raster if your DEM is '
@@ -17,6 +59,61 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('dem_path')
         parser.add_argument('--replace', action='store_true', default=False, help='Replace existing DEM if any.')
+        parser.add_argument('--tile-size', default='100x100',
+                            help='Size of tiles in pixels, as WIDTHxHEIGHT or SIZE (default: 100x100).')
+        parser.add_argument('--overviews', default=','.join(str(level) for level in settings.ALTIMETRIC_DEM_OVERVIEWS),
+                            help='Overview levels to create, as comma separated factors (e.g. 2,4,8), '
+                                 'or empty for none (default: ALTIMETRIC_DEM_OVERVIEWS setting).')
+        parser.add_argument('--out-db', action='store_true', default=False,
+                            help='Register DEM file as out-of-database raster instead of copying its pixels.')
+
+    def tile_size(self, value):
+        match = re.match(r'^(\d+)(?:x(\d+))?$', value)
+        if not match or not int(match.group(1)) or (match.group(2) and not int(match.group(2))):
+            raise CommandError('Tile size should be WIDTHxHEIGHT or SIZE in pixels, not: %s' % value)
+        width = int(match.group(1))
+        height = int(match.group(2) or width)
+        return width, height
+
+    def overview_levels(self, value):
+        try:
+            levels = [int(level) for level in value.split(',') if level.strip()]
+        except ValueError:
+            raise CommandError('Overview levels should be comma separated integers, not: %s' % value)
+        if any(level < 2 for level in levels):
+            raise CommandError('Overview levels should be greater than 1')
+        return sorted(set(levels))
+
+    def tiles_count(self, rst, tile_width, tile_height, levels):
+        count = 0
+        for level in [1] + levels:
+            width, height = ceil(rst.width / level), ceil(rst.height / level)
+            count += ceil(width / tile_width) * ceil(height / tile_height)
+        return count
+
+    def drop_dem(self, cur):
+        cur.execute('SELECT o_table_name FROM raster_overviews WHERE r_table_name = \'mnt\'')
+        for overview, in cur.fetchall():
+            cur.execute('DROP TABLE IF EXISTS %s' % connection.ops.quote_name(overview))
+        cur.execute('DROP TABLE mnt')
+
+    def load_sql(self, sqlfile, progress, replace):
+        """
+        Run SQL dump of raster2pgsql in one transaction, streaming tiles with COPY.
+        """
+        with transaction.atomic():
+            cur = connection.cursor()
+            if replace:
+                self.drop_dem(cur)
+            for sql_line in sqlfile:
+                statement = sql_line.strip()
+                if not statement or statement in (b'BEGIN;', b'END;', b'COMMIT;'):
+                    continue  # Transaction is ours
+                if statement.startswith(b'COPY '):
+                    cur.copy_expert(statement.decode(), CopyReader(sqlfile, progress))
+                else:
+                    cur.execute(statement)
+            cur.close()
 
     def handle(self, *args, **options):
         verbose = options['verbosity'] != 0
@@ -34,6 +131,8 @@ class Command(BaseCommand):
             self.stdout.write('-- Checking input DEM ------------------\n')
         # Obtain DEM path
         dem_path = options['dem_path']
+        tile_width, tile_height = self.tile_size(options['tile_size'])
+        levels = self.overview_levels(options['overviews'])
 
         # Open GDAL dataset
         if not os.path.exists(dem_path):
@@ -48,6 +147,8 @@ class Command(BaseCommand):
             raise CommandError('DEM coordinate system is unknown.')
         # Obtain dataset SRS
         if settings.SRID != rst.srs.srid:
+            if options['out_db']:
+                raise CommandError('Out-of-database DEM should already be projected in SRID %d.' % settings.SRID)
             rst = rst.transform(settings.SRID)
         cur = connection.cursor()
         sql = 'SELECT * FROM raster_columns WHERE r_table_name = \'mnt\''
@@ -59,21 +160,19 @@ class Command(BaseCommand):
         replace = options['replace']
 
         # What to do with existing DEM (if any)
-        if dem_exists and replace:
-            # Drop table
-            cur = connection.cursor()
-            sql = 'DROP TABLE mnt'
-            cur.execute(sql)
-            cur.close()
-        elif dem_exists and not replace:
+        # Existing DEM is dropped in the same transaction as loading
+        if dem_exists and not replace:
             raise CommandError('DEM file exists, use --replace to overwrite')
 
         if verbose:
             self.stdout.write('Everything looks fine, we can start loading DEM\n')
 
         output = tempfile.NamedTemporaryFile()  # SQL code for raster creation
-        cmd = 'raster2pgsql -c -C -I -M -t 100x100 %s mnt %s' % (
-            rst.name,
+        cmd = 'raster2pgsql -c -C -I -M -t %dx%d -Y %s%s%s mnt %s' % (
+            tile_width, tile_height,
+            '-l %s ' % ','.join(str(level) for level in levels) if levels else '',
+            '-R ' if options['out_db'] else '',
+            os.path.abspath(rst.name) if options['out_db'] else rst.name,
             '' if verbose else '2>/dev/null'
         )
         try:
@@ -95,13 +194,14 @@ class Command(BaseCommand):
         # Step 3: Dump SQL code into database
         if verbose:
             self.stdout.write('\n-- Loading DEM into database -----------\n')
-        cur = connection.cursor()
+        progress = Progress(self.stdout, self.tiles_count(rst, tile_width, tile_height, levels), verbose)
         output.file.seek(0)
-        for sql_line in output.file:
-            cur.execute(sql_line)
-        cur.close()
-        output.close()
+        try:
+            self.load_sql(output.file, progress, dem_exists and replace)
+        finally:
+            output.close()
         if verbose:
+            self.stdout.write('{} tiles loaded.\n'.format(progress.count))
             self.stdout.write('DEM successfully loaded.\n')
         return
 
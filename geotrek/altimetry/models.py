@@ -1,6 +1,8 @@
+import hashlib
 import os
 
 from django.conf import settings
+from django.core.cache import caches
 from django.contrib.gis.db import models
 from django.utils.translation import get_language, gettext_lazy as _
 from django.urls import reverse
@@ -44,11 +46,43 @@ class AltimetryMixin(models.Model):
         self.slope = fromdb.slope
         return self
 
-    def get_elevation_profile(self):
-        return AltimetryHelper.elevation_profile(self.geom_3d)
+    def elevation_profile_cache_key(self):
+        date_update = getattr(self, 'date_update', None)
+        if self.pk is None or date_update is None or self.geom_3d is None:
+            return None
+        return 'altimetry_profile_%s_%s_%s_%s' % (self._meta.model_name, self.pk,
+                                                  date_update.strftime('%y%m%d%H%M%S%f'),
+                                                  hashlib.md5(bytes(self.geom_3d.ewkb)).hexdigest())
 
-    def get_elevation_area(self):
-        return AltimetryHelper.elevation_area(self.geom)
+    def get_elevation_profile(self):
+        """Elevation profile, cached per object and date of update
+        (shared by languages and processes).
+        """
+        key = self.elevation_profile_cache_key()
+        if key is None:
+            return AltimetryHelper.elevation_profile(self.geom_3d)
+        cache = caches['fat']
+        profile = cache.get(key)
+        if profile is None:
+            profile = AltimetryHelper.elevation_profile(self.geom_3d)
+            cache.set(key, profile)
+        return profile
+
+    @classmethod
+    def prepare_elevation_profiles(cls, objects):
+        """Compute and cache elevation profiles of many objects at once.
+        """
+        cache = caches['fat']
+        keys = {obj.elevation_profile_cache_key(): obj for obj in objects}
+        keys.pop(None, None)
+        cached = cache.get_many(list(keys.keys()))
+        missing = {key: obj for key, obj in keys.items() if key not in cached}
+        profiles = AltimetryHelper.elevation_profiles([obj.geom_3d for obj in missing.values()])
+        cache.set_many(dict(zip(missing.keys(), profiles)))
+        return len(missing)
+
+    def get_elevation_area(self, max_resolution=None):
+        return AltimetryHelper.elevation_area(self.geom, max_resolution)
 
     def get_elevation_limits(self):
         return AltimetryHelper.altimetry_limits(self.get_elevation_profile())
@@ -93,11 +93,26 @@ END;
 
 $$ LANGUAGE plpgsql;
 
+CREATE FUNCTION {# geotrek.altimetry #}.ft_dem_table(resolution float) RETURNS text AS $$
+    -- Coarsest DEM overview whose pixels are not larger than resolution (mnt if none),
+    -- or NULL if there is no DEM
+    SELECT CASE WHEN EXISTS (SELECT 1 FROM raster_columns WHERE r_table_name = 'mnt') THEN
+        coalesce((SELECT o.o_table_name::text
+                  FROM raster_overviews AS o
+                  JOIN raster_columns AS c ON (c.r_table_schema = o.r_table_schema AND c.r_table_name = o.r_table_name)
+                  WHERE o.r_table_name = 'mnt' AND abs(c.scale_x) * o.overview_factor <= resolution
+                  ORDER BY o.overview_factor DESC
+                  LIMIT 1), 'mnt')
+    END;
+$$ LANGUAGE sql STABLE;
+
 CREATE FUNCTION {# geotrek.altimetry #}.ft_drape_line(linegeom geometry, step integer)
     RETURNS SETOF geometry AS $$
 DECLARE
     points geometry[];
-result geometry[];
+    result geometry[];
+    dem text;
+    sampling text;
 BEGIN
     -- Use sampling steps for draping geometry on DEM
     -- http://blog.mathieu-leplatre.info/drape-lines-on-a-dem-with-postgis.html
@@ -110,22 +125,37 @@ BEGIN
         RETURN QUERY SELECT (ST_DumpPoints(ST_Force3D(linegeom))).geom AS geom;
 
     ELSE
-        RETURN QUERY
+        sampling := $sql$
             WITH -- Get endings of each segment of the line
-                 r1 AS (SELECT ST_PointN(linegeom, generate_series(1, ST_NPoints(linegeom)-1)) as p1,
-                               ST_PointN(linegeom, generate_series(2, ST_NPoints(linegeom))) as p2,
-                               generate_series(2, ST_NPoints(linegeom)) = ST_NPoints(linegeom) as is_last),
+                 r1 AS (SELECT ST_PointN($1, generate_series(1, ST_NPoints($1)-1)) as p1,
+                               ST_PointN($1, generate_series(2, ST_NPoints($1))) as p2,
+                               generate_series(2, ST_NPoints($1)) = ST_NPoints($1) as is_last),
                  -- Get the number of sub-segments
-                 r2 AS (SELECT p1, p2, is_last, trunc(ST_Distance(p1, p2) / step)::integer + 1 AS n FROM r1),
+                 r2 AS (SELECT p1, p2, is_last, trunc(ST_Distance(p1, p2) / $2)::integer + 1 AS n FROM r1),
                  -- Get relative positions of new points along the segment (without last point, except for last segment)
                  r3 AS (SELECT p1, p2, generate_series(0, CASE WHEN is_last THEN n ELSE n - 1 END)/n::double precision AS f FROM r2),
                  -- Create new points
                  r4 AS (SELECT ST_MakePoint(ST_X(p1) + (ST_X(p2) - ST_X(p1)) * f,
                                             ST_Y(p1) + (ST_Y(p2) - ST_Y(p1)) * f) as p,
                                ST_SRID(p1) AS srid FROM r3),
-                 -- Set SRID of new points
-                 r5 AS (SELECT ST_SetSRID(p, srid) as p FROM r4)
-            SELECT add_point_elevation(p) FROM r5;
+                 -- Set SRID of new points, and keep their order
+                 r5 AS (SELECT row_number() OVER () AS n, ST_SetSRID(p, srid) as p FROM r4)
+        $sql$;
+
+        -- Sample the coarsest DEM overview which has a pixel per sampling step
+        -- (or less, for lines shorter than step), instead of full resolution DEM
+        dem := ft_dem_table(least(step, ST_Length(linegeom) / 2));
+        IF dem IS NULL THEN
+            RETURN QUERY EXECUTE sampling || 'SELECT add_point_elevation(p) FROM r5 ORDER BY n' USING linegeom, step;
+        ELSE
+            RETURN QUERY EXECUTE sampling || format($sql$
+                SELECT ST_SetSRID(ST_MakePoint(ST_X(r5.p), ST_Y(r5.p), coalesce(e.ele, 0)), ST_SRID(r5.p))
+                FROM r5 LEFT JOIN LATERAL (
+                    SELECT ST_Value(rast, 1, r5.p)::integer AS ele FROM %I WHERE ST_Intersects(rast, r5.p) LIMIT 1
+                ) AS e ON true
+                ORDER BY r5.n
+            $sql$, dem) USING linegeom, step;
+        END IF;
 
     END IF;
 END;
@@ -1,6 +1,7 @@
 DROP FUNCTION IF EXISTS ft_elevation_infos(geometry, float) CASCADE;
 DROP FUNCTION IF EXISTS add_point_elevation(geometry) CASCADE;
 DROP FUNCTION IF EXISTS ft_drape_line(geometry, integer) CASCADE;
+DROP FUNCTION IF EXISTS ft_dem_table(float) CASCADE;
 DROP FUNCTION IF EXISTS ft_smooth_line(geometry, integer) CASCADE;
 DROP FUNCTION IF EXISTS ft_smooth_line(geometry) CASCADE;
 DROP TYPE IF EXISTS elevation_infos CASCADE;
@@ -13,6 +13,7 @@ from geotrek.core.factories import TopologyFactory
 from geotrek.altimetry.helpers import AltimetryHelper
 
 import os
+import struct
 from io import StringIO
 
 
@@ -102,6 +103,27 @@ class ElevationTest(TestCase):
         self.assertEqual(topo.min_elevation, 15)
         self.assertEqual(topo.max_elevation, 15)
 
+    def test_drape_line_overview(self):
+        conn = connections[DEFAULT_DB_ALIAS]
+        cur = conn.cursor()
+        cur.execute('CREATE TABLE o_2_mnt (rid serial primary key, rast raster)')
+        cur.execute('INSERT INTO o_2_mnt (rast) VALUES '
+                    '(ST_AddBand(ST_MakeEmptyRaster(50, 63, 0, 125, 50, -50, 0, 0, %s), \'16BSI\', 999))', [settings.SRID])
+        cur.execute("SELECT AddRasterConstraints('mnt'::name, 'rast'::name)")
+        cur.execute("SELECT AddRasterConstraints('o_2_mnt'::name, 'rast'::name)")
+        cur.execute("SELECT AddOverviewConstraints('o_2_mnt'::name, 'rast'::name, 'mnt'::name, 'rast'::name, 2)")
+        cur.execute('SELECT ft_dem_table(50), ft_dem_table(49)')
+        self.assertEqual(cur.fetchone(), ('o_2_mnt', 'mnt'))
+        sql = 'SELECT ST_Z(geom) FROM ft_drape_line(ST_GeomFromText(%s, %s), %s) AS geom'
+        # Overview pixels are as large as step
+        cur.execute(sql, ['LINESTRING(10 10, 500 10)', settings.SRID, 50])
+        self.assertEqual({z for z, in cur.fetchall()}, {999})
+        # Full resolution DEM for smaller steps, or lines shorter than step
+        cur.execute(sql, ['LINESTRING(10 10, 500 10)', settings.SRID, 25])
+        self.assertNotIn(999, {z for z, in cur.fetchall()})
+        cur.execute(sql, ['LINESTRING(10 10, 70 10)', settings.SRID, 50])
+        self.assertNotIn(999, {z for z, in cur.fetchall()})
+
     def test_elevation_topology_outside_dem(self):
         if settings.TREKKING_TOPOLOGY_ENABLED:
             outside_path = Path.objects.create(geom=LineString((200, 200), (300, 300)))
@@ -130,6 +152,18 @@ class ElevationProfileTest(TestCase):
         profile = AltimetryHelper.elevation_profile(geom)
         self.assertEqual(profile, [[0, 1.5, 2.5, 8.0]])
 
+    def test_elevation_profiles_batch(self):
+        geoms = [LineString((1.5, 2.5, 8), (2.5, 2.5, 10), (2.5, 0, 7), srid=settings.SRID),
+                 MultiLineString(LineString((1.5, 2.5, 8), (2.5, 2.5, 10)),
+                                 LineString((2.5, 2.5, 6), (2.5, 0, 7)),
+                                 srid=settings.SRID),
+                 Point(1.5, 2.5, 8, srid=settings.SRID)]
+        profiles = AltimetryHelper.elevation_profiles(geoms)
+        self.assertEqual(len(profiles), 3)
+        for geom, profile in zip(geoms, profiles):
+            self.assertEqual(profile, AltimetryHelper.elevation_profile(geom))
+        self.assertAlmostEqual(profiles[0][-1][0], 3.5)
+
     def test_elevation_svg_output(self):
         geom = LineString((1.5, 2.5, 8), (2.5, 2.5, 10),
                           srid=settings.SRID)
@@ -214,6 +248,19 @@ class ElevationAreaTest(AreaTestCase):
         self.assertEqual(extent['altitudes']['max'], 45)
         self.assertEqual(extent['altitudes']['min'], 0)
 
+    def test_area_resolution_levels(self):
+        area = AltimetryHelper.elevation_area(self.geom, max_resolution=38)
+        self.assertEqual(area['resolution']['step'], 34)
+        self.assertEqual(area['resolution']['x'], 39)
+        self.assertEqual(len(area['altitudes'][0]), 39)
+
+    def test_area_binary_grid(self):
+        data = AltimetryHelper.elevation_area_binary(self.area)
+        self.assertEqual(struct.unpack('<HH', data[:4]), (53, 33))
+        altitudes = struct.unpack('<%dh' % (53 * 33), data[4:])
+        self.assertEqual(list(altitudes[:53]), self.area['altitudes'][0])
+        self.assertEqual(list(altitudes[-53:]), self.area['altitudes'][-1])
+
 
 class ElevationOtherGeomAreaTest(AreaTestCase):
     def setUp(self):
@@ -443,6 +490,32 @@ class CommandLoadDemTest(TestCase):
         self.assertAlmostEqual(cur.fetchone()[0], 343.600006103516)
         cur.execute('DROP TABLE mnt;')
 
+    def test_success_tiles_overviews(self):
+        output_stdout = StringIO()
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'elevation.tif')
+        call_command('loaddem', filename, '--tile-size', '20', '--overviews', '2', verbosity=2, stdout=output_stdout)
+        self.assertIn('DEM successfully loaded.', output_stdout.getvalue())
+        self.assertIn('tiles loaded (100%)', output_stdout.getvalue())
+        conn = connections[DEFAULT_DB_ALIAS]
+        cur = conn.cursor()
+        cur.execute('SELECT ST_Width(rast), ST_Height(rast) FROM mnt LIMIT 1;')
+        self.assertEqual(cur.fetchone(), (20, 20))
+        cur.execute('SELECT ST_Value(rast, ST_SetSRID(ST_MakePoint(605600, 6650000), 2154)) FROM mnt '
+                    'WHERE ST_Intersects(rast, ST_SetSRID(ST_MakePoint(605600, 6650000), 2154));')
+        self.assertAlmostEqual(cur.fetchone()[0], 343.600006103516)
+        cur.execute('SELECT o_table_name FROM raster_overviews WHERE r_table_name = \'mnt\';')
+        self.assertEqual(cur.fetchall(), [('o_2_mnt', )])
+        # Overviews are replaced along with DEM
+        call_command('loaddem', filename, '--replace', '--overviews', '', verbosity=0)
+        cur.execute('SELECT o_table_name FROM raster_overviews WHERE r_table_name = \'mnt\';')
+        self.assertEqual(cur.fetchall(), [])
+        cur.execute('DROP TABLE mnt;')
+
+    def test_fail_tile_size(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'elevation.tif')
+        with self.assertRaisesRegex(CommandError, 'Tile size should be WIDTHxHEIGHT or SIZE in pixels, not: 0x10'):
+            call_command('loaddem', filename, '--tile-size', '0x10', verbosity=0)
+
     def test_fail_table_mnt(self):
         """
         The table mnt already exist
@@ -3,7 +3,7 @@ from django.urls import path
 from mapentity.registry import MapEntityOptions
 
 from geotrek.altimetry.views import (ElevationProfile, ElevationChart,
-                                     ElevationArea, serve_elevation_chart)
+                                     ElevationArea, ElevationAreaBinary, serve_elevation_chart)
 
 
 app_name = 'altimetry'
@@ -15,6 +15,7 @@ urlpatterns = [
 class AltimetryEntityOptions(MapEntityOptions):
     elevation_profile_view = ElevationProfile
     elevation_area_view = ElevationArea
+    elevation_area_binary_view = ElevationAreaBinary
     elevation_chart_view = ElevationChart
 
     def scan_views(self, *args, **kwargs):
@@ -28,6 +29,9 @@ class AltimetryEntityOptions(MapEntityOptions):
             path('api/<lang:lang>/{modelname}s/<int:pk>/dem.json'.format(modelname=self.modelname),
                  self.elevation_area_view.as_view(model=self.model),
                  name="%s_elevation_area" % self.modelname),
+            path('api/<lang:lang>/{modelname}s/<int:pk>/dem.bin'.format(modelname=self.modelname),
+                 self.elevation_area_binary_view.as_view(model=self.model),
+                 name="%s_elevation_area_binary" % self.modelname),
             path('api/<lang:lang>/{modelname}s/<int:pk>/profile.svg'.format(modelname=self.modelname),
                  self.elevation_chart_view.as_view(model=self.model),
                  name='%s_profile_svg' % self.modelname),
@@ -1,3 +1,4 @@
+import hashlib
 import os
 
 from django.views.generic.edit import BaseDetailView
@@ -13,6 +14,7 @@ from mapentity.views import JSONResponseMixin, LastModifiedMixin
 
 from geotrek.common.views import PublicOrReadPermMixin
 
+from .helpers import AltimetryHelper
 from .models import AltimetryMixin
 
 
@@ -45,26 +47,57 @@ class ElevationProfile(LastModifiedMixin, JSONResponseMixin,
         for step in elevation_profile:
             formatted = step[0], step[3], step[1:3]
             data.setdefault('profile', []).append(formatted)
-        data['limits'] = dict(zip(['ceil', 'floor'], self.object.get_elevation_limits()))
+        data['limits'] = dict(zip(['ceil', 'floor'], AltimetryHelper.altimetry_limits(elevation_profile)))
         return data
 
 
 class ElevationArea(LastModifiedMixin, JSONResponseMixin, PublicOrReadPermMixin,
                     BaseDetailView):
     """Extract elevation profile on an area and return it as JSON"""
+    cache_variants = [{}] + [{'resolution': resolution} for resolution in settings.ALTIMETRIC_AREA_RESOLUTIONS]
+
+    def get_resolution(self):
+        resolution = self.request.GET.get('resolution')
+        if resolution is None:
+            return settings.ALTIMETRIC_AREA_MAX_RESOLUTION
+        if not resolution.isdigit() or int(resolution) not in settings.ALTIMETRIC_AREA_RESOLUTIONS:
+            raise Http404
+        return int(resolution)
 
     def view_cache_key(self):
         """Used by the ``view_cache_response_content`` decorator.
+        The DEM area depends on the geometry extent and on the loaded DEM only.
         """
         obj = self.get_object()
-        return 'altimetry_dem_area_%s' % obj.pk
+        extent = hashlib.md5(str(obj.geom.extent).encode()).hexdigest()
+        return 'altimetry_dem_area_%s_%s_%s' % (extent, AltimetryHelper.dem_version(), self.get_resolution())
 
     @view_cache_response_content()
     def dispatch(self, *args, **kwargs):
         return super(ElevationArea, self).dispatch(*args, **kwargs)
 
     def get_context_data(self, **kwargs):
-        return self.object.get_elevation_area()
+        return self.object.get_elevation_area(self.get_resolution())
+
+
+class HttpDEMResponse(HttpResponse):
+    content_type = 'application/octet-stream'
+
+    def __init__(self, content='', **kwargs):
+        kwargs['content_type'] = self.content_type
+        super(HttpDEMResponse, self).__init__(content, **kwargs)
+
+
+class ElevationAreaBinary(ElevationArea):
+    """Extract elevation profile on an area and return it as a binary grid
+    (see ``AltimetryHelper.elevation_area_binary``)"""
+    response_class = HttpDEMResponse
+
+    def view_cache_key(self):
+        return super(ElevationAreaBinary, self).view_cache_key() + '_bin'
+
+    def render_to_response(self, context, **response_kwargs):
+        return self.response_class(AltimetryHelper.elevation_area_binary(context), **response_kwargs)
 
 
 def serve_elevation_chart(request, model_name, pk, from_command=False):
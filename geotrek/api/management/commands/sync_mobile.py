@@ -1,6 +1,9 @@
 import argparse
+import json
 import logging
 import filecmp
+from itertools import chain
+import multiprocessing
 import os
 from PIL import Image
 import re
@@ -12,6 +15,7 @@ import cairosvg
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 from django.db.models import Q
 from django.http import StreamingHttpResponse
 from django.test.client import RequestFactory
@@ -24,7 +28,7 @@ from geotrek.tourism import models as tourism_models
 from geotrek.trekking import models as trekking_models
 from geotrek.api.mobile.views.trekking import TrekViewSet
 from geotrek.api.mobile.views.common import FlatPageViewSet, SettingsView
-from geotrek.common.helpers_sync import ZipTilesBuilder
+from geotrek.common.helpers_sync import TileStore, ZipTilesBuilder, tiles_max_age
 # Register mapentity models
 from geotrek.trekking import urls  # NOQA
 from geotrek.tourism import urls  # NOQA
@@ -32,6 +36,29 @@ from geotrek.tourism import urls  # NOQA
 
 logger = logging.getLogger(__name__)
 
+CHECKPOINT_NAME = 'checkpoint.json'
+TILES_STORE_NAME = 'tiles.sqlite'
+
+# Command and jobs of the running pool, inherited by forked workers
+_pool_sync = None
+
+
+def _init_pool_worker():
+    command, jobs = _pool_sync
+    # SQLite connections can't be shared with the parent process
+    command.tile_store = TileStore(command.tile_store_path, max_age=command.tile_store.max_age)
+
+
+def _run_pool_job(index):
+    command, jobs = _pool_sync
+    func, args = jobs[index]
+    command.successfull = True
+    before = command.tile_store.stats()
+    func(*args)
+    # Tiles counters of this job, reported by the parent process
+    stats = {name: value - before[name] for name, value in command.tile_store.stats().items()}
+    return index, command.successfull, stats
+
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
@@ -42,12 +69,15 @@ class Command(BaseCommand):
                             help='Skip inclusion of tiles in zip files')
         parser.add_argument('--url', '-u', dest='url', default='http://localhost', help='Base url')
         parser.add_argument('--indent', '-i', default=0, type=int, help='Indent json files')
+        parser.add_argument('--processes', type=int, dest='processes', default=1,
+                            help='Number of processes building treks packages (default: 1)')
+        parser.add_argument('--resume', action='store_true', dest='resume', default=False,
+                            help='Resume an interrupted synchronization, keeping treks packages already built')
         parser.add_argument('--task', default=None, help=argparse.SUPPRESS)
 
     def mkdirs(self, name):
         dirname = os.path.dirname(name)
-        if not os.path.exists(dirname):
-            os.makedirs(dirname)
+        os.makedirs(dirname, exist_ok=True)
 
     def sync_view(self, lang, view, name, url='/', params=None, headers={}, zipfile=None, fix2028=False, **kwargs):
         if self.verbosity == 2:
@@ -324,13 +354,87 @@ class Command(BaseCommand):
 
         self.close_zip(trekid_zipfile, zipname_trekid)
 
+    def prepare_elevation_chart(self, obj, lang):
+        obj.prepare_elevation_chart(lang, self.referer)
+
+    def prepare_pictures(self, obj):
+        obj.resized_pictures
+
+    def prepare_desk_picture(self, desk):
+        desk.resized_picture
+
+    def prepare_treks_media_jobs(self, treks):
+        """ Jobs rendering elevation charts and resizing pictures of treks packages, once by object
+        (and by language for charts), even if they are shared by several treks.
+        """
+        charts = {}
+        pictures = {}
+        desks = {}
+        for trek in treks:
+            children = list(trek.children)
+            for obj in [trek] + children:
+                charts[obj.pk] = obj
+                pictures[(obj._meta.label, obj.pk)] = obj
+                for desk in obj.information_desks.all():
+                    desks[desk.pk] = desk
+            for obj in chain(trek.published_pois, trek.published_touristic_contents, trek.published_touristic_events):
+                pictures[(obj._meta.label, obj.pk)] = obj
+        jobs = [(self.prepare_elevation_chart, (obj, lang)) for obj in charts.values() for lang in self.languages]
+        jobs += [(self.prepare_pictures, (obj, )) for obj in pictures.values()]
+        jobs += [(self.prepare_desk_picture, (desk, )) for desk in desks.values()]
+        return jobs
+
+    def run_jobs(self, jobs, done=None):
+        """ Run jobs (function and arguments), in a pool of processes with --processes option.
+        done(*args) is called in this process after each successfull job.
+        """
+        if self.processes > 1 and len(jobs) > 1:
+            global _pool_sync
+            _pool_sync = (self, jobs)
+            # Forked workers open their own database connections
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(self.processes, initializer=_init_pool_worker) as pool:
+                for index, successfull, stats in pool.imap_unordered(_run_pool_job, range(len(jobs))):
+                    self.tile_store.add_stats(stats)
+                    if done and successfull:
+                        done(*jobs[index][1])
+                    self.successfull = self.successfull and successfull
+            _pool_sync = None
+            return
+        for func, args in jobs:
+            successfull, self.successfull = self.successfull, True
+            func(*args)
+            if done and self.successfull:
+                done(*args)
+            self.successfull = successfull and self.successfull
+
+    def load_checkpoint(self):
+        """ Treks packages built by an interrupted synchronization with the same options """
+        try:
+            with open(os.path.join(self.tmp_root, CHECKPOINT_NAME)) as f:
+                checkpoint = json.load(f)
+        except (IOError, ValueError):
+            return {'options': self.checkpoint_options, 'treks': []}
+        if checkpoint['options'] != self.checkpoint_options:
+            raise CommandError("The interrupted synchronization in {}/ used other options, it can't be resumed."
+                               " Please delete this directory.".format(self.tmp_root))
+        return checkpoint
+
+    def save_checkpoint(self, trek):
+        self.checkpoint['treks'].append(trek.pk)
+        checkpoint_name = os.path.join(self.tmp_root, CHECKPOINT_NAME)
+        with open(checkpoint_name + '.tmp', 'w') as f:
+            json.dump(self.checkpoint, f)
+        os.replace(checkpoint_name + '.tmp', checkpoint_name)
+
     def sync_treks_media(self):
         treks = trekking_models.Trek.objects.existing().filter(published=True).order_by('pk')
         if self.portal:
             treks = treks.filter(Q(portal__name__in=self.portal) | Q(portal=None))
+        treks = treks.exclude(pk__in=self.checkpoint['treks'])
 
-        for trek in treks:
-            self.sync_trek_by_pk_media(trek)
+        self.run_jobs(self.prepare_treks_media_jobs(treks))
+        self.run_jobs([(self.sync_trek_by_pk_media, (trek, )) for trek in treks], done=self.save_checkpoint)
 
     def sync_global_media(self):
         url_media_nolang = os.path.join('nolang')
@@ -373,7 +477,7 @@ class Command(BaseCommand):
             return (lng - radius, lat - radius,
                     lng + radius, lat + radius)
 
-        tiles = ZipTilesBuilder(zipfile, prefix='/{}/tiles/'.format(trek.pk), **self.builder_args)
+        tiles = ZipTilesBuilder(zipfile, store=self.tile_store, prefix='/{}/tiles/'.format(trek.pk), **self.builder_args)
 
         geom = trek.geom
         if geom.geom_type == 'MultiLineString':
@@ -403,7 +507,7 @@ class Command(BaseCommand):
         logger.info("Global extent is %s" % str(global_extent))
         logger.info("Build global tiles file...")
 
-        tiles = ZipTilesBuilder(zipfile, prefix='tiles/', **self.builder_args)
+        tiles = ZipTilesBuilder(zipfile, store=self.tile_store, prefix='tiles/', **self.builder_args)
         tiles.add_coverage(bbox=global_extent,
                            zoomlevels=settings.MOBILE_TILES_GLOBAL_ZOOMS)
         tiles.run()
@@ -446,6 +550,9 @@ class Command(BaseCommand):
             raise CommandError("Destination directory contains extra data")
 
     def rename_root(self):
+        for name in (CHECKPOINT_NAME, TILES_STORE_NAME, TILES_STORE_NAME + '-wal', TILES_STORE_NAME + '-shm'):
+            if os.path.exists(os.path.join(self.tmp_root, name)):
+                os.unlink(os.path.join(self.tmp_root, name))
         if os.path.exists(self.dst_root):
             tmp_root2 = os.path.join(os.path.dirname(self.dst_root), 'deprecated_sync_mobile')
             os.rename(self.dst_root, tmp_root2)
@@ -493,16 +600,30 @@ class Command(BaseCommand):
             'tiles_dir': os.path.join(settings.VAR_DIR, 'tiles'),
         }
 
+        self.processes = options.get('processes', 1)
+        self.resume = options.get('resume', False)
+        self.checkpoint_options = {
+            'languages': list(self.languages), 'portal': self.portal, 'skip_tiles': self.skip_tiles,
+            'url': self.referer, 'indent': self.indent,
+        }
+
         self.tmp_root = os.path.join(os.path.dirname(self.dst_root), 'tmp_sync_mobile')
         try:
             os.mkdir(self.tmp_root)
         except OSError as e:
             if e.errno != 17:
                 raise
-            raise CommandError(
-                "The {}/ directory already exists. Please check no other sync_mobile command is already running."
-                " If not, please delete this directory.".format(self.tmp_root)
-            )
+            if not self.resume:
+                raise CommandError(
+                    "The {}/ directory already exists. Please check no other sync_mobile command is already running."
+                    " If not, please delete this directory, or add --resume option to resume the interrupted synchronization."
+                    .format(self.tmp_root)
+                )
+        self.checkpoint = self.load_checkpoint()
+        # Without persistent store, tiles are shared by processes of this synchronization only
+        self.tile_store_path = settings.MOBILE_TILES_STORE or os.path.join(self.tmp_root, TILES_STORE_NAME)
+        self.tile_store = TileStore(self.tile_store_path, max_age=tiles_max_age())
+        self.tile_store.prune()
         try:
             self.sync()
             if self.celery_task:
@@ -515,9 +636,14 @@ class Command(BaseCommand):
                         'infos': "{}".format(_("Sync mobile ended"))
                     }
                 )
-        except Exception:
-            shutil.rmtree(self.tmp_root)
-            raise
+        finally:
+            # On failure, temporary directory and packages already built are kept for --resume
+            self.tile_store.close()
+
+        if not self.skip_tiles:
+            logger.info("Tiles: %s" % self.tile_store)
+            if self.verbosity == 2:
+                self.stdout.write("Tiles: {}".format(self.tile_store))
 
         self.rename_root()
 
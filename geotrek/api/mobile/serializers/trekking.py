@@ -1,11 +1,23 @@
 import os
 from django.conf import settings
+from django.db.models import OuterRef, Subquery
 from rest_framework import serializers
 from rest_framework_gis import serializers as geo_serializers
 
 from geotrek.api.mobile.serializers.tourism import InformationDeskSerializer
 from geotrek.api.v2.functions import Transform, Length, StartPoint, EndPoint
-from geotrek.zoning.models import City, District
+from geotrek.zoning.models import City, ZoningMembership
+
+
+def annotate_departure_arrival_cities(queryset):
+    """
+    Annotate treks with codes of their departure and arrival cities, so that
+    they are read along with treks instead of once per trek.
+    """
+    departure = City.objects.filter(published=True, geom__covers=StartPoint(OuterRef('geom'))).values('code')[:1]
+    arrival = City.objects.filter(geom__covers=EndPoint(OuterRef('geom'))).values('code')[:1]
+    return queryset.annotate(departure_city_code=Subquery(departure), arrival_city_code=Subquery(arrival))
+
 
 if 'geotrek.trekking' in settings.INSTALLED_APPS:
     from geotrek.trekking import models as trekking_models
@@ -42,11 +54,12 @@ if 'geotrek.trekking' in settings.INSTALLED_APPS:
         departure_city = serializers.SerializerMethodField(read_only=True)
 
         def get_cities(self, obj):
-            qs = City.objects.filter(published=True)
-            cities = qs.filter(geom__intersects=(obj.geom, 0))
-            return cities.values_list('code', flat=True)
+            cities = ZoningMembership.zones(obj, 'city')
+            return [city.code for city in sorted(cities, key=lambda city: city.name) if city.published]
 
         def get_departure_city(self, obj):
+            if hasattr(obj, 'departure_city_code'):
+                return obj.departure_city_code
             qs = City.objects.filter(published=True)
             if obj.start_point:
                 city = qs.filter(geom__covers=(obj.start_point, 0)).first()
@@ -58,9 +71,9 @@ if 'geotrek.trekking' in settings.INSTALLED_APPS:
             return round(obj.length_2d_m, 1)
 
         def get_districts(self, obj):
-            qs = District.objects.filter(published=True)
-            districts = qs.filter(geom__intersects=(obj.geom, 0))
-            return [district.pk for district in districts]
+            districts = ZoningMembership.zones(obj, 'district')
+            return [district.pk for district in sorted(districts, key=lambda district: district.name)
+                    if district.published]
 
         class Meta:
             model = trekking_models.Trek
@@ -97,9 +110,11 @@ if 'geotrek.trekking' in settings.INSTALLED_APPS:
             return obj.serializable_pictures_mobile(root_pk)
 
         def get_children(self, obj):
-            children = obj.children.all().annotate(length_2d_m=Length('geom'),
-                                                   start_point=Transform(StartPoint('geom'), settings.API_SRID),
-                                                   end_point=Transform(EndPoint('geom'), settings.API_SRID))
+            children = obj.children.all().prefetch_related('zoning_memberships__city', 'zoning_memberships__district')
+            children = children.annotate(length_2d_m=Length('geom'),
+                                         start_point=Transform(StartPoint('geom'), settings.API_SRID),
+                                         end_point=Transform(EndPoint('geom'), settings.API_SRID))
+            children = annotate_departure_arrival_cities(children)
             serializer_children = TrekListSerializer(children, many=True, context={'root_pk': obj.pk})
             return serializer_children.data
 
@@ -114,6 +129,8 @@ if 'geotrek.trekking' in settings.INSTALLED_APPS:
             return obj.parking_location.transform(settings.API_SRID, clone=True).coords
 
         def get_arrival_city(self, obj):
+            if hasattr(obj, 'arrival_city_code'):
+                return obj.arrival_city_code
             qs = City.objects.all()
             if obj.end_point:
                 city = qs.filter(geom__covers=(obj.end_point, 0)).first()
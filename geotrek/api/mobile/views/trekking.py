@@ -27,7 +27,8 @@ class TrekViewSet(DetailSerializerMixin, viewsets.ReadOnlyModelViewSet):
         lang = self.request.LANGUAGE_CODE
         queryset = trekking_models.Trek.objects.existing()\
             .select_related('topo_object') \
-            .prefetch_related('topo_object__aggregations', 'attachments') \
+            .prefetch_related('topo_object__aggregations', 'attachments',
+                              'zoning_memberships__city', 'zoning_memberships__district') \
             .order_by('pk').annotate(length_2d_m=Length('geom'))
         if not self.action == 'list':
             queryset = queryset.annotate(geom2d_transformed=Transform(F('geom'), settings.API_SRID))
@@ -36,6 +37,7 @@ class TrekViewSet(DetailSerializerMixin, viewsets.ReadOnlyModelViewSet):
                 exclude(Q(count_parents__gt=0) & Q(published=False))
         if 'portal' in self.request.GET:
             queryset = queryset.filter(Q(portal__name=self.request.GET['portal']) | Q(portal=None))
+        queryset = api_serializers_trekking.annotate_departure_arrival_cities(queryset)
         return queryset.annotate(start_point=Transform(StartPoint('geom'), settings.API_SRID),
                                  end_point=Transform(EndPoint('geom'), settings.API_SRID)). \
             filter(Q(**{'published_{lang}'.format(lang=lang): True})
@@ -6,6 +6,7 @@ from landez.sources import DownloadError
 from unittest import mock
 import os
 from PIL import Image
+import re
 import shutil
 from unittest import skipIf
 import zipfile
@@ -16,7 +17,7 @@ from django.core import management
 from django.core.management.base import CommandError
 from django.db.models import Q
 from django.http import HttpResponse, StreamingHttpResponse
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.test.utils import override_settings
 from django.utils import translation
 
@@ -33,7 +34,7 @@ from geotrek.tourism.factories import (InformationDeskFactory, InformationDeskTy
 from geotrek.tourism.models import TouristicEventType
 
 
-class VarTmpTestCase(TestCase):
+class VarTmpMixin(object):
     def setUp(self):
         if os.path.exists(os.path.join('var', 'tmp_sync_mobile')):
             shutil.rmtree(os.path.join('var', 'tmp_sync_mobile'))
@@ -47,6 +48,10 @@ class VarTmpTestCase(TestCase):
             shutil.rmtree(os.path.join('var', 'tmp'))
 
 
+class VarTmpTestCase(VarTmpMixin, TestCase):
+    pass
+
+
 @mock.patch('landez.TilesManager.tileslist', return_value=[(9, 258, 199)])
 class SyncMobileTilesTest(VarTmpTestCase):
     @classmethod
@@ -128,6 +133,35 @@ class SyncMobileTilesTest(VarTmpTestCase):
         self.assertTrue(os.path.exists(os.path.join('var/tmp', 'nolang', '{}.zip'.format(trek_multi.pk))))
 
 
+@override_settings(MOBILE_TILES_STORE=None)
+class SyncMobileProcessesTest(VarTmpMixin, TransactionTestCase):
+    # Workers are forked and need committed data
+    serialized_rollback = True
+
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    @mock.patch('landez.TilesManager.tile', return_value=b'I am a png')
+    @mock.patch('landez.TilesManager.tileslist', side_effect=lambda bbox, zoomlevels: [(z, 0, 0) for z in zoomlevels])
+    def test_sync_processes(self, mock_tileslist, mock_tiles, mock_prepare):
+        treks = TrekFactory.create_batch(4, published=True)
+        output = StringIO()
+        management.call_command('sync_mobile', 'var/tmp', url='http://localhost:8000', processes=2,
+                                languages='en', verbosity=2, stdout=output)
+        self.assertIn('Done', output.getvalue())
+        for trek in treks:
+            with zipfile.ZipFile('var/tmp/nolang/{}.zip'.format(trek.pk)) as zfile:
+                tiles = [name for name in zfile.namelist() if name.startswith('/{}/tiles/'.format(trek.pk))]
+                self.assertEqual(len(tiles), 4)
+        # Tiles of workers are reported: global tiles, then tiles of each trek
+        nb_tiles = len(settings.MOBILE_TILES_GLOBAL_ZOOMS) + 4 * len(
+            settings.MOBILE_TILES_LOW_ZOOMS + settings.MOBILE_TILES_HIGH_ZOOMS)
+        self.assertIn('Tiles: {} tiles: '.format(nb_tiles), output.getvalue())
+        # Tiles are shared by processes: those of treks are downloaded at most once by process
+        downloads = int(re.search(r'(\d+) downloaded', output.getvalue()).group(1))
+        self.assertLessEqual(downloads, len(settings.MOBILE_TILES_GLOBAL_ZOOMS) + 2 * 4)
+        self.assertFalse(os.path.exists('var/tmp/tiles.sqlite'))
+        self.assertIn(', 0 failed', output.getvalue())
+
+
 class SyncMobileFailTest(VarTmpTestCase):
     @classmethod
     def setUpClass(cls):
@@ -544,3 +578,44 @@ class SyncMobileTreksTest(TranslationResetMixin, VarTmpTestCase):
         management.call_command('sync_mobile', 'var/tmp', url='http://localhost:8000',
                                 skip_tiles=True, verbosity=2, stdout=output)
         self.assertIn('Done', output.getvalue())
+
+    def test_sync_resume(self):
+        os.makedirs('var/tmp_sync_mobile/nolang')
+        with zipfile.ZipFile('var/tmp_sync_mobile/nolang/{}.zip'.format(self.trek_1.pk), 'w') as archive:
+            archive.writestr('built', 'before interruption')
+        checkpoint = {
+            'options': {'languages': list(settings.MODELTRANSLATION_LANGUAGES), 'portal': [], 'skip_tiles': True,
+                        'url': 'http://localhost:8000', 'indent': 0},
+            'treks': [self.trek_1.pk],
+        }
+        with open('var/tmp_sync_mobile/checkpoint.json', 'w') as f:
+            json.dump(checkpoint, f)
+        output = StringIO()
+        management.call_command('sync_mobile', 'var/tmp', url='http://localhost:8000',
+                                skip_tiles=True, resume=True, verbosity=2, stdout=output)
+        self.assertNotIn('nolang/{}.zip'.format(self.trek_1.pk), output.getvalue())
+        self.assertIn('nolang/{}.zip'.format(self.trek_2.pk), output.getvalue())
+        with zipfile.ZipFile('var/tmp/nolang/{}.zip'.format(self.trek_1.pk)) as archive:
+            self.assertEqual(archive.namelist(), ['built'])
+        self.assertFalse(os.path.exists('var/tmp/checkpoint.json'))
+
+    @mock.patch('geotrek.api.management.commands.sync_mobile.Command.sync_trek_by_pk_media')
+    def test_sync_interrupted(self, mocked):
+        def sync_trek_by_pk_media(trek):
+            if trek.pk == self.trek_2.pk:
+                raise Exception("Interrupted")
+        mocked.side_effect = sync_trek_by_pk_media
+        with self.assertRaisesRegex(Exception, "Interrupted"):
+            management.call_command('sync_mobile', 'var/tmp', url='http://localhost:8000',
+                                    skip_tiles=True, verbosity=0)
+        # Kept to resume the synchronization
+        with open('var/tmp_sync_mobile/checkpoint.json') as f:
+            self.assertIn(self.trek_1.pk, json.load(f)['treks'])
+
+    def test_sync_resume_other_options(self):
+        os.makedirs('var/tmp_sync_mobile')
+        with open('var/tmp_sync_mobile/checkpoint.json', 'w') as f:
+            json.dump({'options': {'languages': ['fr']}, 'treks': [self.trek_1.pk]}, f)
+        with self.assertRaisesRegex(CommandError, "used other options, it can't be resumed"):
+            management.call_command('sync_mobile', 'var/tmp', url='http://localhost:8000',
+                                    skip_tiles=True, resume=True, verbosity=2, stdout=StringIO())
@@ -41,6 +41,13 @@ class FakeSyncCommand(Command):
         self.skip_dem = skip_dem
         self.skip_pdf = skip_pdf
         self.skip_profile_png = skip_profile_png
+        self.incremental = False
+        self.processes = 1
+        self.outputs = None
+        self.manifest = {}
+        self.previous_manifest = {}
+        self.run_signature = []
+        self.successfull = True
 
 
 class OrganismFactory(factory.DjangoModelFactory):
@@ -1,5 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import logging
+import os
 import re
+import sqlite3
+import threading
+import time
 
 from django.conf import settings
 from landez import TilesManager
@@ -11,21 +17,130 @@ from geotrek.common import views
 logger = logging.getLogger(__name__)
 
 
+def tiles_max_age():
+    """ MOBILE_TILES_STORE_MAX_AGE in seconds, None if stored tiles never expire """
+    if settings.MOBILE_TILES_STORE_MAX_AGE is None:
+        return None
+    return settings.MOBILE_TILES_STORE_MAX_AGE * 24 * 3600
+
+
+class TileStore(object):
+    """
+    Tiles downloaded by synchronization commands, stored in a SQLite database
+    and keyed by source (tiles URLs) and z/x/y, so that tiles shared by several
+    zip files or several synchronizations are downloaded once.
+    As in MBTiles, identical images are stored once, and deleted when no tile uses them
+    anymore (tile replaced, or expired tile pruned, see ``prune``).
+    Use ``:memory:`` as path to store tiles for one synchronization only.
+    A store file can be shared by several processes: each tile is committed once
+    stored, and writers wait for each other (up to ``timeout`` seconds).
+    """
+    STATS = ('hits', 'downloads', 'failures', 'download_time')
+
+    def __init__(self, path=':memory:', max_age=None, timeout=600):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        if path != ':memory:':
+            # Readers do not wait for writers
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS images (tile_id TEXT PRIMARY KEY, tile_data BLOB);
+            CREATE TABLE IF NOT EXISTS map (source TEXT, z INTEGER, x INTEGER, y INTEGER,
+                                            tile_id TEXT, date REAL, PRIMARY KEY (source, z, x, y));
+            CREATE INDEX IF NOT EXISTS map_tile_id ON map (tile_id);
+        """)
+        self.max_age = max_age
+        self.hits = 0
+        self.downloads = 0
+        self.failures = 0
+        self.download_time = 0.0
+
+    def get(self, source, tile):
+        sql = "SELECT tile_data FROM map JOIN images USING (tile_id) WHERE source = ? AND z = ? AND x = ? AND y = ?"
+        params = [source] + list(tile)
+        if self.max_age is not None:
+            sql += " AND date >= ?"
+            params.append(time.time() - self.max_age)
+        row = self.connection.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    def put(self, source, tile, data):
+        tile_id = hashlib.md5(data).hexdigest()
+        # Short transaction, not to lock the store for other processes
+        with self.connection:
+            previous = self.connection.execute("SELECT tile_id FROM map WHERE source = ? AND z = ? AND x = ? AND y = ?",
+                                               [source] + list(tile)).fetchone()
+            self.connection.execute("INSERT OR IGNORE INTO images (tile_id, tile_data) VALUES (?, ?)",
+                                    (tile_id, data))
+            self.connection.execute("INSERT OR REPLACE INTO map (source, z, x, y, tile_id, date) VALUES (?, ?, ?, ?, ?, ?)",
+                                    [source] + list(tile) + [tile_id, time.time()])
+            if previous and previous[0] != tile_id:
+                self.connection.execute("DELETE FROM images WHERE tile_id = ? "
+                                        "AND NOT EXISTS (SELECT 1 FROM map WHERE tile_id = ?)",
+                                        (previous[0], previous[0]))
+
+    def prune(self):
+        """ Delete expired tiles, and images used by no tile """
+        with self.connection:
+            if self.max_age is not None:
+                self.connection.execute("DELETE FROM map WHERE date < ?", (time.time() - self.max_age, ))
+            self.connection.execute("DELETE FROM images WHERE NOT EXISTS "
+                                    "(SELECT 1 FROM map WHERE map.tile_id = images.tile_id)")
+
+    def commit(self):
+        self.connection.commit()
+
+    def stats(self):
+        return {name: getattr(self, name) for name in self.STATS}
+
+    def add_stats(self, stats):
+        """ Add counters of another store (e.g. of a worker process) """
+        for name, value in stats.items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def close(self):
+        self.connection.close()
+
+    def __str__(self):
+        requested = self.hits + self.downloads + self.failures
+        return "{} tiles: {} reused ({:.0%}), {} downloaded ({:.1f} tiles/s), {} failed".format(
+            requested, self.hits, self.hits / requested if requested else 0,
+            self.downloads, self.downloads / self.download_time if self.download_time else 0,
+            self.failures)
+
+
 class ZipTilesBuilder(object):
-    def __init__(self, zipfile, prefix="", **builder_args):
+    def __init__(self, zipfile, prefix="", store=None, **builder_args):
         self.zipfile = zipfile
         self.prefix = prefix
-        builder_args['tile_format'] = self.format_from_url(builder_args['tiles_url'])
-        self.tm = TilesManager(**builder_args)
+        self.store = store
+        self.builder_args = builder_args
+        self.tm = self.tiles_manager()
+        # Tiles managers of download threads
+        self.local = threading.local()
+
+        self.tiles = set()
+
+    def tiles_manager(self):
+        args = dict(self.builder_args, tile_format=self.format_from_url(self.builder_args['tiles_url']))
+        tm = TilesManager(**args)
 
         if not isinstance(settings.MOBILE_TILES_URL, str) and len(settings.MOBILE_TILES_URL) > 1:
             for url in settings.MOBILE_TILES_URL[1:]:
-                args = builder_args
-                args['tiles_url'] = url
-                args['tile_format'] = self.format_from_url(args['tiles_url'])
-                self.tm.add_layer(TilesManager(**args), opacity=1)
+                args = dict(args, tiles_url=url, tile_format=self.format_from_url(url))
+                tm.add_layer(TilesManager(**args), opacity=1)
+        return tm
 
-        self.tiles = set()
+    @property
+    def source(self):
+        """ Key of tiles in store """
+        if isinstance(settings.MOBILE_TILES_URL, str):
+            urls = [self.builder_args['tiles_url']]
+        else:
+            urls = [self.builder_args['tiles_url']] + list(settings.MOBILE_TILES_URL[1:])
+        return ' '.join(urls)
 
     def format_from_url(self, url):
         """
@@ -41,19 +156,49 @@ class ZipTilesBuilder(object):
     def add_coverage(self, bbox, zoomlevels):
         self.tiles |= set(self.tm.tileslist(bbox, zoomlevels))
 
+    def download(self, tile):
+        """ Download a tile, from a thread of the pool """
+        if not hasattr(self.local, 'tm'):
+            self.local.tm = self.tiles_manager()
+        try:
+            return self.local.tm.tile(tile)
+        except DownloadError:
+            return None
+
     def run(self):
-        for tile in self.tiles:
-            name = '{prefix}{0}/{1}/{2}{ext}'.format(
-                *tile,
-                prefix=self.prefix,
-                ext=settings.MOBILE_TILES_EXTENSION or self.tm._tile_extension
-            )
-            try:
-                data = self.tm.tile(tile)
-            except DownloadError:
-                logger.warning("Failed to download tile %s" % name)
+        store = self.store if self.store is not None else TileStore()
+        source = self.source
+        missing = []
+        for tile in sorted(self.tiles):
+            data = store.get(source, tile)
+            if data is None:
+                missing.append(tile)
             else:
-                self.zipfile.writestr(name, data)
+                store.hits += 1
+                self.write(tile, data)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=settings.MOBILE_TILES_WORKERS) as executor:
+            for tile, data in zip(missing, executor.map(self.download, missing)):
+                if data is None:
+                    store.failures += 1
+                    logger.warning("Failed to download tile %s" % self.tile_name(tile))
+                    continue
+                store.downloads += 1
+                store.put(source, tile, data)
+                self.write(tile, data)
+        store.download_time += time.perf_counter() - start
+        store.commit()
+
+    def tile_name(self, tile):
+        return '{prefix}{0}/{1}/{2}{ext}'.format(
+            *tile,
+            prefix=self.prefix,
+            ext=settings.MOBILE_TILES_EXTENSION or self.tm._tile_extension
+        )
+
+    def write(self, tile, data):
+        self.zipfile.writestr(self.tile_name(tile), data)
 
 
 class SyncRando:
@@ -15,6 +15,10 @@ class Command(BaseCommand):
         parser.add_argument('shapefile', nargs="?")
         parser.add_argument('-l', dest='limit', type=int, help='Limit number of lines to import')
         parser.add_argument('--encoding', '-e', default='utf8')
+        parser.add_argument('--bulk', action='store_true',
+                            help='Save objects by batches of rows, without calling their save() method')
+        parser.add_argument('--pages-dir', dest='pages_dir',
+                            help='Keep API pages in this directory to replay the import if it fails')
 
     def handle(self, *args, **options):
         verbosity = options['verbosity']
@@ -50,6 +54,10 @@ class Command(BaseCommand):
                     line=line, eid=eid or "", progress=int(100 * progress)))
 
         parser = Parser(progress_cb=progress_cb, encoding=encoding)
+        if options['bulk']:
+            parser.bulk = True
+        if options['pages_dir']:
+            parser.pages_dir = options['pages_dir']
 
         try:
             parser.parse(options['shapefile'], limit=limit)
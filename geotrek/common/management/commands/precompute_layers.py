@@ -0,0 +1,27 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from mapentity.helpers import precompute_layers
+
+
+class Command(BaseCommand):
+    help = "Render and cache GeoJSON layers of the map, for all languages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*',
+                            help="Models of layers to compute (app_label.ModelName), all by default")
+        parser.add_argument('--language', '-l', action='append', dest='languages',
+                            help="Language of layers to compute, all by default")
+        parser.add_argument('--force', '-f', action='store_true', default=False,
+                            help="Compute layers even if they are already in cache")
+
+    def handle(self, *args, **options):
+        models = None
+        if options['models']:
+            try:
+                models = [apps.get_model(label) for label in options['models']]
+            except (LookupError, ValueError) as e:
+                raise CommandError(e)
+        count = precompute_layers(models=models, languages=options['languages'], force=options['force'])
+        if options['verbosity'] >= 1:
+            self.stdout.write("{} layers computed".format(count))
@@ -1,6 +1,9 @@
 import argparse
+import hashlib
+import json
 import logging
 import filecmp
+import multiprocessing
 import os
 import shutil
 from time import sleep
@@ -9,7 +12,8 @@ from zipfile import ZipFile
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.core.management.base import BaseCommand, CommandError
-from django.db.models import Q
+from django.db import connections
+from django.db.models import Count, Max, Q
 from django.http import StreamingHttpResponse
 from django.test.client import RequestFactory
 from django.utils import translation
@@ -42,10 +46,37 @@ if 'geotrek.tourism' in settings.INSTALLED_APPS:
 # Register mapentity models
 from geotrek.trekking import urls  # NOQA
 from geotrek.tourism import urls  # NOQA
+from mapentity.registry import registry
 
 
 logger = logging.getLogger(__name__)
 
+MANIFEST_NAME = 'manifest.json'
+
+# Command, language, detail function and objects of the running pool, inherited by forked workers
+_pool_sync = None
+
+
+def _sync_pool_object(pk):
+    command, lang, sync_detail, objects = _pool_sync
+    translation.activate(lang)
+    return command.sync_detail_recorded(lang, objects[pk], sync_detail)
+
+
+class ZipRecorder(object):
+    """ Records names written to the global zip file while syncing an object,
+    to add them in the real zip file afterwards, in a deterministic order.
+    """
+    def __init__(self):
+        self.names = []
+
+    def write(self, filename, arcname):
+        if arcname not in self.names:
+            self.names.append(arcname)
+
+    def namelist(self):
+        return self.names
+
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
@@ -75,12 +106,20 @@ class Command(BaseCommand):
                             default=False, help='include infrastructures')
         parser.add_argument('--with-dives', action='store_true', dest='with_dives',
                             default=False, help='include dives')
+        parser.add_argument('--incremental', action='store_true', dest='incremental', default=False,
+                            help='Reuse files of objects unchanged since previous synchronization')
+        parser.add_argument('--processes', type=int, dest='processes', default=1,
+                            help='Number of processes syncing objects details (default: 1)')
         parser.add_argument('--task', default=None, help=argparse.SUPPRESS)
 
     def mkdirs(self, name):
         dirname = os.path.dirname(name)
-        if not os.path.exists(dirname):
-            os.makedirs(dirname)
+        os.makedirs(dirname, exist_ok=True)
+
+    def record(self, name):
+        """ Keep track of files written while syncing an object (see sync_objects) """
+        if self.outputs is not None:
+            self.outputs.append(name)
 
     def get_params_portal(self, params):
         if self.portal:
@@ -104,7 +143,7 @@ class Command(BaseCommand):
         self.mkdirs(global_file)
 
         zipfile = ZipFile(global_file, 'w')
-        tiles = common_sync.ZipTilesBuilder(zipfile, **self.builder_args)
+        tiles = common_sync.ZipTilesBuilder(zipfile, store=self.tile_store, **self.builder_args)
         tiles.add_coverage(bbox=global_extent,
                            zoomlevels=settings.MOBILE_TILES_GLOBAL_ZOOMS)
         tiles.run()
@@ -128,7 +167,7 @@ class Command(BaseCommand):
         self.mkdirs(trek_file)
 
         zipfile = ZipFile(trek_file, 'w')
-        tiles = common_sync.ZipTilesBuilder(zipfile, **self.builder_args)
+        tiles = common_sync.ZipTilesBuilder(zipfile, store=self.tile_store, **self.builder_args)
 
         geom = trek.geom
         if geom.geom_type == 'MultiLineString':
@@ -169,7 +208,9 @@ class Command(BaseCommand):
             if self.verbosity > 0:
                 self.stderr.write(self.style.ERROR("failed (HTTP {code})".format(code=response.status_code)))
             return
-        f = open(fullname, 'wb')
+        # Write to a file of this process first, since common files can be synced by several processes
+        tmpname = '{}.{}'.format(fullname, os.getpid())
+        f = open(tmpname, 'wb')
         if isinstance(response, StreamingHttpResponse):
             content = b''.join(response.streaming_content)
         else:
@@ -182,14 +223,19 @@ class Command(BaseCommand):
         f.close()
         oldfilename = os.path.join(self.dst_root, name)
         # If new file is identical to old one, don't recreate it. This will help backup
-        if os.path.isfile(oldfilename) and filecmp.cmp(fullname, oldfilename):
-            os.unlink(fullname)
-            os.link(oldfilename, fullname)
+        if os.path.isfile(oldfilename) and filecmp.cmp(tmpname, oldfilename):
+            os.unlink(tmpname)
+            os.link(oldfilename, tmpname)
             if self.verbosity == 2:
                 self.stdout.write("unchanged")
         else:
             if self.verbosity == 2:
                 self.stdout.write("generated")
+        os.replace(tmpname, fullname)
+        if os.path.exists(tmpname):
+            # Renaming does nothing if both names are links to the same file
+            os.unlink(tmpname)
+        self.record(name)
         # FixMe: Find why there are duplicate files.
         if zipfile:
             if name not in zipfile.namelist():
@@ -257,7 +303,11 @@ class Command(BaseCommand):
                 self.stdout.write("\x1b[36m{lang}\x1b[0m \x1b[1m{url}/{name}\x1b[0m \x1b[31mfile does not exist\x1b[0m".format(lang=lang, url=url, name=name))
             return
         if not os.path.isfile(dst):
-            os.link(src, dst)
+            try:
+                os.link(src, dst)
+            except FileExistsError:
+                pass  # Linked by another process meanwhile
+        self.record(os.path.join(url, name))
         if zipfile:
             zipfile.write(dst, os.path.join(url, name))
         if self.verbosity == 2:
@@ -292,6 +342,7 @@ class Command(BaseCommand):
         if uptodate:
             stat = os.stat(oldzipfilename)
             os.utime(zipfilename, (stat.st_atime, stat.st_mtime))
+        self.record(name)
 
         if self.verbosity == 2:
             if uptodate:
@@ -360,9 +411,11 @@ class Command(BaseCommand):
             path = attachments[0].attachment_file.name
             modelname = obj._meta.model_name
             src = os.path.join(settings.MEDIA_ROOT, path)
-            dst = os.path.join(self.tmp_root, 'api', lang, '{modelname}s'.format(modelname=modelname), str(obj.pk), obj.slug + '.pdf')
+            name = os.path.join('api', lang, '{modelname}s'.format(modelname=modelname), str(obj.pk), obj.slug + '.pdf')
+            dst = os.path.join(self.tmp_root, name)
             self.mkdirs(dst)
             os.link(src, dst)
+            self.record(name)
             if self.verbosity == 2:
                 self.stdout.write("\x1b[36m{lang}\x1b[0m \x1b[1m{dst}\x1b[0m \x1b[32mcopied\x1b[0m".format(lang=lang, dst=dst))
         elif settings.ONLY_EXTERNAL_PUBLIC_PDF:
@@ -374,6 +427,109 @@ class Command(BaseCommand):
             self.get_params_portal(params)
             self.sync_object_view(lang, obj, view, '{obj.slug}.pdf', params=params, slug=obj.slug)
 
+    def get_run_signature(self):
+        """ Inputs shared by objects details: options, version, and last updates of registered
+        models and of attachments. Models with their own signature (see sync_objects) are excluded.
+        """
+        options = {key: value for key, value in self.options.items()
+                   if key not in ('path', 'verbosity') and isinstance(value, (str, int, type(None)))}
+        latest = {}
+        for model in registry.registry.keys():
+            if model is not trekking_models.Trek:
+                latest[model._meta.label] = str(model.latest_updated())
+        attachments = common_models.Attachment.objects.exclude(content_type__model='trek')
+        latest['attachments'] = [str(value) for value in attachments.aggregate(Max('date_update'), Count('pk')).values()]
+        return [settings.VERSION, options, latest]
+
+    def object_signature(self, lang, obj, related=()):
+        """ Inputs of the details of an object: its last update (and the one of related objects),
+        its attachments files, the language and inputs shared by all objects.
+        """
+        dates = [str(o.date_update) for o in [obj] + list(related)]
+        attachments = []
+        for attachment in obj.attachments.all():
+            path = os.path.join(settings.MEDIA_ROOT, attachment.attachment_file.name)
+            mtime = os.path.getmtime(path) if attachment.attachment_file and os.path.isfile(path) else None
+            attachments.append([attachment.pk, str(attachment.date_update), mtime])
+        signature = json.dumps([self.run_signature, lang, dates, sorted(attachments)], sort_keys=True)
+        return hashlib.md5(signature.encode()).hexdigest()
+
+    def reuse_outputs(self, entry):
+        """ Link files of an unchanged object from the previous synchronization,
+        if they are all still there.
+        """
+        if not all(os.path.isfile(os.path.join(self.dst_root, name)) for name in entry['files']):
+            return False
+        for name in entry['files']:
+            fullname = os.path.join(self.tmp_root, name)
+            if not os.path.exists(fullname):
+                self.mkdirs(fullname)
+                os.link(os.path.join(self.dst_root, name), fullname)
+        return True
+
+    def sync_detail_recorded(self, lang, obj, sync_detail):
+        """ Run sync_detail(lang, obj), returning the files written, the names to add to the
+        global zip file and if it was successfull.
+        """
+        zipfile, self.zipfile = self.zipfile, ZipRecorder()
+        successfull, self.successfull = self.successfull, True
+        self.outputs = []
+        try:
+            sync_detail(lang, obj)
+            return self.outputs, self.zipfile.namelist(), self.successfull
+        finally:
+            self.zipfile = zipfile
+            self.successfull = successfull
+            self.outputs = None
+
+    def sync_objects(self, lang, objects, sync_detail, signature):
+        """ Sync details of objects with sync_detail(lang, obj).
+
+        With --incremental, files of objects with the same signature(obj) as in the manifest
+        of previous synchronization are reused instead of being rendered again.
+        With --processes, other objects are synced by a pool of processes. Names written to
+        the global zip file are added afterwards, in the order of objects.
+        """
+        entries = []
+        tasks = []
+        for obj in objects:
+            key = '{}/{}/{}'.format(obj._meta.model_name, lang, obj.pk)
+            obj_signature = signature(obj)
+            entry = self.previous_manifest.get(key)
+            if self.incremental and entry and entry['signature'] == obj_signature and self.reuse_outputs(entry):
+                if self.verbosity == 2:
+                    self.stdout.write("{lang} {key} unchanged".format(lang=lang, key=key))
+                entries.append((key, entry))
+            else:
+                entries.append((key, None))
+                tasks.append((key, obj_signature, obj))
+
+        if self.processes > 1 and len(tasks) > 1:
+            global _pool_sync
+            _pool_sync = (self, lang, sync_detail, {obj.pk: obj for key, obj_signature, obj in tasks})
+            # Forked workers open their own database connections
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(self.processes) as pool:
+                results = pool.map(_sync_pool_object, [obj.pk for key, obj_signature, obj in tasks])
+            _pool_sync = None
+        else:
+            results = [self.sync_detail_recorded(lang, obj, sync_detail) for key, obj_signature, obj in tasks]
+
+        synced = {}
+        for (key, obj_signature, obj), (files, names, successfull) in zip(tasks, results):
+            synced[key] = {'signature': obj_signature, 'files': files, 'zip': names}
+            if not successfull:
+                # Sync again next time
+                synced[key]['signature'] = None
+                self.successfull = False
+
+        for key, entry in entries:
+            entry = entry or synced[key]
+            self.manifest[key] = entry
+            for name in entry['zip']:
+                if name not in self.zipfile.namelist():
+                    self.zipfile.write(os.path.join(self.tmp_root, name), name)
+
     def sync(self):
         step_value = int(50 / len(settings.MODELTRANSLATION_LANGUAGES))
         current_value = 30
@@ -425,11 +581,22 @@ class Command(BaseCommand):
         self.sync_pictograms('**', [tourism_models.InformationDeskType, tourism_models.TouristicContentCategory,
                                     tourism_models.TouristicContentType, tourism_models.TouristicEventType])
 
+        with open(os.path.join(self.tmp_root, MANIFEST_NAME), 'w') as f:
+            json.dump(self.manifest, f)
+
+    def load_manifest(self):
+        """ Manifest of objects synced by previous synchronization """
+        try:
+            with open(os.path.join(self.dst_root, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
     def check_dst_root_is_empty(self):
         if not os.path.exists(self.dst_root):
             return
         existing = set([os.path.basename(p) for p in os.listdir(self.dst_root)])
-        remaining = existing - set(('api', 'media', 'meta', 'static', 'zip'))
+        remaining = existing - set(('api', 'media', 'meta', 'static', 'zip', MANIFEST_NAME))
         if remaining:
             raise CommandError("Destination directory contains extra data")
 
@@ -482,6 +649,12 @@ class Command(BaseCommand):
         self.with_infrastructures = options.get('with_infrastructures', False)
         self.with_dives = options.get('with_dives', False)
         self.celery_task = options.get('task', None)
+        self.incremental = options.get('incremental', False)
+        self.processes = options.get('processes', 1)
+        self.outputs = None
+        self.manifest = {}
+        self.previous_manifest = self.load_manifest() if self.incremental else {}
+        self.run_signature = self.get_run_signature()
 
         if self.source is not None:
             self.source = self.source.split(',')
@@ -507,6 +680,9 @@ class Command(BaseCommand):
                 "The {}/ directory already exists. Please check no other sync_rando command is already running."
                 " If not, please delete this directory.".format(self.tmp_root)
             )
+        self.tile_store = common_sync.TileStore(settings.MOBILE_TILES_STORE or ':memory:',
+                                                max_age=common_sync.tiles_max_age())
+        self.tile_store.prune()
         try:
             self.sync()
             if self.celery_task:
@@ -523,6 +699,13 @@ class Command(BaseCommand):
         except Exception:
             shutil.rmtree(self.tmp_root)
             raise
+        finally:
+            self.tile_store.close()
+
+        if not self.skip_tiles:
+            logger.info("Tiles: %s" % self.tile_store)
+            if self.verbosity == 2:
+                self.stdout.write("Tiles: {}".format(self.tile_store))
 
         self.rename_root()
 
@@ -250,11 +250,14 @@ class BasePublishableMixin(models.Model):
     class Meta:
         abstract = True
 
-    def save(self, *args, **kwargs):
+    def update_publication_date(self):
         if self.publication_date is None and self.any_published:
             self.publication_date = datetime.date.today()
         if self.publication_date is not None and not self.any_published:
             self.publication_date = None
+
+    def save(self, *args, **kwargs):
+        self.update_publication_date()
         super(BasePublishableMixin, self).save(*args, **kwargs)
 
     @property
@@ -403,9 +406,28 @@ class AddPropertyMixin(object):
     def add_property(cls, name, func, verbose_name):
         if hasattr(cls, name):
             raise AttributeError("%s has already an attribute %s" % (cls, name))
-        setattr(cls, name, property(func))
+
+        def getter(self):
+            # Value already resolved in bulk (see ``add_bulk_resolver``)
+            if '_%s' % name in self.__dict__:
+                return self.__dict__['_%s' % name]
+            return func(self)
+        setattr(cls, name, property(getter))
         setattr(cls, '%s_verbose_name' % name, verbose_name)
 
+    @classmethod
+    def add_bulk_resolver(cls, name, func):
+        """
+        Declare a function computing the property ``name`` of many objects at once.
+        It takes a list of objects and returns values by object pk.
+        Used by MapEntity lists and exports (see ``mapentity.serializers.ColumnsPlan``).
+        """
+        if name not in cls.__dict__:
+            raise AttributeError("%s has no property %s" % (cls, name))
+        if 'bulk_resolvers' not in cls.__dict__:
+            cls.bulk_resolvers = {}
+        cls.bulk_resolvers[name] = func
+
 
 def transform_pdf_booklet_callback(response):
     content = response.content
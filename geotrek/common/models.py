@@ -1,11 +1,15 @@
+from functools import partial
 import os
 from PIL import Image
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
+from mapentity.models import MapEntityMixin
 from paperclip.models import FileType as BaseFileType, Attachment as BaseAttachment
 
 from geotrek.authent.models import StructureOrNoneRelated
@@ -49,6 +53,10 @@ class FileType(StructureOrNoneRelated, BaseFileType):
 class Attachment(BaseAttachment):
 
     creation_date = models.DateField(verbose_name=_("Creation Date"), null=True, blank=True)
+    # Source of imported attachments, and validators (ETag, Last-Modified) of its download
+    source_url = models.CharField(max_length=2048, blank=True, default='', db_index=True, editable=False)
+    source_etag = models.CharField(max_length=256, blank=True, default='', editable=False)
+    source_last_modified = models.CharField(max_length=64, blank=True, default='', editable=False)
 
 
 class Theme(PictogramMixin):
@@ -155,3 +163,15 @@ class Label(OptionalPictogramMixin):
 
     def __str__(self):
         return self.name
+
+
+@receiver(post_save, dispatch_uid="precompute_layers_on_save")
+@receiver(post_delete, dispatch_uid="precompute_layers_on_delete")
+def precompute_layers_on_change(sender, instance, **kwargs):
+    """ Refresh layers in background once changes of a map entity are committed.
+    Saves of the same model are debounced into a single task.
+    """
+    if not settings.LAYERS_PRECOMPUTE_ENABLED or not isinstance(instance, MapEntityMixin):
+        return
+    from geotrek.common.tasks import schedule_precompute_layers
+    transaction.on_commit(partial(schedule_precompute_layers, sender._meta.label))
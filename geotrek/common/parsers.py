@@ -1,24 +1,34 @@
 import os
 import re
+import hashlib
+import json
+import queue
 import requests
 import logging
+import threading
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 import textwrap
 import xlrd
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
-from collections import Iterable
-from time import sleep
+from collections import Iterable, namedtuple
+from itertools import islice
+from time import monotonic, sleep
 
-from ftplib import FTP
+from ftplib import FTP, all_errors as ftp_errors
 from os.path import dirname
 from urllib.parse import urlparse
 
-from django.db import models, connection
+from django.db import models, connection, transaction
+from django.db.models import prefetch_related_objects
 from django.db.utils import DatabaseError
 from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.gdal import DataSource, GDALException, CoordTransform
 from django.contrib.gis.geos import Point
+from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
 from django.template.loader import render_to_string
 from django.utils import translation
@@ -28,7 +38,9 @@ from django.conf import settings
 from paperclip.models import attachment_upload
 
 from geotrek.authent.models import default_structure
+from geotrek.common.mixins import BasePublishableMixin
 from geotrek.common.models import FileType, Attachment
+from geotrek.common.utils import uniquify
 
 if 'modeltranslation' in settings.INSTALLED_APPS:
     from modeltranslation.fields import TranslationField
@@ -57,6 +69,9 @@ class DownloadImportError(ImportError):
     pass
 
 
+ParsedObject = namedtuple('ParsedObject', ['obj', 'row', 'operation', 'update_fields', 'line', 'eid_val'])
+
+
 class Parser(object):
     label = None
     model = None
@@ -77,8 +92,17 @@ class Parser(object):
     non_fields = {}
     natural_keys = {}
     field_options = {}
+    prefetch_size = 50  # rows
+    bulk = False  # Save objects by batches of prefetch_size rows (see flush())
+    pages_dir = None  # Keep pages of APIs in this directory until the import succeeds (see PageReader)
 
     def __init__(self, progress_cb=None, user=None, encoding='utf8'):
+        self.session = requests.Session()
+        self.related_objects = {}
+        self.eid_objects = {}
+        self.parsed_objects = []
+        self.m2m_values = {}
+        self.page_files = set()
         self.warnings = {}
         self.line = 0
         self.nb_success = 0
@@ -188,7 +212,9 @@ class Parser(object):
             raise RowImportError(_("Blank value not allowed for field '{src}'".format(src=src)))
         if isinstance(field, models.CharField):
             val = val[:256]
-        if isinstance(field, models.ManyToManyField):
+        if isinstance(field, models.ManyToManyField) and self.bulk:
+            self.m2m_values.setdefault(dst, {})[self.obj.pk] = val
+        elif isinstance(field, models.ManyToManyField):
             fk = getattr(self.obj, dst)
             fk.set(val)
         else:
@@ -260,10 +286,19 @@ class Parser(object):
         except RowImportError as warnings:
             self.add_warning(str(warnings))
             return
+        if self.bulk:
+            self.parsed_objects.append(ParsedObject(self.obj, row, operation, update_fields, self.line, self.eid_val))
+            if operation == "created" and self.eid is not None:
+                self.eid_objects[self.eid_key(self.eid_val)] = [self.obj]
+            return
         if operation == "created":
             self.obj.save()
         else:
             self.obj.save(update_fields=update_fields)
+        self.parse_relations(row, operation, update_fields)
+
+    def parse_relations(self, row, operation, update_fields):
+        """Parse many to many and non fields of saved object"""
         update_fields += self.parse_fields(row, self.m2m_fields)
         update_fields += self.parse_fields(row, self.m2m_constant_fields)
         update_fields += self.parse_fields(row, self.non_fields, non_field=True)
@@ -274,6 +309,137 @@ class Parser(object):
         else:
             self.nb_unmodified += 1
 
+    def flush(self):
+        """
+        Save objects parsed in bulk mode (without calling their save() method) with one query
+        for creations and one for updates, then their many to many fields with one query
+        by table, and finally parse their non fields.
+        If bulk save fails, objects are saved one by one, to report errors for each line.
+        """
+        parsed_objects, self.parsed_objects = self.parsed_objects, []
+        if not parsed_objects:
+            return
+        created = uniquify(parsed.obj for parsed in parsed_objects if parsed.operation == "created")
+        updated = {}
+        update_fields = set()
+        for parsed in parsed_objects:
+            if parsed.operation == "updated" and parsed.obj.pk is not None and parsed.update_fields:
+                updated[parsed.obj.pk] = parsed.obj
+                update_fields.update(parsed.update_fields)
+        for obj in created + list(updated.values()):
+            if isinstance(obj, BasePublishableMixin):
+                obj.update_publication_date()
+                update_fields.add('publication_date')
+        for field in self.model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                for obj in updated.values():
+                    field.pre_save(obj, add=False)
+                update_fields.add(field.name)
+        try:
+            if created or updated:
+                with transaction.atomic():
+                    self.model.objects.bulk_create(created)
+                    if updated:
+                        self.model.objects.bulk_update(updated.values(), list(update_fields))
+        except DatabaseError:
+            if settings.DEBUG:
+                raise
+            for obj in created:
+                obj.pk = None
+                obj._state.adding = True
+            parsed_objects = self.save_one_by_one(parsed_objects)
+
+        saved = uniquify(parsed.obj for parsed in parsed_objects)
+        try:
+            with transaction.atomic():
+                prefetch_related_objects(saved, *(list(self.m2m_fields) + list(self.m2m_constant_fields)))
+        except DatabaseError:
+            if settings.DEBUG:
+                raise
+            # Relations are then fetched object by object, to report errors for each line
+        relations = []
+        for parsed in parsed_objects:
+            self.obj, self.line, self.eid_val = parsed.obj, parsed.line, parsed.eid_val
+            try:
+                update_fields = list(parsed.update_fields)
+                update_fields += self.parse_fields(parsed.row, self.m2m_fields)
+                update_fields += self.parse_fields(parsed.row, self.m2m_constant_fields)
+            except (ValueImportError, RowImportError, DatabaseError) as e:
+                self.add_warning(str(e))
+                continue
+            relations.append(parsed._replace(update_fields=update_fields))
+        failed = self.save_m2m_values(parsed_objects)
+
+        for parsed in relations:
+            if parsed.obj.pk in failed:
+                continue
+            self.obj, self.line, self.eid_val = parsed.obj, parsed.line, parsed.eid_val
+            try:
+                update_fields = parsed.update_fields + self.parse_fields(parsed.row, self.non_fields, non_field=True)
+            except (ValueImportError, RowImportError) as e:
+                self.add_warning(str(e))
+                continue
+            if parsed.operation == "created":
+                self.nb_created += 1
+            elif update_fields:
+                self.nb_updated += 1
+            else:
+                self.nb_unmodified += 1
+
+    def save_one_by_one(self, parsed_objects):
+        """Returns parsed objects successfully saved"""
+        saved = []
+        for parsed in parsed_objects:
+            self.line, self.eid_val = parsed.line, parsed.eid_val
+            try:
+                with transaction.atomic():
+                    if parsed.obj.pk is None:
+                        parsed.obj.save()
+                    else:
+                        parsed.obj.save(update_fields=parsed.update_fields)
+            except DatabaseError as e:
+                self.add_warning(str(e))
+                continue
+            saved.append(parsed)
+        return saved
+
+    def save_m2m_values(self, parsed_objects):
+        """
+        Replace many to many relations set in bulk mode, with two queries by table.
+        If it fails, relations are set object by object, to report errors for each line.
+        Returns pks of objects whose relations could not be saved.
+        """
+        m2m_values, self.m2m_values = self.m2m_values, {}
+        try:
+            with transaction.atomic():
+                for dst, values in m2m_values.items():
+                    field = self.model._meta.get_field(dst)
+                    through = field.remote_field.through
+                    source_name = field.m2m_field_name()
+                    target_name = field.m2m_reverse_field_name()
+                    through.objects.filter(**{'{}__in'.format(source_name): list(values)}).delete()
+                    through.objects.bulk_create([
+                        through(**{'{}_id'.format(source_name): pk, '{}_id'.format(target_name): target.pk})
+                        for pk, targets in values.items() for target in targets
+                    ])
+            return set()
+        except DatabaseError:
+            if settings.DEBUG:
+                raise
+        parsed_by_pk = {parsed.obj.pk: parsed for parsed in parsed_objects}
+        failed = set()
+        for dst, values in m2m_values.items():
+            for pk, targets in values.items():
+                parsed = parsed_by_pk[pk]
+                self.obj, self.line, self.eid_val = parsed.obj, parsed.line, parsed.eid_val
+                try:
+                    with transaction.atomic():
+                        getattr(parsed.obj, dst).set(targets)
+                except DatabaseError as e:
+                    self.add_warning(str(e))
+                    failed.add(pk)
+        return failed
+
     def get_eid_kwargs(self, row):
         try:
             eid_src = self.fields[self.eid]
@@ -290,6 +456,35 @@ class Parser(object):
         self.eid_val = eid_val
         return {self.eid: eid_val}
 
+    def eid_key(self, val):
+        """Returns eid value as read from database, to match rows with prefetched objects"""
+        try:
+            return self.model._meta.get_field(self.eid).to_python(val)
+        except ValidationError:
+            return val
+
+    def get_eid_objects(self, eid_kwargs):
+        """Returns objects with row eid, using those prefetched in bulk mode"""
+        key = self.eid_key(eid_kwargs[self.eid])
+        if key in self.eid_objects:
+            return list(self.eid_objects[key])
+        return self.model.objects.filter(**eid_kwargs)
+
+    def prefetch_eid_objects(self, rows):
+        """Fetch objects of a batch of rows with one query"""
+        self.eid_objects = {}
+        for row in rows:
+            try:
+                self.eid_objects[self.eid_key(self.get_eid_kwargs(row)[self.eid])] = []
+            except ImportError:
+                continue  # Errors are reported when the row is parsed
+        field = self.model._meta.get_field(self.eid)
+        objects = self.model.objects.filter(**{'{}__in'.format(self.eid): list(self.eid_objects)})
+        if hasattr(self.model, 'structure'):
+            objects = objects.select_related('structure')
+        for obj in objects:
+            self.eid_objects[field.to_python(getattr(obj, field.attname))].append(obj)
+
     def parse_row(self, row):
         self.eid_val = None
         self.line += 1
@@ -302,7 +497,7 @@ class Parser(object):
             except RowImportError as warnings:
                 self.add_warning(str(warnings))
                 return
-            objects = self.model.objects.filter(**eid_kwargs)
+            objects = self.get_eid_objects(eid_kwargs)
         if len(objects) == 0 and self.update_only:
             if self.warn_on_missing_objects:
                 self.add_warning(_("Bad value '{eid_val}' for field '{eid_src}'. No object with this identifier").format(eid_val=self.eid_val, eid_src=self.eid_src))
@@ -364,6 +559,24 @@ class Parser(object):
                 val = mapping[val]
         return val
 
+    def get_related_object(self, model, fields, create=False):
+        """
+        Returns a tuple (object, created), object being None if it does not exist.
+        Objects are memoized for the duration of the import.
+        """
+        key = (model, create, tuple(sorted(fields.items())))
+        if key in self.related_objects:
+            return self.related_objects[key], False
+        if create:
+            obj, created = model.objects.get_or_create(**fields)
+        else:
+            try:
+                obj, created = model.objects.get(**fields), False
+            except model.DoesNotExist:
+                obj, created = None, False
+        self.related_objects[key] = obj
+        return obj, created
+
     def filter_fk(self, src, val, model, field, mapping=None, partial=False, create=False, fk=None, **kwargs):
         val = self.get_mapping(src, val, mapping, partial)
         if val is None:
@@ -371,16 +584,12 @@ class Parser(object):
         fields = {field: val}
         if fk:
             fields[fk] = getattr(self.obj, fk)
-        if create:
-            val, created = model.objects.get_or_create(**fields)
-            if created:
-                self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=val))
-            return val
-        try:
-            return model.objects.get(**fields)
-        except model.DoesNotExist:
+        obj, created = self.get_related_object(model, fields, create)
+        if created:
+            self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=obj))
+        elif obj is None:
             self.add_warning(_("{model} '{val}' does not exists in Geotrek-Admin. Please add it").format(model=model._meta.verbose_name.title(), val=val))
-            return None
+        return obj
 
     def filter_m2m(self, src, val, model, field, mapping=None, partial=False, create=False, fk=None, **kwargs):
         if not val:
@@ -396,17 +605,13 @@ class Parser(object):
             fields = {field: subval}
             if fk:
                 fields[fk] = getattr(self.obj, fk)
-            if create:
-                subval, created = model.objects.get_or_create(**fields)
-                if created:
-                    self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=subval))
-                dst.append(subval)
-                continue
-            try:
-                dst.append(model.objects.get(**fields))
-            except model.DoesNotExist:
+            obj, created = self.get_related_object(model, fields, create)
+            if created:
+                self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=obj))
+            elif obj is None:
                 self.add_warning(_("{model} '{val}' does not exists in Geotrek-Admin. Please add it").format(model=model._meta.verbose_name.title(), val=subval))
                 continue
+            dst.append(obj)
         return dst
 
     def get_to_delete_kwargs(self):
@@ -436,6 +641,8 @@ class Parser(object):
         return kwargs
 
     def start(self):
+        if self.bulk and self.model._meta.parents:
+            raise GlobalImportError(_("Bulk mode is not available for {model}").format(model=self.model._meta.verbose_name))
         kwargs = self.get_to_delete_kwargs()
         if kwargs is None:
             self.to_delete = set()
@@ -445,6 +652,10 @@ class Parser(object):
     def end(self):
         if self.delete:
             self.model.objects.filter(pk__in=self.to_delete).delete()
+        for path in self.page_files:
+            if os.path.exists(path):
+                os.remove(path)
+        self.page_files = set()
 
     def parse(self, filename=None, limit=None):
         if filename:
@@ -454,35 +665,66 @@ class Parser(object):
         if self.filename and not os.path.exists(self.filename):
             raise GlobalImportError(_("File does not exists at: {filename}").format(filename=self.filename))
         self.start()
-        for i, row in enumerate(self.next_row()):
-            if limit and i >= limit:
-                break
-            try:
-                self.parse_row(row)
-            except DatabaseError as e:
-                if settings.DEBUG:
-                    raise
-                self.add_warning(str(e).decode('utf8'))
-            except (ValueImportError, RowImportError) as e:
-                self.add_warning(str(e))
-            except Exception as e:
-                raise
-                if settings.DEBUG:
+        rows = self.next_row()
+        if limit:
+            rows = islice(rows, limit)
+        batch = list(islice(rows, self.prefetch_size))
+        while batch:
+            self.prefetch(batch)
+            for row in batch:
+                try:
+                    self.parse_row(row)
+                except DatabaseError as e:
+                    if settings.DEBUG:
+                        raise
+                    self.add_warning(str(e).decode('utf8'))
+                except (ValueImportError, RowImportError) as e:
+                    self.add_warning(str(e))
+                except Exception as e:
                     raise
-                self.add_warning(str(e))
+                    if settings.DEBUG:
+                        raise
+                    self.add_warning(str(e))
+            self.flush()
+            batch = list(islice(rows, self.prefetch_size))
         self.end()
 
+    def prefetch(self, rows):
+        """Fetch resources needed by a batch of rows at once, before they are parsed"""
+        if self.bulk and self.eid is not None:
+            self.prefetch_eid_objects(rows)
+
+    def page_request(self, skip):
+        """Returns url and keyword arguments of request_or_retry() for the API page starting at row skip"""
+        return self.url, {}
+
+    def page_count(self, page):
+        """
+        Returns the total number of rows of a paginated API, given one of its pages.
+        Must be overridden to read pages of a given size with fetch_pages().
+        """
+        raise NotImplementedError
+
+    def fetch_pages(self, size=None, skip=0):
+        """
+        Iterate on pages of a JSON API, of size rows (or a single page if size is None),
+        fetched in background (see PageReader).
+        """
+        assert size is None or type(self).page_count is not Parser.page_count, \
+            "{} must override page_count() to read pages of {} rows".format(type(self).__name__, size)
+        return PageReader(self, size, skip, queue_size=settings.PARSER_PREFETCH_PAGES, pages_dir=self.pages_dir)
+
     def request_or_retry(self, url, verb='get', **kwargs):
         try_get = settings.PARSER_NUMBER_OF_TRIES
         assert try_get > 0
         while try_get:
-            action = getattr(requests, verb)
+            action = getattr(self.session, verb)
             response = action(url, allow_redirects=True, **kwargs)
             if response.status_code in settings.PARSER_RETRY_HTTP_STATUS:
                 logger.info("Failed to fetch url {}. Retrying ...".format(url))
                 sleep(settings.PARSER_RETRY_SLEEP_TIME)
                 try_get -= 1
-            elif response.status_code == 200:
+            elif response.status_code in (requests.codes.ok, requests.codes.not_modified):
                 return response
             else:
                 break
@@ -490,6 +732,99 @@ class Parser(object):
         raise DownloadImportError(_("Failed to download {url}. HTTP status code {status_code}").format(url=response.url, status_code=response.status_code))
 
 
+class PageReader(object):
+    """
+    Iterate on pages (decoded JSON) of the API of a parser, fetched by a background thread
+    at most ``queue_size`` pages ahead of the parsed rows (synchronously if ``queue_size`` is 0).
+    Requests are sent by ``parser.request_or_retry()``, so that they are retried as configured
+    by ``PARSER_RETRY_*`` settings.
+
+    When ``pages_dir`` is set, pages are stored in it, and read from it instead of requested
+    again by next imports, until an import ends successfully. A failed import can then be
+    replayed without requesting the pages already fetched.
+    """
+    end = object()
+
+    def __init__(self, parser, size=None, skip=0, queue_size=0, pages_dir=None):
+        self.parser = parser
+        self.size = size
+        self.skip = skip
+        self.queue_size = queue_size
+        self.pages_dir = pages_dir
+
+    def page_path(self, url, kwargs):
+        if not self.pages_dir:
+            return None
+        key = json.dumps([url, kwargs.get('params')], sort_keys=True)
+        return os.path.join(self.pages_dir, '{name}-{hash}.json'.format(
+            name=self.parser.__class__.__name__, hash=hashlib.sha1(key.encode()).hexdigest()))
+
+    def fetch(self, skip):
+        url, kwargs = self.parser.page_request(skip)
+        path = self.page_path(url, kwargs)
+        if path is None:
+            return self.parser.request_or_retry(url, **kwargs).json()
+        self.parser.page_files.add(path)
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        page = self.parser.request_or_retry(url, **kwargs).json()
+        os.makedirs(self.pages_dir, exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(page, f)
+        os.replace(path + '.tmp', path)
+        return page
+
+    def pages(self):
+        skip = self.skip
+        while True:
+            page = self.fetch(skip)
+            yield page
+            if self.size is None:
+                return
+            skip += self.size
+            if skip >= self.parser.page_count(page):
+                return
+
+    def __iter__(self):
+        if not self.queue_size:
+            yield from self.pages()
+            return
+        pages = queue.Queue(maxsize=self.queue_size)
+        stopped = threading.Event()
+
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    pages.put(item, timeout=1)
+                    return
+                except queue.Full:
+                    continue
+
+        def run():
+            try:
+                for page in self.pages():
+                    put(page)
+                    if stopped.is_set():
+                        return
+                put(self.end)
+            except Exception as e:
+                put(e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while True:
+                page = pages.get()
+                if page is self.end:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+        finally:
+            stopped.set()
+
+
 class ShapeParser(Parser):
     def next_row(self):
         datasource = DataSource(self.filename, encoding=self.encoding)
@@ -553,6 +888,121 @@ class AtomParser(Parser):
             yield row
 
 
+AttachmentRequest = namedtuple('AttachmentRequest', ['verb', 'url', 'etag', 'last_modified'])
+AttachmentResponse = namedtuple('AttachmentResponse', ['modified', 'content', 'size', 'etag', 'last_modified'])
+
+
+class AttachmentDownloader(object):
+    """
+    Send attachments requests of a parser (``get`` or ``head``, conditional when validators are
+    given) through its HTTP session, and through FTP connections reused for each host.
+
+    Requests expected for a batch of rows are sent in background by ``workers`` threads
+    (``prefetch()``) and their responses consumed when rows are parsed (``get()``).
+    At most ``host_rate`` requests per second are sent to each host.
+    """
+    def __init__(self, parser, workers=1, host_rate=None):
+        self.parser = parser
+        self.workers = max(workers, 1)
+        self.interval = 1.0 / host_rate if host_rate else 0
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        parser.session.mount('http://', adapter)
+        parser.session.mount('https://', adapter)
+        self.executor = None
+        self.prefetched = {}
+        self.lock = threading.Lock()
+        self.host_slots = {}  # Time of next request, by host
+        self.ftp_connections = {}  # Idle connections, by host and credentials
+
+    def wait_for_host(self, host):
+        if not self.interval:
+            return
+        with self.lock:
+            now = monotonic()
+            slot = max(now, self.host_slots.get(host, now))
+            self.host_slots[host] = slot + self.interval
+        if slot > now:
+            sleep(slot - now)
+
+    def fetch(self, request):
+        parsed_url = urlparse(request.url)
+        self.wait_for_host(parsed_url.hostname)
+        if parsed_url.scheme == 'ftp':
+            return self.fetch_ftp(request, parsed_url)
+        headers = {}
+        if request.etag:
+            headers['If-None-Match'] = request.etag
+        if request.last_modified:
+            headers['If-Modified-Since'] = request.last_modified
+        response = self.parser.request_or_retry(request.url, verb=request.verb, headers=headers)
+        if response.status_code == requests.codes.not_modified:
+            return AttachmentResponse(False, None, None, request.etag, request.last_modified)
+        etag = response.headers.get('ETag', '')
+        last_modified = response.headers.get('Last-Modified', '')
+        if request.verb == 'head':
+            size = response.headers.get('content-length')
+            size = int(size) if size is not None else None
+            return AttachmentResponse(True, None, size, etag, last_modified)
+        return AttachmentResponse(True, response.content, len(response.content), etag, last_modified)
+
+    def fetch_ftp(self, request, parsed_url):
+        key = (parsed_url.hostname, parsed_url.port, parsed_url.username, parsed_url.password)
+        with self.lock:
+            idle = self.ftp_connections.get(key)
+            ftp = idle.pop() if idle else None
+        try:
+            if ftp is None:
+                ftp = FTP()
+                ftp.connect(parsed_url.hostname, parsed_url.port or 21)
+                ftp.login(user=parsed_url.username, passwd=parsed_url.password)
+            ftp.cwd(dirname(parsed_url.path) or '/')
+            filename = os.path.basename(parsed_url.path)
+            if request.verb == 'head':
+                response = AttachmentResponse(True, None, ftp.size(filename), '', '')
+            else:
+                chunks = []
+                ftp.retrbinary('RETR {}'.format(filename), chunks.append)
+                content = b''.join(chunks)
+                response = AttachmentResponse(True, content, len(content), '', '')
+        except ftp_errors as e:
+            if ftp is not None:
+                ftp.close()
+            raise DownloadImportError(_("Failed to download {url}: {exc}").format(url=request.url, exc=e))
+        with self.lock:
+            self.ftp_connections.setdefault(key, []).append(ftp)
+        return response
+
+    def prefetch(self, attachment_requests):
+        """Send requests in background. Responses of previous prefetch are discarded."""
+        self.prefetched = {}
+        if self.workers < 2:
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        for request in attachment_requests:
+            if request not in self.prefetched:
+                self.prefetched[request] = self.executor.submit(self.fetch, request)
+
+    def get(self, request):
+        """Returns the response of a request, waiting for it if it was prefetched"""
+        if request in self.prefetched:
+            return self.prefetched[request].result()
+        return self.fetch(request)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.prefetched = {}
+        for connections in self.ftp_connections.values():
+            for ftp in connections:
+                try:
+                    ftp.quit()
+                except ftp_errors:
+                    ftp.close()
+        self.ftp_connections = {}
+
+
 class AttachmentParserMixin(object):
     download_attachments = True
     base_url = ''
@@ -575,53 +1025,107 @@ class AttachmentParserMixin(object):
                 raise GlobalImportError(_("FileType '{name}' does not exists in "
                                           "Geotrek-Admin. Please add it").format(name=self.filetype_name))
         self.creator, created = get_user_model().objects.get_or_create(username='import', defaults={'is_active': False})
+        self.downloader = AttachmentDownloader(self, settings.PARSER_ATTACHMENTS_WORKERS,
+                                               settings.PARSER_ATTACHMENTS_HOST_RATE)
+
+    def end(self):
+        self.downloader.close()
+        super(AttachmentParserMixin, self).end()
 
     def filter_attachments(self, src, val):
         if not val:
             return []
         return [(subval.strip(), '', '') for subval in val.split(self.separator) if subval.strip()]
 
-    def has_size_changed(self, url, attachment):
-        parsed_url = urlparse(url)
-        if parsed_url.scheme == 'ftp':
-            directory = dirname(parsed_url.path)
-
-            ftp = FTP(parsed_url.hostname)
-            ftp.login(user=parsed_url.username, passwd=parsed_url.password)
-            ftp.cwd(directory)
-            size = ftp.size(parsed_url.path.split('/')[-1:][0])
-            return size != attachment.attachment_file.size
-
-        if parsed_url.scheme == 'http' or parsed_url.scheme == 'https':
+    def is_downloaded(self, url):
+        scheme = urlparse(url).scheme
+        return scheme == 'ftp' or (scheme in ('http', 'https') and self.download_attachments)
+
+    def attachment_request(self, url, attachment=None):
+        """
+        Returns the first request to send for url, given the attachment previously downloaded from it:
+        conditional get if validators of the previous download are known, else head to compare sizes.
+        """
+        if attachment is None or attachment.source_url != url:
+            return AttachmentRequest('get', url, '', '')
+        if urlparse(url).scheme != 'ftp' and (attachment.source_etag or attachment.source_last_modified):
+            return AttachmentRequest('get', url, attachment.source_etag, attachment.source_last_modified)
+        return AttachmentRequest('head', url, '', '')
+
+    def prefetch(self, rows):
+        super(AttachmentParserMixin, self).prefetch(rows)
+        if 'attachments' not in self.non_fields:
+            return
+        src = self.normalize_src(self.non_fields['attachments'])
+        rows_urls = []
+        for row in rows:
             try:
-                response = self.request_or_retry(url, verb='head')
-            except DownloadImportError as e:
-                raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
-            size = response.headers.get('content-length')
-            return size is not None and int(size) != attachment.attachment_file.size
-
+                attachments = self.filter_attachments(src, self.get_val(row, 'attachments', src))
+                eid = self.eid_key(self.get_eid_kwargs(row)[self.eid]) if self.eid is not None else None
+            except Exception:
+                continue  # Errors are reported when the row is parsed
+            urls = [self.base_url + attachment[0] for attachment in attachments]
+            rows_urls.append((eid, [url for url in urls if self.is_downloaded(url)]))
+        self.downloader.prefetch(self.prefetch_attachment_requests(rows_urls))
+
+    def prefetch_attachment_requests(self, rows_urls):
+        """
+        Returns the first requests to send for attachments urls of rows, given as (eid, urls) tuples.
+        As in save_attachments, requests depend on the attachment previously downloaded from the same url
+        for the same object.
+        """
+        eids = {eid for eid, urls in rows_urls if eid is not None}
+        objects_pks = {}
+        if self.bulk:
+            objects_pks = {eid: [obj.pk for obj in self.eid_objects.get(eid, [])] for eid in eids}
+        elif eids:
+            for pk, eid in self.model.objects.filter(**{'{}__in'.format(self.eid): eids}).values_list('pk', self.eid):
+                objects_pks.setdefault(self.eid_key(eid), []).append(pk)
+        content_type = ContentType.objects.get_for_model(self.model)
+        previous = Attachment.objects.filter(
+            content_type=content_type,
+            object_id__in=[pk for pks in objects_pks.values() for pk in pks],
+            source_url__in={url for eid, urls in rows_urls for url in urls},
+        )
+        previous = {(attachment.object_id, attachment.content_type_id, attachment.source_url): attachment
+                    for attachment in previous}
+        attachment_requests = []
+        for eid, urls in rows_urls:
+            for pk in objects_pks.get(eid) or [None]:
+                attachment_requests += [self.attachment_request(url, previous.get((pk, content_type.pk, url)))
+                                        for url in urls]
+        return attachment_requests
+
+    def download(self, request):
+        try:
+            return self.downloader.get(request)
+        except DownloadImportError as e:
+            raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
+
+    def check_attachment(self, url, attachment):
+        """
+        Compares the file of attachment with the one at url, using validators (ETag, Last-Modified)
+        of the previous download, or else sizes. Returns a tuple (changed, response).
+        """
+        if not self.is_downloaded(url):
+            return True, None
+        request = self.attachment_request(url, attachment)
+        response = self.download(request)
+        if not response.modified:
+            return False, response
+        if request.etag or request.last_modified:
+            return True, response
+        changed = response.size is not None and response.size != attachment.attachment_file.size
+        return changed, response
+
+    def set_attachment_source(self, attachment, url, response):
+        """Returns True if the url or validators of the attachment download changed"""
+        source = (url, response.etag, response.last_modified)
+        if source == (attachment.source_url, attachment.source_etag, attachment.source_last_modified):
+            return False
+        attachment.source_url, attachment.source_etag, attachment.source_last_modified = source
         return True
 
-    def download_attachment(self, url):
-        parsed_url = urlparse(url)
-        if parsed_url.scheme == 'ftp':
-            try:
-                response = self.request_or_retry(url)
-            except DownloadImportError as e:
-                raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
-            return response.read()
-        else:
-            if self.download_attachments:
-                try:
-                    response = self.request_or_retry(url)
-                except DownloadImportError as e:
-                    raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
-                if response.status_code != requests.codes.ok:
-                    self.add_warning(_("Failed to download '{url}'").format(url=url))
-                    return None
-                return response.content
-            return None
-
     def save_attachments(self, src, val):
         updated = False
         attachments_to_delete = list(Attachment.objects.attachments_for_object(self.obj))
@@ -632,25 +1136,31 @@ class AttachmentParserMixin(object):
             basename, ext = os.path.splitext(os.path.basename(url))
             name = '%s%s' % (basename[:128], ext)
             found = False
+            download = None
             for attachment in attachments_to_delete:
                 upload_name, ext = os.path.splitext(attachment_upload(attachment, name))
                 existing_name = attachment.attachment_file.name
-                if re.search(r"^{name}(_[a-zA-Z0-9]{{7}})?{ext}$".format(
-                        name=upload_name, ext=ext), existing_name
-                ) and not self.has_size_changed(url, attachment):
-                    found = True
-                    attachments_to_delete.remove(attachment)
-                    if author != attachment.author or legend != attachment.legend:
-                        attachment.author = author
-                        attachment.legend = textwrap.shorten(legend, width=127)
-                        attachment.save()
-                        updated = True
-                    break
+                if not re.search(r"^{name}(_[a-zA-Z0-9]{{7}})?{ext}$".format(
+                        name=upload_name, ext=ext), existing_name):
+                    continue
+                changed, response = self.check_attachment(url, attachment)
+                if changed:
+                    if response is not None and response.content is not None:
+                        download = response
+                    continue
+                found = True
+                attachments_to_delete.remove(attachment)
+                modified = self.set_attachment_source(attachment, url, response)
+                if author != attachment.author or legend != attachment.legend:
+                    attachment.author = author
+                    attachment.legend = textwrap.shorten(legend, width=127)
+                    modified = updated = True
+                if modified:
+                    attachment.save()
+                break
             if found:
                 continue
 
-            parsed_url = urlparse(url)
-
             attachment = Attachment()
             attachment.content_object = self.obj
             attachment.filetype = self.filetype
@@ -658,12 +1168,11 @@ class AttachmentParserMixin(object):
             attachment.author = author
             attachment.legend = textwrap.shorten(legend, width=127)
 
-            if (parsed_url.scheme in ('http', 'https') and self.download_attachments) or parsed_url.scheme == 'ftp':
-                content = self.download_attachment(url)
-                if content is None:
-                    continue
-                f = ContentFile(content)
-                attachment.attachment_file.save(name, f, save=False)
+            if self.is_downloaded(url):
+                if download is None:
+                    download = self.download(self.attachment_request(url))
+                self.set_attachment_source(attachment, url, download)
+                attachment.attachment_file.save(name, ContentFile(download.content), save=False)
             else:
                 attachment.attachment_link = url
             attachment.save()
@@ -687,27 +1196,27 @@ class TourInSoftParser(AttachmentParserMixin, Parser):
         return self.root['d']['results']
 
     def get_nb(self):
+        return self.page_count(self.root)
+
+    def page_count(self, page):
         if self.version_tourinsoft == 3:
-            return int(self.root['odata.count'])
-        return int(self.root['d']['__count'])
+            return int(page['odata.count'])
+        return int(page['d']['__count'])
+
+    def page_request(self, skip):
+        params = {
+            '$format': 'json',
+            '$inlinecount': 'allpages',
+            '$top': 1000,
+            '$skip': skip,
+        }
+        return self.url, {'params': params}
 
     def next_row(self):
-        skip = 0
-        while True:
-            params = {
-                '$format': 'json',
-                '$inlinecount': 'allpages',
-                '$top': 1000,
-                '$skip': skip,
-            }
-            response = self.request_or_retry(self.url, params=params)
-            self.root = response.json()
+        for self.root in self.fetch_pages(size=1000):
             self.nb = self.get_nb()
             for row in self.items:
                 yield {self.normalize_field_name(src): val for src, val in row.items()}
-            skip += 1000
-            if skip >= self.nb:
-                return
 
     def filter_attachments(self, src, val):
         if not val:
@@ -795,22 +1304,21 @@ class TourismSystemParser(AttachmentParserMixin, Parser):
     def items(self):
         return self.root['data']
 
+    def page_count(self, page):
+        return int(page['metadata']['total'])
+
+    def page_request(self, skip):
+        params = {
+            'size': 1000,
+            'start': skip,
+        }
+        return self.url, {'params': params, 'authent': HTTPBasicAuth(self.login, self.password)}
+
     def next_row(self):
-        size = 1000
-        skip = 0
-        while True:
-            params = {
-                'size': size,
-                'start': skip,
-            }
-            response = self.request_or_retry(self.url, params=params, authent=HTTPBasicAuth(self.login, self.password))
-            self.root = response.json()
-            self.nb = int(self.root['metadata']['total'])
+        for self.root in self.fetch_pages(size=1000):
+            self.nb = self.page_count(self.root)
             for row in self.items:
                 yield {self.normalize_field_name(src): val for src, val in row.items()}
-            skip += size
-            if skip >= self.nb:
-                return
 
     def filter_attachments(self, src, val):
         result = []
@@ -7,6 +7,7 @@ from os.path import join
 import sys
 from celery import Task, shared_task, current_task
 from django.contrib.auth.models import User
+from django.core.cache import caches
 from django.core.management import call_command
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
@@ -171,3 +172,21 @@ def launch_sync_rando(*args, **kwargs):
     return {
         'name': current_task.name,
     }
+
+
+@shared_task(name='geotrek.common.precompute-layers')
+def launch_precompute_layers(*args, **kwargs):
+    """
+    celery shared task - precompute layers command
+    """
+    call_command('precompute_layers', *args, verbosity=0)
+
+
+def schedule_precompute_layers(label):
+    """
+    Delay precompute of layers of model ``label`` (app_label.ModelName).
+    Changes committed until the task runs are rendered by the same task.
+    """
+    delay = settings.LAYERS_PRECOMPUTE_DELAY
+    if caches['fat'].add('precompute_layers_{}'.format(label), True, timeout=delay):
+        launch_precompute_layers.apply_async(args=[label], countdown=delay)
@@ -1,4 +1,5 @@
 import os
+import ftplib
 from unittest import mock
 from shutil import rmtree
 from tempfile import mkdtemp
@@ -14,11 +15,12 @@ from django.test.utils import override_settings
 from django.template.exceptions import TemplateDoesNotExist
 
 from geotrek.authent.factories import StructureFactory
+from geotrek.common.factories import AttachmentFactory
 from geotrek.trekking.models import Trek
 from geotrek.common.models import Organism, FileType, Attachment
 from geotrek.common.parsers import (
-    ExcelParser, AttachmentParserMixin, TourInSoftParser, ValueImportError, DownloadImportError,
-    TourismSystemParser, OpenSystemParser,
+    Parser, ExcelParser, AttachmentParserMixin, TourInSoftParser, ValueImportError, DownloadImportError,
+    TourismSystemParser, OpenSystemParser, AttachmentDownloader, AttachmentRequest,
 )
 
 
@@ -33,6 +35,27 @@ class OrganismEidParser(ExcelParser):
     eid = 'organism'
 
 
+class OrganismPagesParser(Parser):
+    model = Organism
+    fields = {'organism': 'name'}
+    eid = 'organism'
+    url = 'http://test.url.com/organisms'
+
+    def normalize_field_name(self, name):
+        return name
+
+    def page_request(self, skip):
+        return self.url, {'params': {'skip': skip}}
+
+    def page_count(self, page):
+        return page['count']
+
+    def next_row(self):
+        for self.root in self.fetch_pages(size=1):
+            self.nb = self.page_count(self.root)
+            yield from self.root['results']
+
+
 class AttachmentParser(AttachmentParserMixin, OrganismEidParser):
     non_fields = {'attachments': 'photo'}
 
@@ -101,6 +124,30 @@ class ParserTests(TestCase):
         self.assertEqual(organisms[0].organism, "Comité Théodule")
         self.assertEqual(organisms[1].organism, "Comité Hippolyte")
 
+    def test_updated_with_eid_bulk(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        filename2 = os.path.join(os.path.dirname(__file__), 'data', 'organism2.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.OrganismEidParser', filename, bulk=True, verbosity=0)
+        call_command('import', 'geotrek.common.tests.test_parsers.OrganismEidParser', filename2, bulk=True, verbosity=0)
+        self.assertEqual(Organism.objects.count(), 2)
+        organisms = Organism.objects.order_by('pk')
+        self.assertEqual(organisms[0].organism, "Comité Théodule")
+        self.assertEqual(organisms[1].organism, "Comité Hippolyte")
+
+    def test_unmodified_with_eid_bulk(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        parser = OrganismEidParser()
+        parser.bulk = True
+        parser.parse(filename)
+        self.assertEqual((parser.nb_created, parser.nb_updated, parser.nb_unmodified), (1, 0, 0))
+        parser = OrganismEidParser()
+        parser.bulk = True
+        # Objects to delete and objects of the batch
+        with self.assertNumQueries(2):
+            parser.parse(filename)
+        self.assertEqual((parser.nb_created, parser.nb_updated, parser.nb_unmodified), (0, 0, 1))
+        self.assertEqual(Organism.objects.count(), 1)
+
     def test_report_format_text(self):
         parser = OrganismParser()
         self.assertRegex(parser.report(), '0/0 lines imported.')
@@ -126,7 +173,7 @@ class AttachmentParserTests(TestCase):
         if os.path.exists(settings.MEDIA_ROOT):
             rmtree(settings.MEDIA_ROOT)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment(self, mocked):
         mocked.return_value.status_code = 200
         mocked.return_value.content = ''
@@ -139,7 +186,7 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(attachment.filetype, self.filetype)
         self.assertTrue(os.path.exists(attachment.attachment_file.path), True)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment_long_name(self, mocked):
         mocked.return_value.status_code = 200
         mocked.return_value.content = ''
@@ -153,7 +200,7 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(attachment.filetype, self.filetype)
         self.assertTrue(os.path.exists(attachment.attachment_file.path), True)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment_long_legend(self, mocked):
         mocked.return_value.status_code = 200
         mocked.return_value.content = ''
@@ -167,7 +214,7 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(attachment.filetype, self.filetype)
         self.assertTrue(os.path.exists(attachment.attachment_file.path), True)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment_with_other_filetype_with_structure(self, mocked):
         """
         It will always take the one without structure first
@@ -186,7 +233,7 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(attachment.filetype.structure, None)
         self.assertTrue(os.path.exists(attachment.attachment_file.path), True)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment_with_no_filetype_photographie(self, mocked):
         self.filetype.delete()
         mocked.return_value.status_code = 200
@@ -195,11 +242,12 @@ class AttachmentParserTests(TestCase):
         with self.assertRaisesRegex(CommandError, "FileType 'Photographie' does not exists in Geotrek-Admin. Please add it"):
             call_command('import', 'geotrek.common.tests.test_parsers.AttachmentParser', filename, verbosity=0)
 
-    @mock.patch('requests.get')
-    @mock.patch('requests.head')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.head')
     def test_attachment_not_updated(self, mocked_head, mocked_get):
         mocked_get.return_value.status_code = 200
         mocked_get.return_value.content = ''
+        mocked_get.return_value.headers = {}
         mocked_head.return_value.status_code = 200
         mocked_head.return_value.headers = {'content-length': 0}
         filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
@@ -208,12 +256,30 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(mocked_get.call_count, 1)
         self.assertEqual(Attachment.objects.count(), 1)
 
+    @mock.patch('requests.Session.get')
+    def test_attachment_not_modified(self, mocked_get):
+        mocked_get.return_value.status_code = 200
+        mocked_get.return_value.content = b'image'
+        mocked_get.return_value.headers = {'ETag': '"v1"', 'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentParser', filename, verbosity=0)
+        attachment = Attachment.objects.get()
+        self.assertEqual(attachment.source_etag, '"v1"')
+        self.assertEqual(attachment.source_last_modified, 'Wed, 21 Oct 2015 07:28:00 GMT')
+        mocked_get.return_value.status_code = 304
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentParser', filename, verbosity=0)
+        self.assertEqual(mocked_get.call_count, 2)
+        self.assertEqual(mocked_get.call_args[1]['headers'], {'If-None-Match': '"v1"',
+                                                              'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        self.assertEqual(Attachment.objects.get().pk, attachment.pk)
+
     @override_settings(PARSER_RETRY_SLEEP_TIME=0)
-    @mock.patch('requests.get')
-    @mock.patch('requests.head')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.head')
     def test_attachment_request_fail(self, mocked_head, mocked_get):
         mocked_get.return_value.status_code = 200
         mocked_get.return_value.content = ''
+        mocked_get.return_value.headers = {}
         mocked_head.return_value.status_code = 503
         filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
         call_command('import', 'geotrek.common.tests.test_parsers.AttachmentParser', filename, verbosity=0)
@@ -222,11 +288,12 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(mocked_head.call_count, 3)
         self.assertEqual(Attachment.objects.count(), 1)
 
-    @mock.patch('requests.get')
-    @mock.patch('requests.head')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.head')
     def test_attachment_request_except(self, mocked_head, mocked_get):
         mocked_get.return_value.status_code = 200
         mocked_get.return_value.content = ''
+        mocked_get.return_value.headers = {}
         mocked_head.side_effect = DownloadImportError()
         filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
         call_command('import', 'geotrek.common.tests.test_parsers.AttachmentParser', filename, verbosity=0)
@@ -235,16 +302,92 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(mocked_head.call_count, 1)
         self.assertEqual(Attachment.objects.count(), 1)
 
-    @mock.patch('requests.get')
+    def test_prefetch_attachment_requests(self):
+        url = 'http://test.url.com/photo.jpg'
+        organism = Organism.objects.create(organism='Comité Théodule')
+        AttachmentFactory(content_object=organism, source_url=url, source_etag='"v1"')
+        # Same file attached to another object, downloaded without validators
+        AttachmentFactory(content_object=Organism.objects.create(organism='Comité Hippolyte'), source_url=url)
+        parser = AttachmentParser()
+        requests = parser.prefetch_attachment_requests([('Comité Théodule', [url]), ('Comité Nouveau', [url])])
+        self.assertEqual(requests, [AttachmentRequest('get', url, '"v1"', ''), AttachmentRequest('get', url, '', '')])
+
+    @mock.patch('geotrek.common.parsers.FTP')
     @mock.patch('geotrek.common.parsers.urlparse')
-    def test_attachment_download_fail(self, mocked_urlparse, mocked_get):
+    def test_attachment_download_fail(self, mocked_urlparse, mocked_ftp):
         filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
-        mocked_get.side_effect = DownloadImportError()
+        mocked_ftp.return_value.retrbinary.side_effect = ftplib.error_perm('550 Not found')
         mocked_urlparse.return_value = urllib.parse.urlparse('ftp://test.url.com/organism.xls')
 
         call_command('import', 'geotrek.common.tests.test_parsers.AttachmentParser', filename, verbosity=0)
 
-        self.assertEqual(mocked_get.call_count, 1)
+        self.assertEqual(mocked_ftp.return_value.retrbinary.call_count, 1)
+        self.assertEqual(Attachment.objects.count(), 0)
+
+
+class PageReaderTests(TestCase):
+    def page(self, name):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'count': 2, 'results': [{'name': name}]}
+        return response
+
+    @mock.patch('requests.Session.get')
+    def test_pages(self, mocked_get):
+        mocked_get.side_effect = [self.page("Comité Théodule"), self.page("Comité Hippolyte")]
+        OrganismPagesParser().parse()
+        self.assertEqual(mocked_get.call_count, 2)
+        self.assertEqual(mocked_get.call_args[1]['params'], {'skip': 1})
+        self.assertEqual(Organism.objects.count(), 2)
+
+    @mock.patch('requests.Session.get')
+    def test_replay_failed_import(self, mocked_get):
+        pages_dir = mkdtemp('geotrek_test')
+        self.addCleanup(rmtree, pages_dir)
+        mocked_get.side_effect = [self.page("Comité Théodule"), DownloadImportError("Network failure")]
+        parser = OrganismPagesParser()
+        parser.pages_dir = pages_dir
+        with self.assertRaises(DownloadImportError):
+            parser.parse()
+        self.assertEqual(len(os.listdir(pages_dir)), 1)
+        mocked_get.side_effect = [self.page("Comité Hippolyte")]
+        parser = OrganismPagesParser()
+        parser.pages_dir = pages_dir
+        parser.parse()
+        self.assertEqual(mocked_get.call_count, 3)
+        self.assertEqual(Organism.objects.count(), 2)
+        self.assertEqual(os.listdir(pages_dir), [])
+
+    def test_pages_without_count(self):
+        parser = OrganismParser()
+        with self.assertRaisesRegex(AssertionError, "OrganismParser must override page_count()"):
+            parser.fetch_pages(size=10)
+        self.assertIsNotNone(parser.fetch_pages())
+
+
+class AttachmentDownloaderTests(TestCase):
+    @mock.patch('geotrek.common.parsers.FTP')
+    def test_ftp_connection_reused(self, mocked_ftp):
+        mocked_ftp.return_value.size.return_value = 42
+        downloader = AttachmentDownloader(OrganismParser())
+        for name in ('a.jpg', 'b.jpg'):
+            response = downloader.get(AttachmentRequest('head', 'ftp://test.url.com/photos/' + name, '', ''))
+            self.assertEqual(response.size, 42)
+        downloader.close()
+        self.assertEqual(mocked_ftp.call_count, 1)
+        mocked_ftp.return_value.quit.assert_called_once_with()
+
+    @mock.patch('requests.Session.get')
+    def test_prefetch(self, mocked_get):
+        mocked_get.return_value.status_code = 200
+        mocked_get.return_value.content = b'image'
+        mocked_get.return_value.headers = {}
+        downloader = AttachmentDownloader(OrganismParser(), workers=2)
+        attachment_requests = [AttachmentRequest('get', 'http://test.url.com/{}.jpg'.format(i), '', '')
+                               for i in range(3)]
+        downloader.prefetch(attachment_requests)
+        self.assertEqual([downloader.get(request).content for request in attachment_requests], [b'image'] * 3)
+        downloader.close()
+        self.assertEqual(mocked_get.call_count, 3)
 
 
 class TourInSoftParserTests(TestCase):
@@ -279,7 +422,7 @@ class TourInSoftParserTests(TestCase):
 
 class TourismSystemParserTest(TestCase):
     @mock.patch('geotrek.common.parsers.HTTPBasicAuth')
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment(self, mocked_get, mocked_auth):
         class TestTourismSystemParser(TourismSystemParser):
             def __init__(self):
@@ -306,7 +449,7 @@ class TourismSystemParserTest(TestCase):
 
 
 class OpenSystemParserTest(TestCase):
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment(self, mocked_get):
         class TestOpenSystemParser(OpenSystemParser):
             def __init__(self):
@@ -4,7 +4,7 @@ import json
 from landez.sources import DownloadError
 from unittest import mock
 import shutil
-from io import StringIO
+from io import BytesIO, StringIO
 import zipfile
 
 from django.conf import settings
@@ -15,6 +15,7 @@ from django.core.management.base import CommandError
 from django.http import HttpResponse, StreamingHttpResponse
 from django.test.utils import override_settings
 
+from geotrek.common.helpers_sync import TileStore, ZipTilesBuilder, tiles_max_age
 from geotrek.common.factories import FileTypeFactory, RecordSourceFactory, TargetPortalFactory, AttachmentFactory, ThemeFactory
 from geotrek.common.utils.testdata import get_dummy_uploaded_image
 from geotrek.core.factories import PathFactory
@@ -147,6 +148,73 @@ class SyncRandoTilesTest(VarTmpTestCase):
         self.assertIn("zip/tiles/{pk}.zip".format(pk=trek.pk), output.getvalue())
 
 
+class TileStoreTest(TestCase):
+    def setUp(self):
+        self.builder_args = {'tiles_url': 'http://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png',
+                             'ignore_errors': True}
+
+    @mock.patch('landez.TilesManager.tile', return_value=b'I am a png')
+    @mock.patch('landez.TilesManager.tileslist', return_value=[(9, 258, 199), (9, 258, 200)])
+    def test_tiles_downloaded_once(self, mock_tileslist, mock_tile):
+        store = TileStore()
+        for i in range(2):
+            content = BytesIO()
+            with zipfile.ZipFile(content, 'w') as zfile:
+                builder = ZipTilesBuilder(zfile, store=store, **self.builder_args)
+                builder.add_coverage(bbox=(0, 0, 1, 1), zoomlevels=[9])
+                builder.run()
+            with zipfile.ZipFile(content) as zfile:
+                self.assertEqual(zfile.read('9/258/199.png'), b'I am a png')
+        self.assertEqual(mock_tile.call_count, 2)
+        self.assertEqual((store.hits, store.downloads, store.failures), (2, 2, 0))
+        self.assertIn('4 tiles: 2 reused (50%), 2 downloaded', str(store))
+        # Identical images are stored once
+        self.assertEqual(store.connection.execute("SELECT COUNT(*) FROM images").fetchone()[0], 1)
+
+    @mock.patch('landez.TilesManager.tile', side_effect=DownloadError)
+    @mock.patch('landez.TilesManager.tileslist', return_value=[(9, 258, 199)])
+    def test_failed_tiles_not_stored(self, mock_tileslist, mock_tile):
+        store = TileStore()
+        with zipfile.ZipFile(BytesIO(), 'w') as zfile:
+            builder = ZipTilesBuilder(zfile, store=store, **self.builder_args)
+            builder.add_coverage(bbox=(0, 0, 1, 1), zoomlevels=[9])
+            builder.run()
+            self.assertEqual(zfile.namelist(), [])
+        self.assertEqual(store.failures, 1)
+        self.assertIsNone(store.get(builder.source, (9, 258, 199)))
+
+    def test_expired_tiles(self):
+        store = TileStore(max_age=0)
+        store.put('source', (9, 258, 199), b'I am a png')
+        self.assertIsNone(store.get('source', (9, 258, 199)))
+
+    def test_unused_images_deleted(self):
+        store = TileStore()
+        store.put('source', (9, 258, 199), b'I am a png')
+        store.put('source', (9, 258, 200), b'I am a png')
+        store.put('source', (9, 258, 199), b'I am a new png')
+        self.assertEqual(store.connection.execute("SELECT COUNT(*) FROM images").fetchone()[0], 2)
+        store.put('source', (9, 258, 200), b'I am a new png')
+        self.assertEqual(store.connection.execute("SELECT COUNT(*) FROM images").fetchone()[0], 1)
+
+    def test_prune_expired_tiles(self):
+        store = TileStore(max_age=0)
+        store.put('source', (9, 258, 199), b'I am a png')
+        store.prune()
+        self.assertEqual(store.connection.execute("SELECT COUNT(*) FROM map").fetchone()[0], 0)
+        self.assertEqual(store.connection.execute("SELECT COUNT(*) FROM images").fetchone()[0], 0)
+
+    def test_tiles_never_expire(self):
+        store = TileStore(max_age=None)
+        store.put('source', (9, 258, 199), b'I am a png')
+        store.prune()
+        self.assertEqual(store.get('source', (9, 258, 199)), b'I am a png')
+
+    @override_settings(MOBILE_TILES_STORE_MAX_AGE=None)
+    def test_max_age_setting_none(self):
+        self.assertIsNone(tiles_max_age())
+
+
 class SyncRandoFailTest(VarTmpTestCase):
     def test_fail_directory_not_empty(self):
         os.makedirs(os.path.join('var', 'tmp', 'other'))
@@ -264,6 +332,34 @@ class SyncTest(VarTmpTestCase):
                                 skip_pdf=True, verbosity=2, stdout=output)
         self.assertIn("unchanged", output.getvalue())
 
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    def test_sync_incremental(self, mock_prepare):
+        key = 'trek/en/{}'.format(self.trek.pk)
+        management.call_command('sync_rando', 'var/tmp', url='http://localhost:8000', skip_tiles=True, languages='en',
+                                skip_pdf=True, incremental=True, verbosity=2, stdout=StringIO())
+        with open(os.path.join('var', 'tmp', 'manifest.json'), 'r') as f:
+            manifest = json.load(f)
+        self.assertIn(os.path.join('api', 'en', 'treks', str(self.trek.pk), 'pois.geojson'), manifest[key]['files'])
+        with zipfile.ZipFile(os.path.join('var', 'tmp', 'zip', 'treks', 'en', 'global.zip')) as archive:
+            names = set(archive.namelist())
+
+        output = StringIO()
+        management.call_command('sync_rando', 'var/tmp', url='http://localhost:8000', skip_tiles=True, languages='en',
+                                skip_pdf=True, incremental=True, verbosity=2, stdout=output)
+        self.assertIn("en {} unchanged".format(key), output.getvalue())
+        self.assertNotIn("en api/en/treks/{}/pois.geojson".format(self.trek.pk), output.getvalue())
+        for name in manifest[key]['files']:
+            self.assertTrue(os.path.exists(os.path.join('var', 'tmp', name)))
+        with zipfile.ZipFile(os.path.join('var', 'tmp', 'zip', 'treks', 'en', 'global.zip')) as archive:
+            self.assertEqual(set(archive.namelist()), names)
+
+        self.trek.save()
+        output = StringIO()
+        management.call_command('sync_rando', 'var/tmp', url='http://localhost:8000', skip_tiles=True, languages='en',
+                                skip_pdf=True, incremental=True, verbosity=2, stdout=output)
+        self.assertNotIn("en {} unchanged".format(key), output.getvalue())
+        self.assertIn("en api/en/treks/{}/pois.geojson".format(self.trek.pk), output.getvalue())
+
     @override_settings(THUMBNAIL_COPYRIGHT_FORMAT='*' * 300)
     def test_sync_pictures_long_title_legend_author(self):
         with mock.patch('geotrek.trekking.models.Trek.prepare_map_image'):
@@ -3,8 +3,9 @@ import json
 import os
 from unittest.mock import patch
 
+from django.core.cache import caches
 from django.test import TestCase
-from geotrek.common.tasks import import_datas, import_datas_from_web
+from geotrek.common.tasks import import_datas, import_datas_from_web, schedule_precompute_layers
 from geotrek.common.models import Organism, FileType
 from geotrek.common.parsers import ExcelParser, GlobalImportError
 from geotrek.tourism.models import TouristicEvent
@@ -86,3 +87,14 @@ class TasksTest(TestCase):
         event = TouristicEvent.objects.get()
         self.assertEqual(event.eid, "323154")
         self.assertEqual(task.status, "SUCCESS")
+
+    @patch('geotrek.common.tasks.launch_precompute_layers.apply_async')
+    def test_schedule_precompute_layers_is_debounced(self, mocked):
+        caches['fat'].delete('precompute_layers_core.Path')
+        caches['fat'].delete('precompute_layers_trekking.Trek')
+        schedule_precompute_layers('core.Path')
+        schedule_precompute_layers('core.Path')
+        schedule_precompute_layers('trekking.Trek')
+        self.assertEqual(mocked.call_count, 2)
+        mocked.assert_any_call(args=['core.Path'], countdown=10)
+        mocked.assert_any_call(args=['trekking.Trek'], countdown=10)
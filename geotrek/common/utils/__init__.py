@@ -112,6 +112,48 @@ def intersecting(cls, obj, distance=None, ordering=True, field='geom'):
     return qs
 
 
+def bulk_intersecting(cls, objects, field='geom'):
+    """
+    Same as ``uniquify(intersecting(cls, obj, distance=0))`` for many objects at once,
+    in two queries. Returns lists of instances by object pk.
+    """
+    result = {obj.pk: [] for obj in objects}
+    if not result:
+        return result
+    geom_field = objects[0]._meta.get_field('geom')
+    opts = geom_field.model._meta
+    zone_opts = cls._meta
+    qn = connection.ops.quote_name
+    # Intersecting linestrings are ordered by position of intersections (see ``intersecting()``)
+    sql = """
+        SELECT o.{pk}, z.{zone_pk},
+               CASE WHEN GeometryType(o.{geom}) = 'LINESTRING' THEN
+                   (SELECT min(ST_LineLocatePoint(o.{geom}, ST_StartPoint(d.geom)))
+                    FROM ST_Dump(ST_Intersection(o.{geom}, z.{zone_geom})) AS d)
+               END
+        FROM {table} o
+        JOIN {zone_table} z ON ST_Intersects(o.{geom}, z.{zone_geom})
+        WHERE o.{pk} = ANY(%s)
+    """.format(pk=qn(opts.pk.column), geom=qn(geom_field.column), table=qn(opts.db_table),
+               zone_pk=qn(zone_opts.pk.column), zone_geom=qn(zone_opts.get_field(field).column),
+               zone_table=qn(zone_opts.db_table))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [list(result.keys())])
+        rows = cursor.fetchall()
+
+    qs = cls.objects
+    if hasattr(qs, 'existing'):
+        qs = qs.existing()
+    zones = list(qs.filter(pk__in={row[1] for row in rows}))
+    rank = {zone.pk: i for i, zone in enumerate(zones)}
+    zones = {zone.pk: zone for zone in zones}
+    rows = [row for row in rows if row[1] in zones]
+    for obj_pk, zone_pk, position in sorted(rows, key=lambda row: (row[2] is None, row[2] or 0, rank[row[1]])):
+        if zones[zone_pk] not in result[obj_pk]:
+            result[obj_pk].append(zones[zone_pk])
+    return result
+
+
 def format_coordinates(geom):
     if settings.DISPLAY_SRID in [4326, 3857]:  # WGS84 formatting
         location = geom.centroid.transform(4326, clone=True)
@@ -1,18 +1,88 @@
+import bisect
+import datetime
+import heapq
+import itertools
+import json
 import math
+import uuid
+from array import array
 from collections import defaultdict
 
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Func, Max, Q
+from django.utils import timezone
+
+
+def edge_length(length):
+    return 0.0 if length is None or math.isnan(length) else length
+
 
 def path_modifier(path):
-    length = 0.0 if math.isnan(path.length) else path.length
-    return {"id": path.pk, "length": length}
+    return {"id": path.pk, "length": edge_length(path.length)}
 
 
 def get_key_optimizer():
-    next_id = iter(range(1, 1000000)).__next__
+    next_id = itertools.count(1).__next__
     mapping = defaultdict(next_id)
     return lambda x: mapping[x]
 
 
+def get_node_key(tolerance=None):
+    """
+    Returns a function giving the node key of a coordinate. With a
+    tolerance, coordinates are snapped on a grid of this size: coordinates
+    in the same cell share their key, even closer ones in other cells don't.
+    """
+    if not tolerance:
+        return tuple
+    return lambda coord: tuple(round(c / tolerance) for c in coord)
+
+
+def graph_rows(qs, chunk_size=2000):
+    """
+    Yield ``(id, start point, end point, length)`` of paths of the queryset.
+    Only these columns are computed by PostGIS, from nodes of paths extremities
+    (so that geometries of paths are not read), and rows are fetched through
+    a server-side cursor.
+    """
+    qs = qs.order_by().annotate(
+        start_x=Func('start_node__geom', function='ST_X', output_field=FloatField()),
+        start_y=Func('start_node__geom', function='ST_Y', output_field=FloatField()),
+        end_x=Func('end_node__geom', function='ST_X', output_field=FloatField()),
+        end_y=Func('end_node__geom', function='ST_Y', output_field=FloatField()),
+    ).values_list('pk', 'start_x', 'start_y', 'end_x', 'end_y', 'length')
+    for pk, start_x, start_y, end_x, end_y, length in qs.iterator(chunk_size=chunk_size):
+        yield pk, (start_x, start_y), (end_x, end_y), length
+
+
+def iter_json_graph(edges, nodes, extra=None, chunk_size=1000):
+    """
+    Stream the JSON document of a graph (``edges`` and ``nodes`` as iterables
+    of ``(id, value)``, same document as ``json.dumps`` of
+    ``graph_edges_nodes_of_qs``), by chunks of ``chunk_size`` edges or nodes,
+    with optional ``extra`` keys.
+    """
+    def chunked(items):
+        items = iter(items)
+        first = True
+        while True:
+            chunk = list(itertools.islice(items, chunk_size))
+            if not chunk:
+                return
+            yield ('' if first else ', ') + ', '.join(chunk)
+            first = False
+
+    yield '{"edges": {'
+    yield from chunked('%s: %s' % (json.dumps(str(pk)), json.dumps(edge)) for pk, edge in edges)
+    yield '}, "nodes": {'
+    yield from chunked('%s: %s' % (json.dumps(str(pk)), json.dumps(node)) for pk, node in nodes)
+    yield '}'
+    for key, value in (extra or {}).items():
+        yield ', %s: %s' % (json.dumps(key), json.dumps(value))
+    yield '}'
+
+
 def graph_edges_nodes_of_qs(qs):
     """
     return a graph on the form:
@@ -55,3 +125,347 @@ def graph_edges_nodes_of_qs(qs):
         'edges': dict(edges),
         'nodes': dict(nodes),
     }
+
+
+class PathGraph(object):
+    """
+    Routing graph of paths, in the same form as ``graph_edges_nodes_of_qs``,
+    maintained incrementally from the ``PathGraphChange`` journal.
+
+    Edges are kept in flat arrays sorted by id, nodes adjacency is computed
+    in compressed form when the graph is serialized, so that no nested dicts
+    are kept in memory (nor pickled in cache).
+
+    Nodes ids are stable: a coordinate keeps its id for the life of the graph.
+    The version of the graph is the id of the last journal entry read (prefixed
+    by an ``epoch``, changing when the graph is rebuilt). Edges and nodes
+    altered by each refresh are recorded in ``history`` so that clients holding
+    a previous version can fetch only the changes (see ``delta``).
+    """
+    # Journal entries older than that are purged, graphs not refreshed since
+    # are rebuilt from scratch.
+    RETENTION = datetime.timedelta(days=1)
+    # Maximum number of refreshes kept to serve deltas
+    HISTORY_SIZE = 1000
+
+    def __init__(self, tolerance=None):
+        self.tolerance = tolerance
+        self.epoch = uuid.uuid4().hex[:8]
+        self.edge_ids, self.edge_starts, self.edge_ends = array('q'), array('q'), array('q')
+        self.edge_lengths = array('d')
+        self.node_ids = {}
+        # (previous journal id, journal id, touched edges, touched nodes) of refreshes
+        self.history = []
+        self.journal_id = 0
+        # Oldest version from which deltas can be computed
+        self.base_journal_id = 0
+        self.xmin = None
+        self.refreshed = None
+
+    @property
+    def version(self):
+        return '{}.{}'.format(self.epoch, self.journal_id)
+
+    def edge(self, pk):
+        """ Returns the edge of path ``pk`` (``{'id', 'length', 'nodes_id'}``), or None. """
+        index = self._edge_index(pk)
+        if index is None:
+            return None
+        return {'id': pk, 'length': self.edge_lengths[index],
+                'nodes_id': [self.edge_starts[index], self.edge_ends[index]]}
+
+    def iter_edges(self):
+        for pk, start, end, length in zip(self.edge_ids, self.edge_starts, self.edge_ends, self.edge_lengths):
+            yield pk, {'id': pk, 'length': length, 'nodes_id': [start, end]}
+
+    def iter_nodes(self):
+        """ Yield ``(node id, {other node id: edge id})`` of nodes, from the compressed adjacency. """
+        nb_nodes = len(self.node_ids)
+        # Adjacency (CSR): neighbours of node n are in offsets[n]:offsets[n + 1]
+        offsets = array('q', bytes(8 * (nb_nodes + 2)))
+        for start, end in zip(self.edge_starts, self.edge_ends):
+            offsets[start + 1] += 1
+            offsets[end + 1] += 1
+        for n in range(1, nb_nodes + 2):
+            offsets[n] += offsets[n - 1]
+        neighbours = array('q', bytes(8 * offsets[-1]))
+        neighbour_edges = array('q', bytes(8 * offsets[-1]))
+        cursor = array('q', offsets)
+        for pk, start, end in zip(self.edge_ids, self.edge_starts, self.edge_ends):
+            for node, other in ((start, end), (end, start)):
+                neighbours[cursor[node]] = other
+                neighbour_edges[cursor[node]] = pk
+                cursor[node] += 1
+        del cursor
+
+        for n in range(1, nb_nodes + 1):
+            if offsets[n] == offsets[n + 1]:
+                # Node without edges anymore
+                continue
+            adjacency = {}
+            for i in range(offsets[n], offsets[n + 1]):
+                adjacency[neighbours[i]] = neighbour_edges[i]
+            yield n, adjacency
+
+    def nodes_adjacency(self, node_ids):
+        """ Returns ``{node id: {other node id: edge id}}`` of some nodes, omitting nodes without edges. """
+        nodes = {node_id: {} for node_id in node_ids}
+        for pk, start, end in zip(self.edge_ids, self.edge_starts, self.edge_ends):
+            if start in nodes:
+                nodes[start][end] = pk
+            if end in nodes:
+                nodes[end][start] = pk
+        return {node_id: adjacency for node_id, adjacency in nodes.items() if adjacency}
+
+    def as_dict(self):
+        return {
+            'edges': dict(self.iter_edges()),
+            'nodes': dict(self.iter_nodes()),
+        }
+
+    def iter_json(self, extra=None, chunk_size=1000):
+        """ Stream the JSON document of ``as_dict()`` (see ``iter_json_graph``). """
+        return iter_json_graph(self.iter_edges(), self.iter_nodes(), extra, chunk_size)
+
+    @classmethod
+    def build(cls, qs):
+        """ Build a graph from scratch, with paths of the queryset ``qs``. """
+        graph = cls(tolerance=settings.PATH_GRAPH_SNAPPING_TOLERANCE)
+        graph._fetch_journal_state()
+        graph.base_journal_id = graph.journal_id
+        graph.add_rows(graph_rows(qs))
+        return graph
+
+    def add_rows(self, rows):
+        """ Add edges of rows given by ``graph_rows``, which are not in the graph yet. """
+        for pk, start_point, end_point, length in rows:
+            self.edge_ids.append(pk)
+            self.edge_starts.append(self._node_id(start_point))
+            self.edge_ends.append(self._node_id(end_point))
+            self.edge_lengths.append(edge_length(length))
+        if any(pk > next_pk for pk, next_pk in zip(self.edge_ids, itertools.islice(self.edge_ids, 1, None))):
+            order = sorted(range(len(self.edge_ids)), key=self.edge_ids.__getitem__)
+            for name in ('edge_ids', 'edge_starts', 'edge_ends', 'edge_lengths'):
+                values = getattr(self, name)
+                setattr(self, name, array(values.typecode, (values[i] for i in order)))
+        self.refreshed = timezone.now()
+
+    def is_stale(self):
+        return self.refreshed is None or self.refreshed < timezone.now() - self.RETENTION
+
+    def refresh(self, qs):
+        """
+        Apply changes recorded in journal since last refresh.
+        ``qs`` is the queryset of paths that belong to the graph.
+        Returns True if the graph was modified.
+        """
+        from .models import PathGraphChange
+
+        journal_id, xmin = self.journal_id, self.xmin
+        self._fetch_journal_state()
+        # Rows of transactions that were still running at last refresh may
+        # have been committed since, with a lower id: read them again.
+        changes = PathGraphChange.objects.filter(Q(id__gt=journal_id) | Q(xid__gte=xmin))
+        path_ids = set(changes.filter(id__lte=self.journal_id).values_list('path_id', flat=True))
+        PathGraphChange.objects.filter(date__lt=self.refreshed - self.RETENTION).delete()
+        if not path_ids:
+            return False
+
+        touched_edges, touched_nodes = set(), set()
+        rows = {row[0]: row for row in graph_rows(qs.filter(pk__in=path_ids))}
+        for pk in path_ids:
+            row = rows.get(pk)
+            index = self._edge_index(pk)
+            if index is not None:
+                if row is not None and self._same_edge(index, *row):
+                    continue
+                touched_nodes.update(self._remove_edge(index))
+                touched_edges.add(pk)
+            if row is not None:
+                touched_nodes.update(self._add_edge(*row))
+                touched_edges.add(pk)
+
+        if not touched_edges:
+            return False
+        self.history.append((journal_id, self.journal_id, touched_edges, touched_nodes))
+        del self.history[:-self.HISTORY_SIZE]
+        self.base_journal_id = max(self.base_journal_id, self.history[0][0])
+        return True
+
+    def delta(self, version):
+        """
+        Returns changes since the specified version, or None if the
+        version is unknown (other epoch, too old or not read yet).
+        """
+        try:
+            epoch, journal_id = version.split('.')
+            journal_id = int(journal_id)
+        except (AttributeError, ValueError):
+            return None
+        if epoch != self.epoch or not self.base_journal_id <= journal_id <= self.journal_id:
+            return None
+
+        edge_ids, node_ids = set(), set()
+        for previous_id, history_id, touched_edges, touched_nodes in self.history:
+            if history_id > journal_id:
+                edge_ids |= touched_edges
+                node_ids |= touched_nodes
+        edges = {pk: self.edge(pk) for pk in edge_ids}
+        nodes = self.nodes_adjacency(node_ids)
+        return {
+            'version': self.version,
+            'edges': {pk: edge for pk, edge in edges.items() if edge is not None},
+            'nodes': nodes,
+            'deleted_edges': sorted(pk for pk, edge in edges.items() if edge is None),
+            'deleted_nodes': sorted(node_ids - set(nodes)),
+        }
+
+    def _fetch_journal_state(self):
+        from .models import PathGraphChange
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+            self.xmin = cursor.fetchone()[0]
+        self.journal_id = PathGraphChange.objects.aggregate(Max('id'))['id__max'] or 0
+        self.refreshed = timezone.now()
+
+    def _node_id(self, coord):
+        key = get_node_key(self.tolerance)(coord)
+        node_id = self.node_ids.get(key)
+        if node_id is None:
+            node_id = self.node_ids[key] = len(self.node_ids) + 1
+        return node_id
+
+    def _edge_index(self, pk):
+        index = bisect.bisect_left(self.edge_ids, pk)
+        if index < len(self.edge_ids) and self.edge_ids[index] == pk:
+            return index
+        return None
+
+    def _same_edge(self, index, pk, start_point, end_point, length):
+        node_key = get_node_key(self.tolerance)
+        return (self.edge_starts[index] == self.node_ids.get(node_key(start_point))
+                and self.edge_ends[index] == self.node_ids.get(node_key(end_point))
+                and self.edge_lengths[index] == edge_length(length))
+
+    def _add_edge(self, pk, start_point, end_point, length):
+        k_start_point, k_end_point = self._node_id(start_point), self._node_id(end_point)
+        index = bisect.bisect_left(self.edge_ids, pk)
+        self.edge_ids.insert(index, pk)
+        self.edge_starts.insert(index, k_start_point)
+        self.edge_ends.insert(index, k_end_point)
+        self.edge_lengths.insert(index, edge_length(length))
+        return {k_start_point, k_end_point}
+
+    def _remove_edge(self, index):
+        k_start_point, k_end_point = self.edge_starts[index], self.edge_ends[index]
+        for values in (self.edge_ids, self.edge_starts, self.edge_ends, self.edge_lengths):
+            del values[index]
+        return {k_start_point, k_end_point}
+
+
+class RoutingGraph(object):
+    """
+    Weighted graph of paths, used to compute shortest routes server-side.
+    ``rows`` are given by ``graph_rows``.
+    """
+    def __init__(self, rows, tolerance=None):
+        node_key = get_node_key(tolerance)
+        node_ids = {}
+        # pk: (start node, end node, length)
+        self.edges = {}
+        # node: [(other node, pk, length), ...]
+        self.adjacency = defaultdict(list)
+
+        for pk, start_point, end_point, length in rows:
+            k_start_point, k_end_point = node_key(start_point), node_key(end_point)
+            for k in (k_start_point, k_end_point):
+                if k not in node_ids:
+                    node_ids[k] = len(node_ids) + 1
+            start, end = node_ids[k_start_point], node_ids[k_end_point]
+            length = edge_length(length)
+            self.edges[pk] = (start, end, length)
+            if start != end:
+                self.adjacency[start].append((end, pk, length))
+                self.adjacency[end].append((start, pk, length))
+
+    def shortest_path(self, sources, targets):
+        """
+        Bidirectional Dijkstra between several sources and targets, given as
+        dicts ``{node: initial cost}``.
+
+        Returns ``(cost, source node, target node, [(pk, forward), ...])``
+        or None if targets cannot be reached.
+        """
+        dist = [dict(sources), dict(targets)]
+        pred = [dict.fromkeys(sources), dict.fromkeys(targets)]
+        heaps = [[(cost, node) for node, cost in sources.items()],
+                 [(cost, node) for node, cost in targets.items()]]
+        for heap in heaps:
+            heapq.heapify(heap)
+        settled = [set(), set()]
+
+        best, meeting = math.inf, None
+        for node, cost in sources.items():
+            if node in targets and cost + targets[node] < best:
+                best, meeting = cost + targets[node], node
+
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            cost, node = heapq.heappop(heaps[side])
+            if node in settled[side]:
+                continue
+            settled[side].add(node)
+            for other, pk, length in self.adjacency[node]:
+                new_cost = cost + length
+                if new_cost < dist[side].get(other, math.inf):
+                    dist[side][other] = new_cost
+                    pred[side][other] = (node, pk)
+                    heapq.heappush(heaps[side], (new_cost, other))
+                    if other in dist[1 - side] and new_cost + dist[1 - side][other] < best:
+                        best, meeting = new_cost + dist[1 - side][other], other
+
+        if meeting is None:
+            return None
+
+        steps = []
+        node = meeting
+        while pred[0][node] is not None:
+            previous, pk = pred[0][node]
+            steps.insert(0, (pk, self.edges[pk][0] == previous))
+            node = previous
+        source = node
+        node = meeting
+        while pred[1][node] is not None:
+            following, pk = pred[1][node]
+            steps.append((pk, self.edges[pk][0] == node))
+            node = following
+        return best, source, node, steps
+
+
+_routing_graph = {}
+
+
+def routable_paths():
+    """ Paths of routing graphs: steps of routes are snapped on them only """
+    from .models import Path
+
+    return Path.objects.exclude(draft=True)
+
+
+def get_routing_graph():
+    """
+    Returns the routing graph of paths, cached in process memory
+    until a path is modified.
+    """
+    from .models import Path
+
+    latest = Path.latest_updated()
+    cached = _routing_graph.get('cached')
+    if cached is None or cached[0] != latest:
+        qs = routable_paths()
+        graph = RoutingGraph(graph_rows(qs), tolerance=settings.PATH_GRAPH_SNAPPING_TOLERANCE)
+        cached = _routing_graph['cached'] = (latest, graph)
+    return cached[1]
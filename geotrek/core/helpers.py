@@ -1,13 +1,17 @@
 import json
 import logging
+import math
 
 from django.conf import settings
-from django.contrib.gis.geos import GEOSGeometry
-from django.db import connection
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.geos import GEOSGeometry, fromstr
+from django.db import connection, transaction
 from django.contrib.gis.geos import Point
+from django.db.models.expressions import RawSQL
 from django.db.models.query import QuerySet
 
-from geotrek.common.utils import sqlfunction, uniquify
+from geotrek.common.mixins import BasePublishableMixin
+from geotrek.common.utils import sqlfunction
 
 
 logger = logging.getLogger(__name__)
@@ -53,12 +57,7 @@ class TopologyHelper(object):
             pass  # value is not integer, thus should be deserialized
         if not settings.TREKKING_TOPOLOGY_ENABLED:
             return Topology.objects.create(kind='TMP', geom=GEOSGeometry(serialized, srid=settings.API_SRID))
-        objdict = serialized
-        if isinstance(serialized, str):
-            try:
-                objdict = json.loads(serialized)
-            except ValueError as e:
-                raise ValueError("Invalid serialization: %s" % e)
+        objdict = cls._load(serialized)
 
         if objdict and not isinstance(objdict, list):
             lat = objdict.get('lat')
@@ -92,60 +91,83 @@ class TopologyHelper(object):
         offset = objdict[0].get('offset', 0.0)
         topology = Topology.objects.create(kind='TMP', offset=offset)
         try:
-            counter = 0
-            for j, subtopology in enumerate(objdict):
-                last_topo = j == len(objdict) - 1
-                positions = subtopology.get('positions', {})
-                paths = subtopology['paths']
-                # Create path aggregations
-                aggrs = []
-                for i, path in enumerate(paths):
-                    last_path = i == len(paths) - 1
-                    # Javascript hash keys are parsed as a string
-                    idx = str(i)
-                    start_position, end_position = positions.get(idx, (0.0, 1.0))
-                    path = Path.objects.get(pk=path)
+            paths = Path.objects.in_bulk(cls._path_ids(objdict))
+            PathAggregation.objects.bulk_create(cls._aggregations(objdict, topology, paths))
+        except (AssertionError, ValueError, KeyError, TypeError) as e:
+            raise ValueError("Invalid serialized topology : %s" % e)
+        topology.save()
+        return topology
+
+    @classmethod
+    def _load(cls, serialized):
+        if not isinstance(serialized, str):
+            return serialized
+        try:
+            return json.loads(serialized)
+        except ValueError as e:
+            raise ValueError("Invalid serialization: %s" % e)
+
+    @classmethod
+    def _path_ids(cls, objdict):
+        """ Paths pks of a linear serialized topology """
+        return {int(path) for subtopology in objdict for path in subtopology['paths']}
+
+    @classmethod
+    def _aggregations(cls, objdict, topology, paths):
+        """
+        Path aggregations of a linear serialized topology (see ``deserialize``),
+        ``paths`` being a dict of involved paths by pk.
+        """
+        from .models import PathAggregation
+        aggrs = []
+        counter = 0
+        for j, subtopology in enumerate(objdict):
+            last_topo = j == len(objdict) - 1
+            positions = subtopology.get('positions', {})
+            paths_ids = subtopology['paths']
+            for i, path in enumerate(paths_ids):
+                last_path = i == len(paths_ids) - 1
+                # Javascript hash keys are parsed as a string
+                idx = str(i)
+                start_position, end_position = positions.get(idx, (0.0, 1.0))
+                path = paths[int(path)]
+                aggrs.append(PathAggregation(
+                    path=path,
+                    topo_object=topology,
+                    start_position=start_position,
+                    end_position=end_position,
+                    order=counter
+                ))
+                if not last_topo and last_path:
+                    counter += 1
+                    # Intermediary marker.
+                    # make sure pos will be [X, X]
+                    # [0, X] or [X, 1] or [X, 0] or [1, X] --> X
+                    # [0.0, 0.0] --> 0.0  : marker at beginning of path
+                    # [1.0, 1.0] --> 1.0  : marker at end of path
+                    pos = -1
+                    if start_position == end_position:
+                        pos = start_position
+                    if start_position == 0.0:
+                        pos = end_position
+                    elif start_position == 1.0:
+                        pos = end_position
+                    elif end_position == 0.0:
+                        pos = start_position
+                    elif end_position == 1.0:
+                        pos = start_position
+                    elif len(paths_ids) == 1:
+                        pos = end_position
+                    assert pos >= 0, "Invalid position (%s, %s)." % (start_position, end_position)
                     aggrs.append(PathAggregation(
                         path=path,
                         topo_object=topology,
-                        start_position=start_position,
-                        end_position=end_position,
+                        start_position=pos,
+                        end_position=pos,
                         order=counter
                     ))
-                    if not last_topo and last_path:
-                        counter += 1
-                        # Intermediary marker.
-                        # make sure pos will be [X, X]
-                        # [0, X] or [X, 1] or [X, 0] or [1, X] --> X
-                        # [0.0, 0.0] --> 0.0  : marker at beginning of path
-                        # [1.0, 1.0] --> 1.0  : marker at end of path
-                        pos = -1
-                        if start_position == end_position:
-                            pos = start_position
-                        if start_position == 0.0:
-                            pos = end_position
-                        elif start_position == 1.0:
-                            pos = end_position
-                        elif end_position == 0.0:
-                            pos = start_position
-                        elif end_position == 1.0:
-                            pos = start_position
-                        elif len(paths) == 1:
-                            pos = end_position
-                        assert pos >= 0, "Invalid position (%s, %s)." % (start_position, end_position)
-                        aggrs.append(PathAggregation(
-                            path=path,
-                            topo_object=topology,
-                            start_position=pos,
-                            end_position=pos,
-                            order=counter
-                        ))
-                    counter += 1
-                PathAggregation.objects.bulk_create(aggrs)
-        except (AssertionError, ValueError, KeyError, Path.DoesNotExist) as e:
-            raise ValueError("Invalid serialized topology : %s" % e)
-        topology.save()
-        return topology
+                counter += 1
+        return aggrs
 
     @classmethod
     def _topologypoint(cls, lng, lat, kind=None, snap=None):
@@ -172,6 +194,197 @@ class TopologyHelper(object):
         topology.save()
         return topology
 
+    @classmethod
+    def _bulk_save(cls, model, topologies):
+        """ Inserts unsaved topologies, preparing them as ``Topology.save()`` does """
+        from .models import Topology
+        for topology in topologies:
+            if not topology.deleted and topology.geom is None:
+                # Computed by triggers once path aggregations are inserted
+                topology.geom = fromstr('POINT (0 0)')
+            if not topology.kind:
+                topology.kind = model.KIND
+            topology.offset = model.static_offset(topology.offset)
+            if isinstance(topology, BasePublishableMixin):
+                topology.update_publication_date()
+        if model is Topology:
+            Topology.objects.bulk_create(topologies)
+            return
+        # Django cannot bulk insert models with multi-table inheritance:
+        # rows of core_topology are inserted first, then those of the model table
+        parents = [Topology(**{field.attname: getattr(topology, field.attname)
+                               for field in Topology._meta.concrete_fields})
+                   for topology in topologies]
+        Topology.objects.bulk_create(parents)
+        ptr = model._meta.parents[Topology]
+        for topology, parent in zip(topologies, parents):
+            setattr(topology, ptr.attname, parent.pk)
+        model._base_manager._insert(topologies, fields=model._meta.local_concrete_fields, using=connection.alias)
+        for topology in topologies:
+            topology._state.adding = False
+            topology._state.db = connection.alias
+
+    @classmethod
+    def _bulk_reload(cls, topologies):
+        """ Reloads attributes computed by triggers with one query (see ``Topology.reload``) """
+        from .models import Topology
+        fromdb = Topology._base_manager.in_bulk([topology.pk for topology in topologies])
+        for topology in topologies:
+            topology.reload_from(fromdb[topology.pk])
+
+    @classmethod
+    def bulk_create_points(cls, model, points, topologies=None):
+        """
+        Creates point topologies of ``model`` (or saves the given unsaved ``topologies``)
+        snapped on the closest path of each point, like ``_topologypoint`` does one by one.
+        All points are snapped with one query, and geometries of topologies are computed
+        once for the batch, when their path aggregations are inserted.
+        """
+        from .models import PathAggregation
+        points = [point.transform(settings.SRID, clone=True) if point.srid != settings.SRID else point
+                  for point in points]
+        if topologies is None:
+            topologies = [model() for point in points]
+        assert len(topologies) == len(points), "As many topologies as points are expected"
+        if not points:
+            return topologies
+
+        if not settings.TREKKING_TOPOLOGY_ENABLED:
+            for topology, point in zip(topologies, points):
+                topology.geom = Point(point.x, point.y, srid=settings.SRID)
+            cls._bulk_save(model, topologies)
+            return topologies
+
+        snapped = PathHelper.snap_points([point.x for point in points], [point.y for point in points])
+        if len(snapped) != len(points):
+            raise IndexError("No path to snap points on")
+
+        with transaction.atomic():
+            for topology, point, (n, path_id, position, offset) in zip(topologies, points, snapped):
+                topology.offset = offset
+                topology.geom = Point(point.x, point.y, srid=settings.SRID)
+            cls._bulk_save(model, topologies)
+            PathAggregation.objects.bulk_create([
+                PathAggregation(path_id=path_id, topo_object=topology, start_position=position, end_position=position)
+                for topology, (n, path_id, position, offset) in zip(topologies, snapped)
+            ])
+        cls._bulk_reload(topologies)
+        return topologies
+
+    @classmethod
+    def bulk_create_lines(cls, model, serialized, topologies=None):
+        """
+        Creates linear topologies of ``model`` (or saves the given unsaved ``topologies``)
+        from a list of serialized topologies (see ``deserialize``).
+        Paths are fetched with one query, and geometries of topologies are computed
+        once for the batch, when their path aggregations are inserted.
+        """
+        from .models import Path, PathAggregation
+        if topologies is None:
+            topologies = [model() for objdict in serialized]
+        assert len(topologies) == len(serialized), "As many topologies as serialized topologies are expected"
+
+        if not settings.TREKKING_TOPOLOGY_ENABLED:
+            for topology, geom in zip(topologies, serialized):
+                topology.geom = GEOSGeometry(geom, srid=settings.API_SRID)
+            cls._bulk_save(model, topologies)
+            return topologies
+
+        objdicts = []
+        for objdict in serialized:
+            objdict = cls._load(objdict)
+            if objdict and not isinstance(objdict, list):
+                objdict = [objdict]
+            if not objdict:
+                raise ValueError("Invalid serialized topology : empty list found")
+            objdicts.append(objdict)
+
+        with transaction.atomic():
+            try:
+                paths = Path.objects.in_bulk({pk for objdict in objdicts for pk in cls._path_ids(objdict)})
+                for topology, objdict in zip(topologies, objdicts):
+                    topology.offset = objdict[0].get('offset', 0.0)
+                cls._bulk_save(model, topologies)
+                PathAggregation.objects.bulk_create([
+                    aggr for topology, objdict in zip(topologies, objdicts)
+                    for aggr in cls._aggregations(objdict, topology, paths)
+                ])
+            except (AssertionError, ValueError, KeyError, TypeError) as e:
+                raise ValueError("Invalid serialized topology : %s" % e)
+        cls._bulk_reload(topologies)
+        return topologies
+
+    @classmethod
+    def route(cls, steps):
+        """
+        Computes the shortest route between steps, a list of ``(point, snap)``
+        where ``snap`` is an optional path pk. Points are snapped on the
+        closest routable path (see ``routable_paths``).
+
+        Returns a linear serialized topology (see ``deserialize``),
+        with one sub-topology between each step.
+        """
+        from .models import Path
+        from .graph import get_routing_graph, routable_paths
+
+        graph = get_routing_graph()
+        snapped = []
+        for point, snap in steps:
+            if point.srid != settings.SRID:
+                point = point.transform(settings.SRID, clone=True)
+            qs = routable_paths()
+            try:
+                if snap is None:
+                    path = qs.annotate(distance=Distance('geom', point)).order_by('distance')[0]
+                else:
+                    path = qs.get(pk=snap)
+            except (Path.DoesNotExist, IndexError):
+                raise ValueError("No path to snap step %s" % point.ewkt)
+            if path.pk not in graph.edges:
+                raise ValueError("Path %s is not routable" % path.pk)
+            position, offset = path.interpolate(point)
+            snapped.append((path.pk, position))
+
+        serialized = []
+        for (path_a, position_a), (path_b, position_b) in zip(snapped, snapped[1:]):
+            aggregations = cls._route_between(graph, path_a, position_a, path_b, position_b)
+            if aggregations is None:
+                raise ValueError("No route between paths %s and %s" % (path_a, path_b))
+            serialized.append({
+                'offset': 0,
+                'paths': [pk for pk, start, end in aggregations],
+                'positions': {i: (start, end) for i, (pk, start, end) in enumerate(aggregations)},
+            })
+        return serialized
+
+    @classmethod
+    def _route_between(cls, graph, path_a, position_a, path_b, position_b):
+        """
+        Returns the shortest list of ``(path pk, start, end)`` from the
+        position on path A to the position on path B.
+        """
+        start_a, end_a, length_a = graph.edges[path_a]
+        start_b, end_b, length_b = graph.edges[path_b]
+        best = None
+        if path_a == path_b:
+            best = (abs(position_b - position_a) * length_a, [(path_a, position_a, position_b)])
+
+        sources = {start_a: position_a * length_a}
+        sources[end_a] = min((1 - position_a) * length_a, sources.get(end_a, math.inf))
+        targets = {start_b: position_b * length_b}
+        targets[end_b] = min((1 - position_b) * length_b, targets.get(end_b, math.inf))
+        found = graph.shortest_path(sources, targets)
+        if found is not None:
+            cost, source, target, steps = found
+            if best is None or cost < best[0]:
+                aggregations = [(path_a, position_a, 0.0 if source == start_a else 1.0)]
+                aggregations += [(pk, 0.0, 1.0) if forward else (pk, 1.0, 0.0) for pk, forward in steps]
+                aggregations.append((path_b, 0.0 if target == start_b else 1.0, position_b))
+                # Skip empty aggregations when steps are on path extremities
+                aggregations = [a for a in aggregations if a[1] != a[2]] or aggregations[:1]
+                best = (cost, aggregations)
+        return best[1] if best else None
+
     @classmethod
     def serialize(cls, topology, with_pk=True):
         if not topology.aggregations.exists():
@@ -212,61 +425,81 @@ class TopologyHelper(object):
                     ipath = 0
         return json.dumps(objdict)
 
+    # Aggregations overlapping the aggregations of source topologies (``s``), with a sort key
+    # following the progression along source topologies (``a`` being the overlapping aggregation)
+    overlapping_sql = """
+        FROM core_pathaggregation s
+        JOIN core_pathaggregation a ON a.path_id = s.path_id
+        JOIN core_topology t ON t.id = a.topo_object_id
+        WHERE s.topo_object_id = ANY(%s)
+          AND least(a.start_position, a.end_position) <= greatest(s.start_position, s.end_position)
+          AND greatest(a.start_position, a.end_position) >= least(s.start_position, s.end_position)
+          {condition}
+    """
+    overlapping_order_sql = """
+        s."order" + CASE WHEN s.start_position > s.end_position THEN 1 - a.start_position ELSE a.start_position END
+    """
+
     @classmethod
-    def overlapping(cls, all_objects, queryset):
-        from .models import Path, Topology, PathAggregation
+    def _overlapping_params(cls, all_objects, topologies):
+        from .models import Topology
 
         if not isinstance(all_objects, QuerySet):
             all_objects = all_objects.objects.existing()
-        is_generic = all_objects.model.KIND == Topology.KIND
-        single_input = isinstance(queryset, QuerySet)
-
-        if single_input:
-            topology_pks = [str(pk) for pk in queryset.values_list('pk', flat=True)]
+        if isinstance(topologies, QuerySet):
+            topology_pks = list(topologies.values_list('pk', flat=True))
+        elif isinstance(topologies, (list, tuple, set)):
+            topology_pks = [getattr(topology, 'pk', topology) for topology in topologies]
         else:
-            topology_pks = [str(queryset.pk)]
+            topology_pks = [topologies.pk]
+        if all_objects.model.KIND == Topology.KIND:
+            return all_objects, topology_pks, '', []
+        return all_objects, topology_pks, 'AND t.kind = %s', [all_objects.model.KIND]
 
+    @classmethod
+    def overlapping(cls, all_objects, queryset):
+        """
+        Returns the queryset of ``all_objects`` (a queryset or a topology model) overlapping
+        the specified topology (or queryset of topologies), in order of progression along them.
+        """
+        all_objects, topology_pks, condition, params = cls._overlapping_params(all_objects, queryset)
         if len(topology_pks) == 0:
             return all_objects.filter(pk__in=[])
 
-        sql = """
-        WITH topologies AS (SELECT id FROM %(topology_table)s WHERE id IN (%(topology_list)s)),
-        -- Concerned aggregations
-             aggregations AS (SELECT * FROM %(aggregations_table)s a, topologies t
-                              WHERE a.topo_object_id = t.id),
-        -- Concerned paths along with (start, end)
-             paths_aggr AS (SELECT a.start_position AS start, a.end_position AS end, p.id, a.order AS order
-                            FROM %(paths_table)s p, aggregations a
-                            WHERE a.path_id = p.id
-                            ORDER BY a.order)
-        -- Retrieve primary keys
-        SELECT t.id
-        FROM %(topology_table)s t, %(aggregations_table)s a, paths_aggr pa
-        WHERE a.path_id = pa.id AND a.topo_object_id = t.id
-          AND least(a.start_position, a.end_position) <= greatest(pa.start, pa.end)
-          AND greatest(a.start_position, a.end_position) >= least(pa.start, pa.end)
-          AND %(extra_condition)s
-        ORDER BY (pa.order + CASE WHEN pa.start > pa.end THEN (1 - a.start_position) ELSE a.start_position END);
-        """ % {
-            'topology_table': Topology._meta.db_table,
-            'aggregations_table': PathAggregation._meta.db_table,
-            'paths_table': Path._meta.db_table,
-            'topology_list': ','.join(topology_pks),
-            'extra_condition': 'true' if is_generic else "kind = '%s'" % all_objects.model.KIND
-        }
+        sql = cls.overlapping_sql.format(condition=condition)
+        overlapping = RawSQL("SELECT a.topo_object_id " + sql, [topology_pks] + params)
+        # Position of first overlap, for each object of the queryset
+        ordering = RawSQL("SELECT min({order}) {sql} AND a.topo_object_id = core_topology.id".format(
+            order=cls.overlapping_order_sql, sql=sql), [topology_pks] + params)
+        return all_objects.filter(pk__in=overlapping).annotate(ordering=ordering).order_by('ordering', 'pk')
 
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        result = cursor.fetchall()
-        pk_list = uniquify([row[0] for row in result])
+    @classmethod
+    def overlapping_pks(cls, all_objects, topologies):
+        """
+        Returns pks of ``all_objects`` (a queryset or a topology model) overlapping each of
+        the specified topologies (or pks), in order of progression along them, by topology pk.
+        """
+        all_objects, topology_pks, condition, params = cls._overlapping_params(all_objects, topologies)
+        result = {pk: [] for pk in topology_pks}
+        if len(topology_pks) == 0:
+            return result
 
-        # Return a QuerySet and preserve pk list order
-        # http://stackoverflow.com/a/1310188/141895
-        ordering = 'CASE %s END' % ' '.join(['WHEN %s.id=%s THEN %s' % (Topology._meta.db_table, id_, i)
-                                             for i, id_ in enumerate(pk_list)])
-        queryset = all_objects.filter(pk__in=pk_list).extra(
-            select={'ordering': ordering}, order_by=('ordering',))
-        return queryset
+        objects_sql, objects_params = all_objects.order_by().values('pk').query.sql_with_params()
+        sql = """
+            WITH overlaps AS (
+                SELECT s.topo_object_id AS source_id, a.topo_object_id AS id, min({order}) AS ordering
+                {sql}
+                  AND a.topo_object_id IN ({objects_sql})
+                GROUP BY s.topo_object_id, a.topo_object_id
+            )
+            SELECT source_id, array_agg(id ORDER BY ordering, id) FROM overlaps GROUP BY source_id
+        """.format(order=cls.overlapping_order_sql, sql=cls.overlapping_sql.format(condition=condition),
+                   objects_sql=objects_sql)
+        cursor = connection.cursor()
+        cursor.execute(sql, [topology_pks] + params + list(objects_params))
+        for source_id, pks in cursor.fetchall():
+            result[source_id] = pks
+        return result
 
 
 class PathHelper(object):
@@ -306,6 +539,92 @@ class PathHelper(object):
         result = cursor.fetchall()
         return result[0]
 
+    @classmethod
+    def snap_points(cls, xs, ys):
+        """
+        Snaps points (given by their coordinates in SRID) on their closest path,
+        like ``Path.closest`` and ``interpolate`` do one by one.
+        Returns ``(index, path pk, position, offset)`` rows, index starting at 1,
+        without rows for points that cannot be snapped (no path).
+        """
+        cursor = connection.cursor()
+        cursor.execute("""
+            WITH points AS (
+                SELECT n, ST_SetSRID(ST_MakePoint(x, y), %(srid)s) AS geom
+                FROM unnest(%(xs)s::float[], %(ys)s::float[]) WITH ORDINALITY AS t(x, y, n)
+            )
+            SELECT points.n, closest.id, interpolated.position, interpolated.distance
+            FROM points
+            CROSS JOIN LATERAL (
+                SELECT id, geom FROM core_path
+                WHERE NOT draft AND visible
+                ORDER BY geom <-> points.geom LIMIT 1
+            ) AS closest
+            CROSS JOIN LATERAL ST_InterpolateAlong(closest.geom, points.geom)
+                AS interpolated(position float, distance float)
+            ORDER BY points.n
+        """, {'srid': settings.SRID, 'xs': list(xs), 'ys': list(ys)})
+        return cursor.fetchall()
+
+    @classmethod
+    def point_topologies(cls, paths_pks):
+        """
+        Point topologies on the given paths, as ``(pk, kind, deleted, x, y)`` rows,
+        to be snapped again by ``snap_point_topologies`` once paths are deleted.
+        """
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT t.id, t.kind, t.deleted, ST_X(t.geom), ST_Y(t.geom)
+            FROM core_topology t
+            WHERE GeometryType(t.geom) = 'POINT'
+              AND EXISTS (SELECT 1 FROM core_pathaggregation a
+                          WHERE a.topo_object_id = t.id AND a.path_id = ANY(%s))
+            ORDER BY t.id
+        """, [list(paths_pks)])
+        return cursor.fetchall()
+
+    @classmethod
+    def snap_point_topologies(cls, topologies):
+        """
+        Attaches point topologies (see ``point_topologies``) to the path closest to their point,
+        as ``Topology.mutate`` does with a snapped topology, with a few queries for all of them.
+        """
+        if not topologies:
+            return
+        snapped = cls.snap_points([x for pk, kind, deleted, x, y in topologies],
+                                  [y for pk, kind, deleted, x, y in topologies])
+        rows = [topologies[n - 1] + (path_pk, position, offset) for n, path_pk, position, offset in snapped]
+        if not rows:
+            return
+        ids, kinds, deleted, xs, ys, paths, positions, offsets = zip(*rows)
+        params = {
+            'srid': settings.SRID, 'ids': list(ids), 'deleted': list(deleted), 'xs': list(xs), 'ys': list(ys),
+            'paths': list(paths), 'positions': list(positions),
+            # Static value for topology offset, if any (see ``Topology.static_offset``)
+            'offsets': [settings.TOPOLOGY_STATIC_OFFSETS.get(kind.lower().replace('edge', ''), offset)
+                        for kind, offset in zip(kinds, offsets)],
+        }
+        cursor = connection.cursor()
+        # Same steps as mutate(): offset, removal of aggregations (which closes topologies),
+        # point geometry, and new aggregations, whose trigger computes geometries at once.
+        # Soft-deleted topologies are snapped too, but stay deleted.
+        cursor.execute("""
+            UPDATE core_topology t SET "offset" = s.new_offset
+            FROM unnest(%(ids)s::integer[], %(offsets)s::float[]) AS s(id, new_offset)
+            WHERE t.id = s.id;
+
+            DELETE FROM core_pathaggregation WHERE topo_object_id = ANY(%(ids)s::integer[]);
+
+            UPDATE core_topology t SET deleted = s.deleted, geom = ST_SetSRID(ST_MakePoint(s.x, s.y), %(srid)s)
+            FROM unnest(%(ids)s::integer[], %(deleted)s::boolean[], %(xs)s::float[], %(ys)s::float[])
+                AS s(id, deleted, x, y)
+            WHERE t.id = s.id;
+
+            INSERT INTO core_pathaggregation (topo_object_id, path_id, start_position, end_position, "order")
+            SELECT s.id, s.path_id, s.position, s.position, 0
+            FROM unnest(%(ids)s::integer[], %(paths)s::integer[], %(positions)s::float[]) AS s(id, path_id, position);
+        """, params)
+
     @classmethod
     def disjoint(cls, geom, pk):
         """
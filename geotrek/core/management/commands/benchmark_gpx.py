@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString, Point
+from django.core.management.base import BaseCommand
+
+import gpxpy.gpx
+
+from mapentity.serializers import GPXSerializer
+
+
+class Command(BaseCommand):
+    help = """Compare per-vertex cost of GPX conversion of lines, transforming vertices one by one
+    (previous implementation) or whole geometries at once (current implementation).
+    Lines are generated in memory (database access is not measured)."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=1000, help="Number of lines (default: 1000)")
+        parser.add_argument('--vertices', type=int, default=500, help="Number of vertices by line (default: 500)")
+
+    def synthetic_lines(self, count, vertices):
+        xmin, ymin = settings.SPATIAL_EXTENT[:2]
+        return [
+            LineString([(xmin + i * 10.0 + j, ymin + j * 10.0, 1000.0 + j) for j in range(vertices)], srid=settings.SRID)
+            for i in range(count)
+        ]
+
+    def vertex_by_vertex(self, serializer, line):
+        points = []
+        for coords in line:
+            point = Point(*coords, srid=settings.SRID)
+            newpoint = point.transform(4326, clone=True)
+            points.append(gpxpy.gpx.GPXTrackPoint(latitude=newpoint.y, longitude=newpoint.x, elevation=point.z))
+        return points
+
+    def whole_geometry(self, serializer, line):
+        serializer.geomToGPX(line, '', '')
+        return serializer.gpx.tracks[-1].segments[0].points
+
+    def handle(self, *args, **options):
+        lines = self.synthetic_lines(options['lines'], options['vertices'])
+        vertices = options['lines'] * options['vertices']
+
+        for name, func in (("vertex by vertex", self.vertex_by_vertex), ("whole geometry", self.whole_geometry)):
+            serializer = GPXSerializer()
+            serializer.gpx = gpxpy.gpx.GPX()
+            start = time.perf_counter()
+            count = sum(len(func(serializer, line)) for line in lines)
+            duration = time.perf_counter() - start
+            assert count == vertices
+            self.stdout.write("{}: {} vertices, {:.2f} s, {:.2f} µs by vertex".format(
+                name, vertices, duration, duration / vertices * 10 ** 6))
@@ -0,0 +1,62 @@
+import json
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from geotrek.core.graph import graph_edges_nodes_of_qs, PathGraph
+
+
+class Command(BaseCommand):
+    help = """Compare memory and time of routing graph JSON documents, built at once or streamed,
+    on a synthetic network.
+    Paths are generated in memory (database access is not measured)."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paths', type=int, default=200000,
+                            help="Number of paths of the synthetic network (default: 200000)")
+
+    def synthetic_paths(self, count):
+        """ Grid network: each node is linked to its right and top neighbours """
+        width = int((count / 2) ** 0.5) + 1
+        pk = 0
+        for i in range(width):
+            for j in range(width):
+                for dx, dy in ((1, 0), (0, 1)):
+                    if pk == count:
+                        return
+                    pk += 1
+                    start, end = (i * 10.0, j * 10.0), ((i + dx) * 10.0, (j + dy) * 10.0)
+                    yield pk, start, end, 10.0
+
+    def measure(self, func):
+        start = time.perf_counter()
+        size = func()
+        duration = time.perf_counter() - start
+        # Memory is traced in a separate run, since tracing slows it down
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return duration, peak, size
+
+    def handle(self, *args, **options):
+        count = options['paths']
+
+        def current():
+            paths = (
+                SimpleNamespace(pk=pk, length=length, geom=SimpleNamespace(coords=(start, end)))
+                for pk, start, end, length in self.synthetic_paths(count)
+            )
+            return len(json.dumps(graph_edges_nodes_of_qs(paths)))
+
+        def streamed():
+            graph = PathGraph()
+            graph.add_rows(self.synthetic_paths(count))
+            return sum(len(chunk) for chunk in graph.iter_json())
+
+        for name, func in (("graph_edges_nodes_of_qs", current), ("PathGraph.iter_json", streamed)):
+            duration, peak, size = self.measure(func)
+            self.stdout.write("{}: {} paths, {:.2f} s, peak memory {:.1f} MB, {} bytes of JSON".format(
+                name, count, duration, peak / 1024 ** 2, size))
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from geotrek.authent.models import default_structure
+from geotrek.core.models import Path, PathAggregation, Topology
+
+
+class Command(BaseCommand):
+    help = """Measure insertion time of point topologies on paths extremities (junctions),
+    for several numbers of paths.
+    Synthetic paths are created in a transaction which is rolled back."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paths', default='1000,10000,100000',
+                            help="Comma separated numbers of paths (default: 1000,10000,100000)")
+        parser.add_argument('--points', type=int, default=100,
+                            help="Number of point topologies inserted (default: 100)")
+
+    def synthetic_paths(self, start, count, structure):
+        """ Rows of 100 paths connected end to end, 100 meters apart """
+        xmin, ymin = settings.SPATIAL_EXTENT[:2]
+        for i in range(start, start + count):
+            x, y = xmin + (i % 100) * 10, ymin + (i // 100) * 100
+            yield Path(geom=LineString((x, y), (x + 10, y), srid=settings.SRID), structure=structure)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['paths'].split(','))
+        structure = default_structure()
+
+        with transaction.atomic():
+            count = 0
+            for size in sizes:
+                Path.objects.bulk_create(self.synthetic_paths(count, size - count, structure), batch_size=1000)
+                count = size
+                # Points at start of random paths, mostly on a junction with previous path of row
+                paths = Path.objects.filter(start_node__isnull=False).order_by('?')[:options['points']]
+                start = time.perf_counter()
+                for path in paths:
+                    topology = Topology.objects.create(kind='BENCHMARK')
+                    PathAggregation.objects.create(path=path, topo_object=topology, start_position=0.0, end_position=0.0)
+                duration = time.perf_counter() - start
+                self.stdout.write("{} paths: {} point topologies in {:.3f} s, {:.2f} ms by point".format(
+                    Path.objects.count(), len(paths), duration, duration / max(len(paths), 1) * 1000))
+            transaction.set_rollback(True)
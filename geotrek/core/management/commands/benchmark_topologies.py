@@ -0,0 +1,60 @@
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from geotrek.core.models import Path, PathAggregation, Topology
+
+
+class Command(BaseCommand):
+    help = """Measure time of path aggregations changes (and computation of topologies geometries by triggers)
+    for several sizes of topologies table and of changes.
+    Synthetic topologies are created in a transaction which is rolled back."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topologies', default='10000,100000,500000',
+                            help="Comma separated sizes of topologies table (default: 10000,100000,500000)")
+        parser.add_argument('--changes', default='1,10,100',
+                            help="Comma separated numbers of aggregations changed at once (default: 1,10,100)")
+
+    def measure(self, func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['topologies'].split(','))
+        changes = sorted(int(change) for change in options['changes'].split(','))
+
+        with transaction.atomic():
+            xmin, ymin = settings.SPATIAL_EXTENT[:2]
+            path = Path.objects.create(geom=LineString((xmin, ymin), (xmin + 100, ymin + 100), srid=settings.SRID))
+            # Topologies without geometry and aggregation are ignored by zoning and elevation triggers
+            topologies = []
+            for size in sizes:
+                missing = size - Topology.objects.count()
+                created = Topology.objects.bulk_create(
+                    [Topology(kind='BENCHMARK', deleted=True) for i in range(max(missing, 0))], batch_size=10000)
+                topologies += [topology.pk for topology in created]
+                for change in changes:
+                    pks = topologies[:change]
+
+                    def insert():
+                        PathAggregation.objects.bulk_create([
+                            PathAggregation(path=path, topo_object_id=pk, start_position=0.0, end_position=1.0)
+                            for pk in pks
+                        ])
+
+                    def update():
+                        PathAggregation.objects.filter(topo_object_id__in=pks).update(end_position=0.5)
+
+                    def delete():
+                        PathAggregation.objects.filter(topo_object_id__in=pks).delete()
+
+                    durations = ["{} {:.3f} s".format(name, self.measure(func))
+                                 for name, func in (("insert", insert), ("update", update), ("delete", delete))]
+                    self.stdout.write("{} topologies, {} aggregations changed: {}".format(
+                        Topology.objects.count(), change, ", ".join(durations)))
+            transaction.set_rollback(True)
@@ -5,12 +5,63 @@ from django.contrib.gis.geos.collections import Polygon, LineString
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 from django.db.utils import IntegrityError, InternalError
-from django.db import transaction
+from django.db import connection, transaction
+from io import StringIO
 
 
 class Command(BaseCommand):
     help = 'Load Paths from a file within the spatial extent\n'
 
+    # Triggers of core_path replaced by batch updates in bulk mode
+    bulk_deferred_triggers = ('core_path_10_elevation_iu_tgr', 'core_path_topologies_iu_tgr')
+    bulk_triggers = ('core_path_10_elevation_flat_iu_tgr', )
+    bulk_chunk_size = 1000
+    bulk_insert_sql = """
+        DO $$
+        DECLARE
+            rec record;
+            pid integer;
+        BEGIN
+            FOR rec IN SELECT * FROM loadpaths_staging
+                       WHERE id BETWEEN {first} AND {last} ORDER BY id
+            LOOP
+                BEGIN
+                    INSERT INTO core_path (name, comments, structure_id, geom, valid, visible, draft, departure, arrival)
+                    VALUES (rec.name, rec.comments, {structure}, rec.geom, TRUE, TRUE, FALSE, '', '')
+                    RETURNING id INTO pid;
+                    UPDATE loadpaths_staging SET path_id = pid WHERE id = rec.id;
+                {handler}
+                END;
+            END LOOP;
+        END;
+        $$;
+    """
+    bulk_fail_handler = """
+                EXCEPTION WHEN OTHERS THEN
+                    UPDATE loadpaths_staging SET error = SQLERRM WHERE id = rec.id;
+    """
+    bulk_elevation_sql = """
+        UPDATE core_path p
+        SET geom_3d = e.draped,
+            length = ST_3DLength(e.draped),
+            slope = e.slope,
+            min_elevation = e.min_elevation,
+            max_elevation = e.max_elevation,
+            ascent = e.positive_gain,
+            descent = e.negative_gain
+        FROM (SELECT c.id, i.* FROM core_path c, LATERAL ft_elevation_infos(c.geom, %s) i
+              WHERE c.date_update >= %s) AS e
+        WHERE p.id = e.id
+    """
+    # Topologies were computed with paths not yet draped
+    bulk_topologies_sql = """
+        SELECT update_geometry_of_topology(t.id)
+        FROM core_topology t
+        WHERE t.kind NOT IN ('CITYEDGE', 'DISTRICTEDGE', 'RESTRICTEDAREAEDGE')
+          AND t.id IN (SELECT et.topo_object_id FROM core_pathaggregation et JOIN core_path p ON p.id = et.path_id
+                       WHERE p.date_update >= %s)
+    """
+
     def add_arguments(self, parser):
         parser.add_argument('file_path', help="File's path of the paths")
         parser.add_argument('--structure', action='store', dest='structure', help="Define the structure")
@@ -29,18 +80,19 @@ class Command(BaseCommand):
         parser.add_argument('--dry', '-d', action='store_true', dest='dry', default=False,
                             help="Do not change the database, dry run. Show the number of fail"
                                  " and objects potentially created")
+        parser.add_argument('--bulk', '-b', action='store_true', dest='bulk', default=False,
+                            help="Stage all paths at once, computing their elevation and zoning at the end"
+                                 " (faster for large files, paths are still snapped and split one by one)."
+                                 " Paths table is locked during the import")
 
     def handle(self, *args, **options):
         verbosity = options.get('verbosity')
         encoding = options.get('encoding')
         file_path = options.get('file_path')
         structure = options.get('structure')
-        name_column = options.get('name')
-        srid = options.get('srid')
-        do_intersect = options.get('intersect')
-        comments_columns = options.get('comment')
         fail = options.get('fail')
         dry = options.get('dry')
+        bulk = options.get('bulk')
 
         if dry:
             fail = True
@@ -67,8 +119,48 @@ class Command(BaseCommand):
         bbox = Polygon.from_bbox(settings.SPATIAL_EXTENT)
         bbox.srid = settings.SRID
 
+        if bulk:
+            self.bulk_load(self.iter_features(ds, bbox, options), structure, fail, dry, verbosity)
+            return
+
         sid = transaction.savepoint()
 
+        for name, comment_final, geom in self.iter_features(ds, bbox, options):
+            try:
+                with transaction.atomic():
+                    path = Path.objects.create(name=name,
+                                               structure=structure,
+                                               geom=geom,
+                                               comments=comment_final)
+                counter += 1
+                if verbosity > 0:
+                    self.stdout.write('Create path with pk : {}'.format(path.pk))
+                if verbosity > 1:
+                    self.stdout.write("The comment %s was added on %s" % (comment_final, name))
+            except (IntegrityError, InternalError):
+                if fail:
+                    counter_fail += 1
+                    self.stdout.write('Integrity Error on path : {}, {}'.format(name, geom))
+                else:
+                    raise
+        if not dry:
+            transaction.savepoint_commit(sid)
+            if verbosity >= 2:
+                self.stdout.write(self.style.NOTICE(
+                    "{0} objects created, {1} objects failed".format(counter, counter_fail)))
+        else:
+            transaction.savepoint_rollback(sid)
+            self.stdout.write(self.style.NOTICE(
+                "{0} objects will be create, {1} objects failed;".format(counter, counter_fail)))
+
+    def iter_features(self, ds, bbox, options):
+        """ Yield name, comments and geometry of features to load """
+        verbosity = options.get('verbosity')
+        name_column = options.get('name')
+        srid = options.get('srid')
+        do_intersect = options.get('intersect')
+        comments_columns = options.get('comment')
+
         for layer in ds:
             for feat in layer:
                 name = feat.get(name_column) if name_column in layer.fields else ''
@@ -85,34 +177,91 @@ class Command(BaseCommand):
                 self.check_srid(srid, geom)
                 geom.dim = 2
                 if do_intersect and bbox.intersects(geom) or not do_intersect and geom.within(bbox):
-                    try:
-                        with transaction.atomic():
-                            comment_final = '</br>'.join(comment_final_tab)
-                            path = Path.objects.create(name=name,
-                                                       structure=structure,
-                                                       geom=geom,
-                                                       comments=comment_final)
-                        counter += 1
-                        if verbosity > 0:
-                            self.stdout.write('Create path with pk : {}'.format(path.pk))
-                        if verbosity > 1:
-                            self.stdout.write("The comment %s was added on %s" % (comment_final, name))
-                    except (IntegrityError, InternalError):
-                        if fail:
-                            counter_fail += 1
-                            self.stdout.write('Integrity Error on path : {}, {}'.format(name, geom))
-                        else:
-                            raise
+                    yield name, '</br>'.join(comment_final_tab), geom
+
+    def bulk_load(self, features, structure, fail, dry, verbosity):
+        """
+        Stage features in a temporary table with COPY, then create paths from
+        it in database, chunk by chunk. Snapping and splitting triggers still
+        run path by path (each path has to see the previous ones), but elevation
+        and zoning triggers are disabled during the load, and computed once for
+        all created or split paths at the end.
+        """
+        geom_srid = Path._meta.get_field('geom').srid
+        with transaction.atomic():
+            cursor = connection.cursor()
+            cursor.execute("SELECT statement_timestamp()")
+            start = cursor.fetchone()[0]
+            cursor.execute("CREATE TEMP TABLE loadpaths_staging (id serial PRIMARY KEY, name varchar(250), "
+                           "comments text, geom geometry, path_id integer, error text) ON COMMIT DROP")
+
+            staging = StringIO()
+            for name, comments, geom in features:
+                if geom.srid != geom_srid:
+                    geom.transform(geom_srid)
+                staging.write('\t'.join(self.copy_value(value) for value in (name, comments, geom.hexewkb.decode())))
+                staging.write('\n')
+            staging.seek(0)
+            cursor.copy_expert("COPY loadpaths_staging (name, comments, geom) FROM STDIN", staging)
+            cursor.execute("SELECT COUNT(*) FROM loadpaths_staging")
+            total = cursor.fetchone()[0]
+            if verbosity > 0:
+                self.stdout.write("{} features staged".format(total))
+
+            self.toggle_triggers(cursor, bulk=True)
+            for first in range(1, total + 1, self.bulk_chunk_size):
+                last = min(first + self.bulk_chunk_size - 1, total)
+                cursor.execute(self.bulk_insert_sql.format(
+                    first=first, last=last, structure=structure.pk,
+                    handler=self.bulk_fail_handler if fail else ''))
+                if verbosity > 0:
+                    self.stdout.write("{}/{} features loaded".format(last, total))
+            self.toggle_triggers(cursor, bulk=False)
+
+            if verbosity > 0:
+                self.stdout.write("Computing elevation and zoning of created paths")
+            cursor.execute(self.bulk_elevation_sql, [settings.ALTIMETRIC_PROFILE_STEP, start])
+            cursor.execute("SELECT auto_link_path_topologies(id, geom, TRUE) FROM core_path "
+                           "WHERE date_update >= %s", [start])
+            cursor.execute(self.bulk_topologies_sql, [start])
+
+            cursor.execute("SELECT name, ST_AsText(geom), path_id, comments, error FROM loadpaths_staging ORDER BY id")
+            counter = 0
+            counter_fail = 0
+            for name, geom, path_id, comments, error in cursor.fetchall():
+                if error is not None:
+                    counter_fail += 1
+                    self.stdout.write('Integrity Error on path : {}, {}'.format(name, geom))
+                    continue
+                counter += 1
+                if verbosity > 0:
+                    self.stdout.write('Create path with pk : {}'.format(path_id))
+                if verbosity > 1:
+                    self.stdout.write("The comment %s was added on %s" % (comments, name))
+            cursor.execute("DROP TABLE loadpaths_staging")
+            if dry:
+                transaction.set_rollback(True)
+
         if not dry:
-            transaction.savepoint_commit(sid)
             if verbosity >= 2:
                 self.stdout.write(self.style.NOTICE(
                     "{0} objects created, {1} objects failed".format(counter, counter_fail)))
         else:
-            transaction.savepoint_rollback(sid)
             self.stdout.write(self.style.NOTICE(
                 "{0} objects will be create, {1} objects failed;".format(counter, counter_fail)))
 
+    def toggle_triggers(self, cursor, bulk):
+        for trigger in self.bulk_deferred_triggers:
+            cursor.execute("ALTER TABLE core_path {} TRIGGER {}".format('DISABLE' if bulk else 'ENABLE', trigger))
+        for trigger in self.bulk_triggers:
+            cursor.execute("ALTER TABLE core_path {} TRIGGER {}".format('ENABLE' if bulk else 'DISABLE', trigger))
+
+    def copy_value(self, value):
+        """ Format value for COPY text format """
+        if value is None:
+            return '\\N'
+        return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
     def check_srid(self, srid, geom):
         if not geom.srid:
             geom.srid = srid
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_auto_20201117_1302'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PathGraphChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path_id', models.IntegerField(db_index=True)),
+                ('xid', models.BigIntegerField(db_index=True)),
+                ('date', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Path graph change',
+                'verbose_name_plural': 'Path graph changes',
+            },
+        ),
+    ]
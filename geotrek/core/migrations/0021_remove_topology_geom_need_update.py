@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_pathgraphchange'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='topology',
+            name='geom_need_update',
+        ),
+    ]
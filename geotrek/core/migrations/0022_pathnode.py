@@ -0,0 +1,51 @@
+from django.conf import settings
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Extremities of paths, one node by distinct point
+FILL_NODES = """
+    INSERT INTO core_pathnode (geom)
+    SELECT ST_SetSRID(ST_MakePoint(x, y), {srid}) FROM (
+        SELECT ST_X(ST_StartPoint(geom)) AS x, ST_Y(ST_StartPoint(geom)) AS y FROM core_path
+        UNION
+        SELECT ST_X(ST_EndPoint(geom)), ST_Y(ST_EndPoint(geom)) FROM core_path
+    ) AS points;
+    UPDATE core_path p SET start_node_id = n.id FROM core_pathnode n
+    WHERE ST_X(n.geom) = ST_X(ST_StartPoint(p.geom)) AND ST_Y(n.geom) = ST_Y(ST_StartPoint(p.geom));
+    UPDATE core_path p SET end_node_id = n.id FROM core_pathnode n
+    WHERE ST_X(n.geom) = ST_X(ST_EndPoint(p.geom)) AND ST_Y(n.geom) = ST_Y(ST_EndPoint(p.geom));
+""".format(srid=settings.SRID)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_remove_topology_geom_need_update'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PathNode',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('geom', django.contrib.gis.db.models.fields.PointField(spatial_index=False, srid=settings.SRID)),
+            ],
+            options={
+                'verbose_name': 'Path node',
+                'verbose_name_plural': 'Path nodes',
+            },
+        ),
+        migrations.AddField(
+            model_name='path',
+            name='start_node',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.pathnode'),
+        ),
+        migrations.AddField(
+            model_name='path',
+            name='end_node',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.pathnode'),
+        ),
+        migrations.RunSQL(FILL_NODES, migrations.RunSQL.noop),
+    ]
@@ -14,20 +14,21 @@ from mapentity.serializers import plain_text
 from geotrek.authent.models import StructureRelated, StructureOrNoneRelated
 from geotrek.common.mixins import (TimeStampedModelMixin, NoDeleteMixin,
                                    AddPropertyMixin)
-from geotrek.common.utils import classproperty
+from geotrek.common.utils import classproperty, uniquify
 from geotrek.common.utils.postgresql import debug_pg_notices
 from geotrek.altimetry.models import AltimetryMixin
 
 from .helpers import PathHelper, TopologyHelper
-from django.db import connections, DEFAULT_DB_ALIAS
-
-from django.contrib.gis.geos import Point
+from django.db import connections, DEFAULT_DB_ALIAS, transaction
 
 logger = logging.getLogger(__name__)
 
 
 def simplify_coords(coords):
     if isinstance(coords, (list, tuple)):
+        if coords and isinstance(coords[0], float):
+            # Round a whole point (or bbox) at once
+            return [round(coord, 7) for coord in coords]
         return [simplify_coords(coord) for coord in coords]
     elif isinstance(coords, float):
         return round(coords, 7)
@@ -50,6 +51,23 @@ class PathInvisibleManager(models.Manager):
     def get_queryset(self):
         return super(PathInvisibleManager, self).get_queryset()
 
+
+class PathNode(models.Model):
+    """
+    Extremity of paths, shared by all paths starting or ending at the same point.
+    Maintained by triggers (see ../sql/post_40_paths.sql): a node keeps its id as
+    long as a path starts or ends there.
+    """
+    geom = models.PointField(srid=settings.SRID, spatial_index=False)
+
+    class Meta:
+        verbose_name = _("Path node")
+        verbose_name_plural = _("Path nodes")
+
+    def __str__(self):
+        return "%s (%s)" % (_("Path node"), self.pk)
+
+
 # GeoDjango note:
 # Django automatically creates indexes on geometry fields but it uses a
 # syntax which is not compatible with PostGIS 2.0. That's why index creation
@@ -92,6 +110,11 @@ class Path(AddPropertyMixin, MapEntityMixin, AltimetryMixin,
                                       verbose_name=_("Networks"))
     eid = models.CharField(verbose_name=_("External id"), max_length=1024, blank=True, null=True)
     draft = models.BooleanField(default=False, verbose_name=_("Draft"), db_index=True)
+    # Set by triggers
+    start_node = models.ForeignKey(PathNode, null=True, editable=False, related_name='+',
+                                   on_delete=models.DO_NOTHING)
+    end_node = models.ForeignKey(PathNode, null=True, editable=False, related_name='+',
+                                 on_delete=models.DO_NOTHING)
 
     objects = PathManager()
     include_invisible = PathInvisibleManager()
@@ -181,6 +204,8 @@ class Path(AddPropertyMixin, MapEntityMixin, AltimetryMixin,
         if self.pk and self.visible:
             fromdb = self.__class__.objects.get(pk=self.pk)
             self.geom = fromdb.geom
+            self.start_node_id = fromdb.start_node_id
+            self.end_node_id = fromdb.end_node_id
             AltimetryMixin.reload(self, fromdb)
             TimeStampedModelMixin.reload(self, fromdb)
         return self
@@ -200,28 +225,28 @@ class Path(AddPropertyMixin, MapEntityMixin, AltimetryMixin,
     def delete(self, *args, **kwargs):
         if not settings.TREKKING_TOPOLOGY_ENABLED:
             return super(Path, self).delete(*args, **kwargs)
-        topologies = list(self.topology_set.filter())
-        r = super(Path, self).delete(*args, **kwargs)
-        if not Path.objects.exists():
-            return r
-        for topology in topologies:
-            if isinstance(topology.geom, Point):
-                closest = self.closest(topology.geom, self)
-                position, offset = closest.interpolate(topology.geom)
-                new_topology = Topology.objects.create()
-                aggrobj = PathAggregation(topo_object=new_topology,
-                                          start_position=position,
-                                          end_position=position,
-                                          path=closest)
-                aggrobj.save()
-                point = Point(topology.geom.x, topology.geom.y, srid=settings.SRID)
-                new_topology.geom = point
-                new_topology.offset = offset
-                new_topology.position = position
-                new_topology.save()
-                topology.mutate(new_topology)
+        with transaction.atomic():
+            topologies = PathHelper.point_topologies([self.pk])
+            r = super(Path, self).delete(*args, **kwargs)
+            # Attach point topologies of this path to the closest remaining paths
+            PathHelper.snap_point_topologies(topologies)
         return r
 
+    @classmethod
+    def bulk_delete(cls, paths):
+        """ Delete the given paths, then attach all their point topologies at once
+        to the closest remaining paths.
+        """
+        if not settings.TREKKING_TOPOLOGY_ENABLED:
+            for path in paths:
+                path.delete()
+            return
+        with transaction.atomic():
+            topologies = PathHelper.point_topologies([path.pk for path in paths])
+            for path in paths:
+                super(Path, path).delete()
+            PathHelper.snap_point_topologies(topologies)
+
     @property
     def name_display(self):
         return '<a data-pk="%s" href="%s" title="%s" >%s</a>' % (self.pk,
@@ -239,14 +264,14 @@ class Path(AddPropertyMixin, MapEntityMixin, AltimetryMixin,
 
     @property
     def trails_display(self):
-        trails = getattr(self, '_trails', self.trails)
+        trails = self.trails
         if trails:
             return ", ".join([t.name_display for t in trails])
         return _("None")
 
     @property
     def trails_csv_display(self):
-        trails = getattr(self, '_trails', self.trails)
+        trails = self.trails
         if trails:
             return ", ".join([str(t) for t in trails])
         return _("None")
@@ -333,7 +358,6 @@ class Topology(AddPropertyMixin, AltimetryMixin, TimeStampedModelMixin, NoDelete
     paths = models.ManyToManyField(Path, through='PathAggregation', verbose_name=_("Path"))
     offset = models.FloatField(default=0.0, verbose_name=_("Offset"))  # in SRID units
     kind = models.CharField(editable=False, verbose_name=_("Kind"), max_length=32)
-    geom_need_update = models.BooleanField(default=False)
 
     geom = models.GeometryField(editable=(not settings.TREKKING_TOPOLOGY_ENABLED),
                                 srid=settings.SRID, null=True,
@@ -405,6 +429,53 @@ class Topology(AddPropertyMixin, AltimetryMixin, TimeStampedModelMixin, NoDelete
         """
         return TopologyHelper.overlapping(cls, topologies)
 
+    @classmethod
+    def overlapping_pks(cls, topologies):
+        """ Return pks of topologies of this class overlapping each of the specified topologies
+        (in order of progression along them), as a dict by topology pk.
+        """
+        return TopologyHelper.overlapping_pks(cls, topologies)
+
+    @classmethod
+    def static_offset(cls, offset):
+        """ Static value of offset for this class of topologies, if any, or given offset.
+        """
+        shortmodelname = cls._meta.object_name.lower().replace('edge', '')
+        return settings.TOPOLOGY_STATIC_OFFSETS.get(shortmodelname, offset)
+
+    @classmethod
+    def bulk_create_points(cls, points, topologies=None):
+        """ Create point topologies of this class snapped on closest paths (or save
+        the given unsaved ``topologies`` of this class), with one snapping query and one
+        computation of geometries for all points (see ``TopologyHelper.bulk_create_points``).
+        """
+        return TopologyHelper.bulk_create_points(cls, points, topologies)
+
+    @classmethod
+    def bulk_create_lines(cls, serialized, topologies=None):
+        """ Create linear topologies of this class from a list of serialized topologies (or save
+        the given unsaved ``topologies`` of this class), with one computation of geometries
+        for all of them (see ``TopologyHelper.bulk_create_lines``).
+        """
+        return TopologyHelper.bulk_create_lines(cls, serialized, topologies)
+
+    @classmethod
+    def bulk_path_topologies(cls, paths, related=None):
+        """ Topologies of this class on each of the specified paths (ordered by pk),
+        or their ``related`` foreign key object if given. Returns lists by path pk.
+        """
+        ids_by_path = {path.pk: [] for path in paths}
+        rows = cls.objects.existing().filter(aggregations__path__in=list(ids_by_path.keys())) \
+                                     .order_by('pk').values_list('aggregations__path', related or 'pk')
+        for path_id, object_id in rows:
+            ids_by_path[path_id].append(object_id)
+        model = cls._meta.get_field(related).related_model if related else cls
+        objects = model.objects.in_bulk({object_id for ids in ids_by_path.values() for object_id in ids})
+        return {
+            path_id: uniquify([objects[object_id] for object_id in ids if object_id in objects])
+            for path_id, ids in ids_by_path.items()
+        }
+
     def mutate(self, other, delete=True):
         """
         Take alls attributes of the other topology specified and
@@ -446,18 +517,23 @@ class Topology(AddPropertyMixin, AltimetryMixin, TimeStampedModelMixin, NoDelete
         """
         if self.pk:
             # Update computed values
-            fromdb = self.__class__.objects.get(pk=self.pk)
-            self.geom = fromdb.geom
-            # /!\ offset may be set by a trigger OR in
-            # the django code, reload() will override
-            # any unsaved value
-            self.offset = fromdb.offset
-            AltimetryMixin.reload(self, fromdb)
-            TimeStampedModelMixin.reload(self, fromdb)
-            NoDeleteMixin.reload(self, fromdb)
+            self.reload_from(self.__class__.objects.get(pk=self.pk))
 
         return self
 
+    def reload_from(self, fromdb):
+        """
+        Copy computed attributes of a topology fetched from database.
+        """
+        self.geom = fromdb.geom
+        # /!\ offset may be set by a trigger OR in
+        # the django code, reload() will override
+        # any unsaved value
+        self.offset = fromdb.offset
+        AltimetryMixin.reload(self, fromdb)
+        TimeStampedModelMixin.reload(self, fromdb)
+        NoDeleteMixin.reload(self, fromdb)
+
     @debug_pg_notices
     def save(self, *args, **kwargs):
         # HACK: these fields are readonly from the Django point of view
@@ -483,8 +559,7 @@ class Topology(AddPropertyMixin, AltimetryMixin, TimeStampedModelMixin, NoDelete
             self.kind = self.__class__.KIND
 
         # Static value for Topology offset, if any
-        shortmodelname = self._meta.object_name.lower().replace('edge', '')
-        self.offset = settings.TOPOLOGY_STATIC_OFFSETS.get(shortmodelname, self.offset)
+        self.offset = self.static_offset(self.offset)
 
         # Save into db
         super(Topology, self).save(*args, **kwargs)
@@ -554,6 +629,23 @@ class PathAggregation(models.Model):
         ordering = ['order', ]
 
 
+class PathGraphChange(models.Model):
+    """
+    Journal of path changes, filled by triggers (see ../sql/post_40_paths.sql).
+    Used to maintain the routing graph incrementally (see ``graph.PathGraph``).
+    """
+    path_id = models.IntegerField(db_index=True)
+    xid = models.BigIntegerField(db_index=True)
+    date = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = _("Path graph change")
+        verbose_name_plural = _("Path graph changes")
+
+    def __str__(self):
+        return "%s (%s)" % (_("Path graph change"), self.path_id)
+
+
 class PathSource(StructureOrNoneRelated):
 
     source = models.CharField(verbose_name=_("Source"), max_length=50)
@@ -60,27 +60,8 @@ $$ LANGUAGE plpgsql;
 -- Compute geometry of Evenements
 -------------------------------------------------------------------------------
 
-CREATE FUNCTION {# geotrek.core #}.ft_topologies_paths_geometry() RETURNS trigger SECURITY DEFINER AS $$
-BEGIN
-    IF TG_OP = 'INSERT' THEN
-        UPDATE core_topology SET geom_need_update = TRUE WHERE id = NEW.topo_object_id AND kind != 'TMP';
-    ELSE
-        UPDATE core_topology SET geom_need_update = TRUE WHERE id = OLD.topo_object_id AND kind != 'TMP';
-        IF TG_OP = 'UPDATE' THEN -- /!\ Logical ops are commutative in SQL
-            IF NEW.topo_object_id != OLD.topo_object_id THEN
-                UPDATE core_topology SET geom_need_update = TRUE WHERE id = NEW.topo_object_id AND kind != 'TMP';
-            END IF;
-        END IF;
-    END IF;
-
-    RETURN NULL;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER core_pathaggregation_geometry_tgr
-AFTER INSERT OR UPDATE OR DELETE ON core_pathaggregation
-FOR EACH ROW EXECUTE PROCEDURE ft_topologies_paths_geometry();
-
+-- Geometries of topologies are computed once per statement on path aggregations,
+-- only for topologies of the rows touched by the statement (transition tables)
 
 DROP TRIGGER IF EXISTS core_pathaggregation_geometry_statement_tgr ON core_pathaggregation;
 DROP FUNCTION IF EXISTS ft_topologies_paths_geometry_statement() CASCADE;
@@ -89,16 +70,42 @@ CREATE FUNCTION {# geotrek.core #}.ft_topologies_paths_geometry_statement() RETU
 DECLARE
     rec record;
 BEGIN
-    FOR rec IN SELECT * FROM core_topology WHERE geom_need_update = TRUE LOOP
-        PERFORM update_geometry_of_topology(rec.id);
-    END LOOP;
+    IF TG_OP = 'INSERT' THEN
+        FOR rec IN SELECT t.id FROM core_topology t
+                   WHERE t.id IN (SELECT topo_object_id FROM new_aggregations) AND t.kind != 'TMP'
+                   ORDER BY t.id LOOP
+            PERFORM update_geometry_of_topology(rec.id);
+        END LOOP;
+    ELSIF TG_OP = 'UPDATE' THEN
+        FOR rec IN SELECT t.id FROM core_topology t
+                   WHERE t.id IN (SELECT topo_object_id FROM new_aggregations
+                                  UNION SELECT topo_object_id FROM old_aggregations) AND t.kind != 'TMP'
+                   ORDER BY t.id LOOP
+            PERFORM update_geometry_of_topology(rec.id);
+        END LOOP;
+    ELSE
+        FOR rec IN SELECT t.id FROM core_topology t
+                   WHERE t.id IN (SELECT topo_object_id FROM old_aggregations) AND t.kind != 'TMP'
+                   ORDER BY t.id LOOP
+            PERFORM update_geometry_of_topology(rec.id);
+        END LOOP;
+    END IF;
 
     RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER core_pathaggregation_geometry_statement_tgr
-AFTER INSERT OR UPDATE OR DELETE ON core_pathaggregation
+-- Transition tables require one trigger by event
+CREATE TRIGGER core_pathaggregation_geometry_i_tgr
+AFTER INSERT ON core_pathaggregation REFERENCING NEW TABLE AS new_aggregations
+FOR EACH STATEMENT EXECUTE PROCEDURE ft_topologies_paths_geometry_statement();
+
+CREATE TRIGGER core_pathaggregation_geometry_u_tgr
+AFTER UPDATE ON core_pathaggregation REFERENCING OLD TABLE AS old_aggregations NEW TABLE AS new_aggregations
+FOR EACH STATEMENT EXECUTE PROCEDURE ft_topologies_paths_geometry_statement();
+
+CREATE TRIGGER core_pathaggregation_geometry_d_tgr
+AFTER DELETE ON core_pathaggregation REFERENCING OLD TABLE AS old_aggregations
 FOR EACH STATEMENT EXECUTE PROCEDURE ft_topologies_paths_geometry_statement();
 
 
@@ -108,7 +115,7 @@ FOR EACH STATEMENT EXECUTE PROCEDURE ft_topologies_paths_geometry_statement();
 
 CREATE FUNCTION {# geotrek.core #}.ft_topologies_paths_junction_point_iu() RETURNS trigger SECURITY DEFINER AS $$
 DECLARE
-    junction geometry;
+    junction integer;
     t_count integer;
 BEGIN
     -- Deal with previously connected paths in the case of an UDPATE action
@@ -135,24 +142,24 @@ BEGIN
         RETURN NULL;
     END IF;
 
-    -- Deal with newly connected paths
+    -- Deal with newly connected paths (through nodes of paths extremities)
     IF NEW.start_position = 0.0 THEN
-        SELECT ST_StartPoint(geom) INTO junction FROM core_path WHERE id = NEW.path_id;
+        SELECT start_node_id INTO junction FROM core_path WHERE id = NEW.path_id;
     ELSIF NEW.start_position = 1.0 THEN
-        SELECT ST_EndPoint(geom) INTO junction FROM core_path WHERE id = NEW.path_id;
+        SELECT end_node_id INTO junction FROM core_path WHERE id = NEW.path_id;
     END IF;
 
     INSERT INTO core_pathaggregation (path_id, topo_object_id, start_position, end_position)
     SELECT id, NEW.topo_object_id, 0.0, 0.0 -- Troncon departing from this junction
     FROM core_path t
-    WHERE id != NEW.path_id AND ST_StartPoint(geom) = junction AND NOT EXISTS (
+    WHERE id != NEW.path_id AND start_node_id = junction AND NOT EXISTS (
         -- prevent trigger recursion
         SELECT * FROM core_pathaggregation WHERE path_id = t.id AND topo_object_id = NEW.topo_object_id
     )
     UNION
     SELECT id, NEW.topo_object_id, 1.0, 1.0-- Troncon arriving at this junction
     FROM core_path t
-    WHERE id != NEW.path_id AND ST_EndPoint(geom) = junction AND NOT EXISTS (
+    WHERE id != NEW.path_id AND end_node_id = junction AND NOT EXISTS (
         -- prevent trigger recursion
         SELECT * FROM core_pathaggregation WHERE path_id = t.id AND topo_object_id = NEW.topo_object_id
     );
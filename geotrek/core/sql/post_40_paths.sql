@@ -21,6 +21,7 @@ CREATE INDEX core_path_start_point_idx ON core_path USING gist(ST_StartPoint(geo
 CREATE INDEX core_path_end_point_idx ON core_path USING gist(ST_EndPoint(geom));
 CREATE INDEX core_path_geom_cadastre_idx ON core_path USING gist(geom_cadastre);
 CREATE INDEX core_path_geom_3d_idx ON core_path USING gist(geom_3d);
+CREATE INDEX core_pathnode_geom_idx ON core_pathnode USING gist(geom);
 
 
 -------------------------------------------------------------------------------
@@ -110,6 +111,63 @@ AFTER UPDATE OF geom ON core_path
 FOR EACH ROW EXECUTE PROCEDURE update_topology_geom_when_path_changes();
 
 
+-------------------------------------------------------------------------------
+-- Maintain nodes of paths extremities
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {# geotrek.core #}.path_node(point geometry) RETURNS integer AS $$
+DECLARE
+    node_id integer;
+BEGIN
+    SELECT id INTO node_id FROM core_pathnode WHERE geom && point AND ST_Equals(geom, point) LIMIT 1;
+    IF NOT FOUND THEN
+        -- Prevent concurrent transactions from creating the same node twice
+        PERFORM pg_advisory_xact_lock(hashtext('core_pathnode'));
+        SELECT id INTO node_id FROM core_pathnode WHERE geom && point AND ST_Equals(geom, point) LIMIT 1;
+        IF NOT FOUND THEN
+            INSERT INTO core_pathnode (geom) VALUES (point) RETURNING id INTO node_id;
+        END IF;
+    END IF;
+    RETURN node_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION {# geotrek.core #}.delete_orphan_path_nodes(node_ids integer[]) RETURNS void AS $$
+    DELETE FROM core_pathnode n
+    WHERE n.id = ANY(node_ids)
+      AND NOT EXISTS (SELECT 1 FROM core_path WHERE start_node_id = n.id)
+      AND NOT EXISTS (SELECT 1 FROM core_path WHERE end_node_id = n.id);
+$$ LANGUAGE sql;
+
+CREATE FUNCTION {# geotrek.core #}.path_nodes_iu() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    NEW.start_node_id := path_node(ST_StartPoint(NEW.geom));
+    NEW.end_node_id := path_node(ST_EndPoint(NEW.geom));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- After snapping (core_path_00_snap_geom_iu_tgr), which moves extremities
+CREATE TRIGGER core_path_01_nodes_iu_tgr
+BEFORE INSERT OR UPDATE OF geom, start_node_id, end_node_id ON core_path
+FOR EACH ROW EXECUTE PROCEDURE path_nodes_iu();
+
+CREATE FUNCTION {# geotrek.core #}.path_nodes_ud() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM delete_orphan_path_nodes(ARRAY[OLD.start_node_id, OLD.end_node_id]);
+    ELSIF OLD.start_node_id IS DISTINCT FROM NEW.start_node_id OR OLD.end_node_id IS DISTINCT FROM NEW.end_node_id THEN
+        PERFORM delete_orphan_path_nodes(ARRAY[OLD.start_node_id, OLD.end_node_id]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_path_nodes_ud_tgr
+AFTER UPDATE OF geom, start_node_id, end_node_id OR DELETE ON core_path
+FOR EACH ROW EXECUTE PROCEDURE path_nodes_ud();
+
+
 -------------------------------------------------------------------------------
 -- Ensure paths have valid geometries
 -------------------------------------------------------------------------------
@@ -150,6 +208,21 @@ CREATE TRIGGER core_path_10_elevation_iu_tgr
 BEFORE INSERT OR UPDATE OF geom ON core_path
 FOR EACH ROW EXECUTE PROCEDURE elevation_path_iu();
 
+-- Used instead of the previous one when loading paths in bulk (loadpaths --bulk),
+-- elevation is then computed once all paths are loaded.
+CREATE FUNCTION {# geotrek.core #}.elevation_path_flat_iu() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    NEW.geom_3d := ST_Force3DZ(NEW.geom);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_path_10_elevation_flat_iu_tgr
+BEFORE INSERT OR UPDATE OF geom ON core_path
+FOR EACH ROW EXECUTE PROCEDURE elevation_path_flat_iu();
+
+ALTER TABLE core_path DISABLE TRIGGER core_path_10_elevation_flat_iu_tgr;
+
 
 -------------------------------------------------------------------------------
 -- Change status of related objects when paths are deleted
@@ -193,3 +266,24 @@ $$ LANGUAGE plpgsql;
 CREATE TRIGGER core_path_latest_updated_d_tgr
 AFTER DELETE ON core_path
 FOR EACH ROW EXECUTE PROCEDURE path_latest_updated_d();
+
+
+-------------------------------------------------------------------------------
+-- Record changes of paths for the incremental routing graph
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {# geotrek.core #}.path_graph_change_iud() RETURNS trigger SECURITY DEFINER AS $$
+DECLARE
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO core_pathgraphchange (path_id, xid, date) VALUES (OLD.id, txid_current(), now());
+    ELSE
+        INSERT INTO core_pathgraphchange (path_id, xid, date) VALUES (NEW.id, txid_current(), now());
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_path_graph_change_iud_tgr
+AFTER INSERT OR UPDATE OF geom, draft, visible OR DELETE ON core_path
+FOR EACH ROW EXECUTE PROCEDURE path_graph_change_iud();
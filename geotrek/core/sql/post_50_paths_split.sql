@@ -18,7 +18,7 @@ BEGIN
     closest := NULL;
     SELECT ST_ClosestPoint(geom, linestart), geom INTO closest, other
       FROM core_path
-      WHERE geom && ST_Buffer(NEW.geom, DISTANCE * 2)
+      WHERE ST_DWithin(geom, linestart, DISTANCE)  -- Index scan around extremity only
         AND id != NEW.id
         AND ST_Distance(geom, linestart) < DISTANCE
       ORDER BY ST_Distance(geom, linestart)
@@ -49,7 +49,7 @@ BEGIN
     SELECT ST_ClosestPoint(geom, lineend), geom INTO closest, other
 
       FROM core_path
-      WHERE geom && ST_Buffer(NEW.geom, DISTANCE * 2)
+      WHERE ST_DWithin(geom, lineend, DISTANCE)  -- Index scan around extremity only
         AND id != NEW.id
         AND ST_Distance(geom, lineend) < DISTANCE
       ORDER BY ST_Distance(geom, lineend)
@@ -123,10 +123,11 @@ BEGIN
         -- Locate intersecting point(s) on NEW, for later use
         FOR fraction IN SELECT ST_LineLocatePoint(NEW.geom,
                                                   (ST_Dump(ST_Intersection(path.geom, NEW.geom))).geom)
-                        WHERE NOT ST_Equals(ST_StartPoint(NEW.geom), ST_StartPoint(path.geom))
-                          AND NOT ST_Equals(ST_StartPoint(NEW.geom), ST_EndPoint(path.geom))
-                          AND NOT ST_Equals(ST_EndPoint(NEW.geom), ST_StartPoint(path.geom))
-                          AND NOT ST_Equals(ST_EndPoint(NEW.geom), ST_EndPoint(path.geom))
+                        -- NULL-safe: a path without node (yet) shares no extremity
+                        WHERE NEW.start_node_id IS DISTINCT FROM path.start_node_id
+                          AND NEW.start_node_id IS DISTINCT FROM path.end_node_id
+                          AND NEW.end_node_id IS DISTINCT FROM path.start_node_id
+                          AND NEW.end_node_id IS DISTINCT FROM path.end_node_id
         LOOP
             intersections_on_new := array_append(intersections_on_new, fraction);
         END LOOP;
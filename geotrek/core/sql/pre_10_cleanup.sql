@@ -32,6 +32,7 @@ DROP FUNCTION IF EXISTS ft_path_interpolate(integer, geometry) CASCADE;
 
 DROP FUNCTION IF EXISTS ft_evenements_troncons_geometry() CASCADE;
 DROP FUNCTION IF EXISTS ft_topologies_paths_geometry() CASCADE;
+DROP FUNCTION IF EXISTS ft_topologies_paths_geometry_statement() CASCADE;
 
 DROP FUNCTION IF EXISTS ft_evenements_troncons_junction_point_iu() CASCADE;
 DROP FUNCTION IF EXISTS ft_topologies_paths_junction_point_iu() CASCADE;
@@ -41,6 +42,7 @@ DROP FUNCTION IF EXISTS ft_topologies_paths_junction_point_iu() CASCADE;
 DROP INDEX IF EXISTS troncons_geom_idx;
 DROP INDEX IF EXISTS l_t_troncon_geom_idx;
 DROP INDEX IF EXISTS core_path_geom_idx;
+DROP INDEX IF EXISTS core_pathnode_geom_idx;
 
 DROP INDEX IF EXISTS troncons_start_point_idx;
 DROP INDEX IF EXISTS l_t_troncon_start_point_idx;
@@ -64,6 +66,7 @@ DROP FUNCTION IF EXISTS update_topology_geom_when_path_changes() CASCADE;
 
 DROP FUNCTION IF EXISTS elevation_troncon_iu() CASCADE;
 DROP FUNCTION IF EXISTS elevation_path_iu() CASCADE;
+DROP FUNCTION IF EXISTS elevation_path_flat_iu() CASCADE;
 
 DROP FUNCTION IF EXISTS troncons_related_objects_d() CASCADE;
 DROP FUNCTION IF EXISTS paths_related_objects_d() CASCADE;
@@ -71,6 +74,12 @@ DROP FUNCTION IF EXISTS paths_related_objects_d() CASCADE;
 DROP FUNCTION IF EXISTS troncon_latest_updated_d() CASCADE;
 DROP FUNCTION IF EXISTS path_latest_updated_d() CASCADE;
 
+DROP FUNCTION IF EXISTS path_graph_change_iud() CASCADE;
+DROP FUNCTION IF EXISTS path_nodes_iu() CASCADE;
+DROP FUNCTION IF EXISTS path_nodes_ud() CASCADE;
+DROP FUNCTION IF EXISTS delete_orphan_path_nodes(integer[]) CASCADE;
+DROP FUNCTION IF EXISTS path_node(geometry) CASCADE;
+
 -- 50
 
 DROP FUNCTION IF EXISTS troncons_snap_extremities() CASCADE;
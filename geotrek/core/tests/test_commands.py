@@ -219,6 +219,40 @@ class LoadPathsCommandTest(TestCase):
         with self.assertRaises(IntegrityError):
             call_command('loadpaths', filename, '-i', verbosity=2, stdout=output)
 
+    @override_settings(SRID=4326, SPATIAL_EXTENT=(-1, 0, 4, 2))
+    def test_load_paths_bulk(self):
+        output = StringIO()
+        call_command('loadpaths', self.filename, '-i', '--bulk', srid=4326, verbosity=2, stdout=output)
+        output = output.getvalue()
+        self.assertIn('2/2 features loaded', output)
+        self.assertIn('2 objects created, 0 objects failed', output)
+        self.assertEqual(Path.objects.count(), 2)
+        for path in Path.objects.all():
+            self.assertIn('Create path with pk : %s' % path.pk, output)
+            self.assertEqual(path.structure, self.structure)
+            # Flat trigger only sets geom_3d, elevation infos come from the final pass
+            self.assertAlmostEqual(path.length, path.geom_3d.length)
+            self.assertGreater(path.length, 0)
+            self.assertEqual(path.min_elevation, 0)
+            self.assertEqual(path.slope, 0)
+        self.assertEqual(Path.objects.first().name, 'lulu')
+
+    @override_settings(SRID=4326, SPATIAL_EXTENT=(-1, 0, 4, 2))
+    def test_load_paths_bulk_dry(self):
+        output = StringIO()
+        call_command('loadpaths', self.filename, '-i', '--bulk', dry=True, verbosity=2, stdout=output)
+        self.assertIn('2 objects will be create, 0 objects failed;', output.getvalue())
+        self.assertEqual(Path.objects.count(), 0)
+
+    @override_settings(SRID=4326, SPATIAL_EXTENT=(-1, 0, 4, 2))
+    def test_load_paths_bulk_fail(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'bad_path.geojson')
+        output = StringIO()
+        call_command('loadpaths', filename, '-i', '--bulk', dry=True, verbosity=2, stdout=output)
+        self.assertIn('0 objects will be create, 1 objects failed;', output.getvalue())
+        with self.assertRaises(IntegrityError):
+            call_command('loadpaths', filename, '-i', '--bulk', verbosity=2, stdout=output)
+
     @override_settings(SRID=4326, SPATIAL_EXTENT=(-1, -1, 1, 5))
     def test_load_paths_within_spatial_extent_no_srid_geom(self):
         filename = os.path.join(os.path.dirname(__file__), 'data', 'paths_no_srid.shp')
@@ -1,14 +1,23 @@
+import datetime
+import json
 from unittest import skipIf
 
 from django.test import TestCase
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.contrib.gis.geos import LineString
+from django.contrib.gis.geos import LineString, Point
+from django.core.cache import caches
 from django.urls import reverse
 
 from geotrek.core.factories import PathFactory
-from geotrek.core.graph import graph_edges_nodes_of_qs
+from geotrek.core.graph import graph_edges_nodes_of_qs, graph_rows, PathGraph
+from geotrek.core.helpers import TopologyHelper
 from geotrek.core.models import Path
+from geotrek.core.views import store_graph
+
+
+def streamed_json(response):
+    return json.loads(b''.join(response.streaming_content))
 
 
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
@@ -61,14 +70,14 @@ class SimpleGraph(TestCase):
 
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
-        graph = response.json()
+        graph = streamed_json(response)
         self.assertDictEqual({'edges': {}, 'nodes': {}}, graph)
 
     def test_json_graph_simple(self):
         path = PathFactory(geom=LineString((0, 0), (1, 1)))
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
-        graph = response.json()
+        graph = streamed_json(response)
 
         length = graph['edges'][str(path.pk)].pop('length')
         self.assertDictEqual({'edges': {str(path.pk): {'id': path.pk, 'nodes_id': [1, 2]}},
@@ -79,7 +88,7 @@ class SimpleGraph(TestCase):
         path = PathFactory(geom=LineString((0, 0), (1, 1)))
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
-        graph = response.json()
+        graph = streamed_json(response)
 
         length = graph['edges'][str(path.pk)].pop('length')
         self.assertDictEqual({'edges': {str(path.pk): {'id': path.pk, 'nodes_id': [1, 2]}},
@@ -96,3 +105,219 @@ class SimpleGraph(TestCase):
         PathFactory(geom=LineString((0, 0), (1, 1)))
         response = self.client.get(self.url)
         self.assertNotEqual(response['Cache-Control'], None)
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class StreamedGraph(TestCase):
+
+    def test_same_as_python_graph(self):
+        PathFactory(geom=LineString((0, 0), (0, 5), (1, 1)))
+        PathFactory(geom=LineString((1, 1), (2, 2)))
+        PathFactory(geom=LineString((2, 2), (3, 1), (1, 1)))
+        PathFactory(geom=LineString((4, 4), (5, 5)))
+        qs = Path.objects.order_by('id')
+        graph = PathGraph()
+        graph.add_rows(graph_rows(qs))
+        streamed = ''.join(graph.iter_json(chunk_size=2))
+        self.assertEqual(streamed, json.dumps(graph_edges_nodes_of_qs(qs)))
+
+    def test_unordered_rows(self):
+        path_1 = PathFactory(geom=LineString((0, 0), (1, 1)))
+        path_2 = PathFactory(geom=LineString((1, 1), (2, 2)))
+        graph = PathGraph()
+        graph.add_rows(graph_rows(Path.objects.order_by('-id')))
+        self.assertEqual(list(graph.edge_ids), [path_1.pk, path_2.pk])
+        self.assertEqual(graph.edge(path_1.pk)['nodes_id'], [3, 1])
+        self.assertDictEqual(graph.as_dict()['nodes'], {1: {2: path_2.pk, 3: path_1.pk}, 2: {1: path_2.pk}, 3: {1: path_1.pk}})
+
+    def test_empty(self):
+        streamed = ''.join(PathGraph().iter_json({'full': True}))
+        self.assertDictEqual(json.loads(streamed), {'edges': {}, 'nodes': {}, 'full': True})
+
+    def test_tolerance(self):
+        path_1 = PathFactory(geom=LineString((0, 0), (10, 10)))
+        path_2 = PathFactory(geom=LineString((12, 12), (30, 30)))
+        qs = Path.objects.order_by('id')
+        graph = PathGraph(tolerance=10)
+        graph.add_rows(graph_rows(qs))
+        self.assertEqual(graph.edge(path_1.pk)['nodes_id'], [1, 2])
+        self.assertEqual(graph.edge(path_2.pk)['nodes_id'], [2, 3])
+        graph = PathGraph()
+        graph.add_rows(graph_rows(qs))
+        self.assertEqual(graph.edge(path_2.pk)['nodes_id'], [3, 4])
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class IncrementalGraph(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('homer', 'h@s.com', 'dooh')
+        success = self.client.login(username=user.username, password='dooh')
+        self.assertTrue(success)
+        self.url = reverse('core:path_json_graph')
+        caches['fat'].delete('path_graph')
+
+    def test_refresh_same_as_build(self):
+        path_1 = PathFactory(geom=LineString((0, 0), (1, 1)))
+        PathFactory(geom=LineString((1, 1), (2, 2)))
+        graph = PathGraph.build(Path.objects.order_by('id'))
+        journal_id = graph.journal_id
+        PathFactory(geom=LineString((2, 2), (3, 3)))
+        path_1.geom = LineString((0, 0), (0, 1), (1, 1))
+        path_1.save()
+        self.assertTrue(graph.refresh(Path.objects.all()))
+        rebuilt = PathGraph.build(Path.objects.order_by('id'))
+        self.assertDictEqual(graph.as_dict(), rebuilt.as_dict())
+        self.assertGreater(graph.journal_id, journal_id)
+        self.assertEqual(graph.version, '{}.{}'.format(graph.epoch, graph.journal_id))
+
+    def test_refresh_without_changes(self):
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        graph = PathGraph.build(Path.objects.all())
+        self.assertFalse(graph.refresh(Path.objects.all()))
+        self.assertEqual(graph.history, [])
+
+    def test_node_ids_are_stable(self):
+        path_1 = PathFactory(geom=LineString((0, 0), (1, 1)))
+        path_2 = PathFactory(geom=LineString((1, 1), (2, 2)))
+        graph = PathGraph.build(Path.objects.order_by('id'))
+        path_1.delete()
+        graph.refresh(Path.objects.all())
+        self.assertDictEqual(graph.as_dict()['nodes'], {2: {3: path_2.pk}, 3: {2: path_2.pk}})
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        graph.refresh(Path.objects.all())
+        self.assertEqual(graph.node_ids[(0.0, 0.0)], 1)
+
+    def test_delta(self):
+        path_1 = PathFactory(geom=LineString((0, 0), (1, 1)))
+        path_2 = PathFactory(geom=LineString((1, 1), (2, 2)))
+        graph = PathGraph.build(Path.objects.order_by('id'))
+        version = graph.version
+        path_2.delete()
+        graph.refresh(Path.objects.all())
+        delta = graph.delta(version)
+        self.assertEqual(delta['version'], graph.version)
+        self.assertDictEqual(delta['edges'], {})
+        self.assertDictEqual(delta['nodes'], {2: {1: path_1.pk}})
+        self.assertEqual(delta['deleted_edges'], [path_2.pk])
+        self.assertEqual(delta['deleted_nodes'], [3])
+
+    def test_delta_unknown_version(self):
+        graph = PathGraph.build(Path.objects.all())
+        self.assertIsNone(graph.delta('unknown.0'))
+        self.assertIsNone(graph.delta('{}.{}'.format(graph.epoch, graph.journal_id + 1)))
+        self.assertIsNone(graph.delta('{}.{}'.format(graph.epoch, graph.journal_id - 1)))
+        self.assertIsNone(graph.delta(None))
+
+    def test_json_graph_since(self):
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        response = self.client.get(self.url)
+        version = response['X-Graph-Version']
+        path = PathFactory(geom=LineString((1, 1), (2, 2)))
+        response = self.client.get(self.url, {'since': version})
+        self.assertEqual(response.status_code, 200)
+        delta = response.json()
+        self.assertEqual(delta['version'], response['X-Graph-Version'])
+        self.assertEqual(list(delta['edges'].keys()), [str(path.pk)])
+        self.assertEqual(delta['deleted_edges'], [])
+
+    def test_json_graph_stale_cache_is_rebuilt(self):
+        path = PathFactory(geom=LineString((0, 0), (1, 1)))
+        self.client.get(self.url)
+        graph = caches['fat'].get('path_graph')
+        graph.refreshed -= PathGraph.RETENTION + datetime.timedelta(minutes=1)
+        caches['fat'].set('path_graph', graph)
+        path.geom = LineString((0, 0), (3, 4))
+        path.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertAlmostEqual(streamed_json(response)['edges'][str(path.pk)]['length'], 5)
+        self.assertFalse(caches['fat'].get('path_graph').is_stale())
+
+    def test_json_graph_stored_only_when_changed(self):
+        path = PathFactory(geom=LineString((0, 0), (1, 1)))
+        self.client.get(self.url)
+        refreshed = caches['fat'].get('path_graph').refreshed
+        self.client.get(self.url)
+        self.assertEqual(caches['fat'].get('path_graph').refreshed, refreshed)
+        path.geom = LineString((0, 0), (3, 4))
+        path.save()
+        response = self.client.get(self.url)
+        graph = caches['fat'].get('path_graph')
+        self.assertEqual(graph.version, response['X-Graph-Version'])
+        self.assertAlmostEqual(graph.edge(path.pk)['length'], 5)
+
+    def test_json_graph_same_version_stored_once(self):
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        self.client.get(self.url)
+        graph = caches['fat'].get('path_graph')
+        other = PathGraph.build(Path.objects.all())
+        other.epoch = graph.epoch
+        other.journal_id = graph.journal_id
+        store_graph(caches['fat'], 'path_graph', other)
+        self.assertEqual(caches['fat'].get('path_graph').refreshed, graph.refreshed)
+
+    def test_json_graph_since_unknown_version(self):
+        path = PathFactory(geom=LineString((0, 0), (1, 1)))
+        response = self.client.get(self.url, {'since': 'unknown.0'})
+        self.assertEqual(response.status_code, 200)
+        delta = streamed_json(response)
+        self.assertTrue(delta['full'])
+        self.assertEqual(list(delta['edges'].keys()), [str(path.pk)])
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class Routing(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('homer', 'h@s.com', 'dooh')
+        success = self.client.login(username=user.username, password='dooh')
+        self.assertTrue(success)
+        self.url = reverse('core:path_json_route')
+        self.path_1 = PathFactory(geom=LineString((0, 0), (100, 0)))
+        self.path_2 = PathFactory(geom=LineString((100, 0), (200, 0)))
+        self.path_3 = PathFactory(geom=LineString((300, 0), (200, 0)))
+        PathFactory(geom=LineString((0, 0), (0, 500), (300, 500), (300, 0)))
+
+    def step(self, x, y):
+        point = Point(x, y, srid=settings.SRID).transform(settings.API_SRID, clone=True)
+        return {'lng': point.x, 'lat': point.y}
+
+    def assertRoute(self, subtopology, paths, positions):
+        self.assertEqual(subtopology['paths'], paths)
+        for i, (start, end) in enumerate(positions):
+            self.assertAlmostEqual(subtopology['positions'][i][0], start)
+            self.assertAlmostEqual(subtopology['positions'][i][1], end)
+
+    def test_route_through_paths(self):
+        steps = [self.step(50, 0), self.step(250, 0)]
+        serialized = TopologyHelper.route([(Point(s['lng'], s['lat'], srid=settings.API_SRID), None) for s in steps])
+        self.assertEqual(len(serialized), 1)
+        self.assertRoute(serialized[0], [self.path_1.pk, self.path_2.pk, self.path_3.pk],
+                         [(0.5, 1.0), (0.0, 1.0), (0.0, 0.5)])
+
+    def test_route_on_same_path(self):
+        steps = [self.step(20, 0), self.step(80, 0)]
+        serialized = TopologyHelper.route([(Point(s['lng'], s['lat'], srid=settings.API_SRID), None) for s in steps])
+        self.assertRoute(serialized[0], [self.path_1.pk], [(0.2, 0.8)])
+
+    def test_route_snaps_on_routable_paths(self):
+        PathFactory(geom=LineString((40, 20), (60, 20)), draft=True)
+        steps = [self.step(50, 18), self.step(80, 0)]
+        serialized = TopologyHelper.route([(Point(s['lng'], s['lat'], srid=settings.API_SRID), None) for s in steps])
+        self.assertRoute(serialized[0], [self.path_1.pk], [(0.5, 0.8)])
+
+    def test_route_with_via_deserialized(self):
+        steps = [self.step(50, 0), self.step(150, 0), self.step(250, 0)]
+        response = self.client.get(self.url, {'steps': json.dumps(steps)})
+        self.assertEqual(response.status_code, 200)
+        serialized = response.json()['topology']
+        self.assertEqual(len(serialized), 2)
+        topology = TopologyHelper.deserialize(serialized)
+        self.assertAlmostEqual(topology.geom.length, 200)
+
+    def test_route_invalid_steps(self):
+        response = self.client.get(self.url, {'steps': json.dumps([self.step(50, 0)])})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {'steps': 'foo'})
+        self.assertEqual(response.status_code, 400)
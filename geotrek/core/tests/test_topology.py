@@ -4,7 +4,7 @@ from unittest import skipIf
 
 from django.test import TestCase
 from django.conf import settings
-from django.db import connections, DEFAULT_DB_ALIAS
+from django.db import connections, DEFAULT_DB_ALIAS, transaction
 from django.contrib.gis.geos import Point, LineString
 
 from geotrek.common.utils import dbnow
@@ -195,6 +195,81 @@ class TopologyDeletionTest(TestCase):
         self.assertTrue(topology.deleted)
 
 
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class PathDeletionSnappingTest(TestCase):
+    def setUp(self):
+        self.path1 = PathFactory.create(geom=LineString((0, 0), (100, 0)))
+        self.path2 = PathFactory.create(geom=LineString((0, 20), (100, 20)))
+        self.path3 = PathFactory.create(geom=LineString((0, -30), (100, -30)))
+        self.path4 = PathFactory.create(geom=LineString((100, 0), (100, 50)))
+        self.points = [
+            TopologyFactory.create(paths=[(self.path1, 0.3, 0.3)]),
+            TopologyFactory.create(paths=[(self.path1, 0.6, 0.6)], offset=5),
+            TopologyFactory.create(paths=[(self.path1, 0.7, 0.7)], offset=-10),
+            TopologyFactory.create(paths=[(self.path1, 1, 1)]),  # Junction with path4
+            TopologyFactory.create(paths=[(self.path2, 0.5, 0.5)], offset=2),
+        ]
+        self.line = TopologyFactory.create(paths=[(self.path1, 0.2, 0.8)])
+
+    def legacy_delete(self, path):
+        """ Per-object snapping done by Path.delete() before set-based snapping """
+        topologies = list(path.topology_set.filter())
+        super(Path, path).delete()
+        for topology in topologies:
+            if isinstance(topology.geom, Point):
+                closest = Path.closest(topology.geom, path)
+                position, offset = closest.interpolate(topology.geom)
+                new_topology = Topology.objects.create()
+                PathAggregation.objects.create(topo_object=new_topology, start_position=position,
+                                               end_position=position, path=closest)
+                new_topology.geom = Point(topology.geom.x, topology.geom.y, srid=settings.SRID)
+                new_topology.offset = offset
+                new_topology.save()
+                topology.mutate(new_topology)
+
+    def state(self):
+        return {
+            topology.pk: (
+                topology.deleted, round(topology.offset, 6),
+                tuple(round(coord, 3) for coord in topology.geom.coords) if topology.geom else None,
+                sorted((aggr.path_id, round(aggr.start_position, 6), round(aggr.end_position, 6))
+                       for aggr in topology.aggregations.all())
+            )
+            for topology in Topology.objects.filter(pk__in=[t.pk for t in self.points + [self.line]])
+        }
+
+    def compare_with_legacy(self, paths, delete):
+        pks = [path.pk for path in paths]
+        sid = transaction.savepoint()
+        for pk in pks:
+            self.legacy_delete(Path.objects.get(pk=pk))
+        expected = self.state()
+        transaction.savepoint_rollback(sid)
+        delete([Path.objects.get(pk=pk) for pk in pks])
+        self.assertEqual(self.state(), expected)
+        return expected
+
+    def test_delete_path(self):
+        state = self.compare_with_legacy([self.path1], lambda paths: paths[0].delete())
+        self.assertEqual(state[self.points[0].pk][3], [(self.path2.pk, 0.3, 0.3)])
+        self.assertEqual(state[self.points[2].pk][3][0][0], self.path3.pk)
+        self.assertEqual(state[self.points[3].pk][3][0][0], self.path4.pk)
+        self.assertTrue(state[self.line.pk][0])
+
+    def test_bulk_delete_paths(self):
+        state = self.compare_with_legacy([self.path1, self.path2], Path.bulk_delete)
+        for point in self.points[:3] + self.points[4:]:
+            self.assertFalse(state[point.pk][0])
+            self.assertNotIn(state[point.pk][3][0][0], (self.path1.pk, self.path2.pk))
+
+    def test_deleted_points_stay_deleted(self):
+        self.points[1].delete()
+        self.path1.delete()
+        self.points[1].reload()
+        self.assertTrue(self.points[1].deleted)
+        self.assertEqual(self.points[1].paths.get(), self.path2)
+
+
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
 class TopologyMutateTest(TestCase):
 
@@ -832,6 +907,54 @@ class TopologyDerialization(TestCase):
         self.assertAlmostEqual(end_before, end_after, places=6)
 
 
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class TopologyBulkCreateTest(TestCase):
+    def setUp(self):
+        self.path1 = PathFactory.create(geom=LineString((0, 0), (100, 0)))
+        self.path2 = PathFactory.create(geom=LineString((0, 50), (100, 50)))
+
+    def test_bulk_create_points(self):
+        points = [Point(20, 10, srid=settings.SRID), Point(50, 45, srid=settings.SRID)]
+        topologies = Topology.bulk_create_points(points)
+        self.assertEqual(len(topologies), 2)
+        for topology, point, path, position in zip(topologies, points, (self.path1, self.path2), (0.2, 0.5)):
+            topology.reload()
+            self.assertEqual(topology.kind, 'TOPOLOGY')
+            self.assertEqual(topology.geom, point)
+            aggregation = topology.aggregations.get()
+            self.assertEqual(aggregation.path, path)
+            self.assertAlmostEqual(aggregation.start_position, position)
+            self.assertEqual(aggregation.start_position, aggregation.end_position)
+        self.assertAlmostEqual(abs(topologies[0].offset), 10)
+        self.assertAlmostEqual(abs(topologies[1].offset), 5)
+
+    def test_bulk_create_points_api_srid(self):
+        point = Point(50, 0, srid=settings.SRID).transform(settings.API_SRID, clone=True)
+        topology, = Topology.bulk_create_points([point])
+        topology.reload()
+        self.assertEqual(topology.offset, 0)
+        self.assertEqual(topology.aggregations.get().path, self.path1)
+        self.assertAlmostEqual(topology.geom.x, 50, places=3)
+
+    def test_bulk_create_lines(self):
+        topologies = Topology.bulk_create_lines([
+            [{"paths": [self.path1.pk], "positions": {"0": [0.0, 0.5]}, "offset": 0}],
+            '{"paths": [%s], "positions": {"0": [0.5, 1.0]}, "offset": 1}' % self.path2.pk,
+        ])
+        self.assertEqual(len(topologies), 2)
+        topologies[0].reload()
+        self.assertEqual(topologies[0].geom, LineString((0, 0), (50, 0), srid=settings.SRID))
+        topologies[1].reload()
+        self.assertEqual(topologies[1].offset, 1)
+        self.assertEqual(topologies[1].aggregations.get().path, self.path2)
+        self.assertAlmostEqual(topologies[1].geom.length, 50, places=3)
+
+    def test_bulk_create_lines_invalid(self):
+        with self.assertRaises(ValueError):
+            Topology.bulk_create_lines([[{"paths": [self.path1.pk + self.path2.pk + 1]}]])
+        self.assertFalse(Topology.objects.filter(kind='TOPOLOGY').exists())
+
+
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
 class TopologyOverlappingTest(TestCase):
 
@@ -880,3 +1003,20 @@ class TopologyOverlappingTest(TestCase):
         from geotrek.trekking.models import Trek
         overlaps = Topology.overlapping(Trek.objects.all())
         self.assertEqual(list(overlaps), [])
+
+    def test_overlapping_pks_by_topology(self):
+        overlaps = Topology.overlapping_pks(Topology.objects.filter(pk__in=[self.topo1.pk, self.topo2.pk]))
+        self.assertEqual(overlaps, {
+            self.topo1.pk: [self.topo1.pk, self.point2.pk, self.point3.pk, self.point1.pk, self.topo2.pk],
+            self.topo2.pk: [self.topo2.pk, self.point1.pk, self.point3.pk, self.point2.pk, self.topo1.pk],
+        })
+
+    def test_overlapping_pks_same_order_as_overlapping(self):
+        for topology in (self.topo1, self.topo2, self.point1):
+            overlaps = Topology.overlapping_pks([topology.pk])
+            self.assertEqual(overlaps[topology.pk], [t.pk for t in Topology.overlapping(topology)])
+
+    def test_overlapping_pks_without_overlaps(self):
+        from geotrek.trekking.models import Trek
+        self.assertEqual(Trek.overlapping_pks([self.topo1]), {self.topo1.pk: []})
+        self.assertEqual(Topology.overlapping_pks([]), {})
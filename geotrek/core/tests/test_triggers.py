@@ -6,6 +6,9 @@ from django.contrib.gis.geos import fromstr
 
 from unittest import skipIf
 
+from geotrek.core.factories import PathFactory, TopologyFactory
+from geotrek.core.models import Path, PathAggregation, PathNode
+
 
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
 class SmartMakelineTest(TestCase):
@@ -53,3 +56,55 @@ class SmartMakelineTest(TestCase):
         self.assertEqual(merged,
                          LineString((2, 0), (4, 0), (8, 0), (9, 0), (10, 0), (9, 0), (8, 0), (4, 0), (2, 0)),
                          merged.coords)
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class TopologyGeometryTriggerTest(TestCase):
+    def setUp(self):
+        self.path = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        self.topology1 = TopologyFactory.create(paths=[(self.path, 0, 1)])
+        self.topology2 = TopologyFactory.create(paths=[(self.path, 0, 1)])
+        self.other = TopologyFactory.create(paths=[(PathFactory.create(geom=LineString((0, 5), (10, 5))), 0, 1)])
+
+    def test_topologies_of_updated_aggregations(self):
+        PathAggregation.objects.filter(path=self.path).update(end_position=0.5)
+        for topology in (self.topology1, self.topology2):
+            topology.reload()
+            self.assertEqual(topology.geom, LineString((0, 0), (5, 0), srid=settings.SRID))
+        self.other.reload()
+        self.assertEqual(self.other.geom, LineString((0, 5), (10, 5), srid=settings.SRID))
+
+    def test_topologies_of_moved_aggregations(self):
+        PathAggregation.objects.filter(topo_object=self.other).update(topo_object=self.topology1)
+        PathAggregation.objects.filter(topo_object=self.topology1, path=self.path).delete()
+        self.topology1.reload()
+        self.assertEqual(self.topology1.geom, LineString((0, 5), (10, 5), srid=settings.SRID))
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class PathNodeTriggerTest(TestCase):
+    def setUp(self):
+        self.path1 = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        self.path2 = PathFactory.create(geom=LineString((10, 0), (10, 10)))
+
+    def test_connected_paths_share_node(self):
+        self.assertEqual(self.path1.end_node_id, self.path2.start_node_id)
+        self.assertNotEqual(self.path1.start_node_id, self.path2.end_node_id)
+        self.assertEqual(PathNode.objects.count(), 3)
+        self.assertEqual(self.path1.end_node.geom.coords, (10, 0))
+
+    def test_moved_extremity_changes_node(self):
+        self.path2.geom = LineString((10, 0), (20, 20))
+        self.path2.save()
+        self.path2.refresh_from_db()
+        self.assertEqual(self.path2.start_node_id, self.path1.end_node_id)
+        self.assertEqual(self.path2.end_node.geom.coords, (20, 20))
+        self.assertEqual(PathNode.objects.count(), 3)
+
+    def test_orphan_nodes_are_deleted(self):
+        node_id = self.path1.end_node_id
+        Path.objects.filter(pk=self.path2.pk).delete()
+        self.assertTrue(PathNode.objects.filter(pk=node_id).exists())
+        self.assertEqual(PathNode.objects.count(), 2)
+        Path.objects.filter(pk=self.path1.pk).delete()
+        self.assertEqual(PathNode.objects.count(), 0)
@@ -272,6 +272,19 @@ class PathViewsTest(CommonTest):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/json')
 
+    def test_elevation_area_binary(self):
+        self.login()
+        path = self.modelfactory.create()
+        response = self.client.get('/api/en/paths/{pk}/dem.bin'.format(pk=path.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+
+    def test_elevation_area_unknown_resolution(self):
+        self.login()
+        path = self.modelfactory.create()
+        response = self.client.get('/api/en/paths/{pk}/dem.json?resolution=12'.format(pk=path.pk))
+        self.assertEqual(response.status_code, 404)
+
     def test_sum_path_zero(self):
         self.login()
         response = self.client.get('/api/path/paths.json')
@@ -595,6 +608,16 @@ class PathViewsTest(CommonTest):
         response = self.client.get(obj.get_layer_url(), {"no_draft": "true"})
         self.assertEqual(len(response.json()['features']), 2)
 
+    def test_draft_path_layer_other_values_not_cached(self):
+        self.login()
+        self.modelfactory(draft=False)
+        obj = self.modelfactory(draft=True)
+        response = self.client.get(obj.get_layer_url(), {"no_draft": "1"})
+        self.assertEqual(len(response.json()['features']), 1)
+        # Full layer is not replaced by the layer without drafts
+        response = self.client.get(obj.get_layer_url())
+        self.assertEqual(len(response.json()['features']), 2)
+
 
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
 class PathKmlGPXTest(TestCase):
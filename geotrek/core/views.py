@@ -3,6 +3,7 @@ import logging
 from collections import defaultdict
 
 from django.contrib.gis.db.models.functions import Transform
+from django.contrib.gis.geos import Point
 from django.contrib.auth.decorators import permission_required
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
@@ -29,11 +30,12 @@ from geotrek.common.views import PublicOrReadPermMixin
 from geotrek.core.models import AltimetryMixin
 
 from .models import Path, Trail, Topology
+from .helpers import TopologyHelper
 from .forms import PathForm, TrailForm
 from .filters import PathFilterSet, TrailFilterSet
 from .serializers import PathSerializer, PathGeojsonSerializer, TrailSerializer, TrailGeojsonSerializer
 from . import graph as graph_lib
-from django.http.response import HttpResponse, JsonResponse
+from django.http.response import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.db.models import Sum
 from geotrek.api.v2.functions import Length
@@ -65,6 +67,7 @@ class CreateFromTopologyMixin(object):
 class PathLayer(MapEntityLayer):
     properties = ['name', 'draft']
     queryset = Path.objects.all()
+    cache_variants = [{}, {'no_draft': 'true'}]
 
     def get_queryset(self):
         qs = super(PathLayer, self).get_queryset()
@@ -222,8 +225,7 @@ class MultiplePathDelete(TemplateView):
         return self.delete(request, *args, **kwargs)
 
     def delete(self, request, *args, **kwargs):
-        for path in self.paths:
-            path.delete()
+        Path.bulk_delete(self.paths)
         return HttpResponseRedirect(reverse(self.success_url))
 
     def get_context_data(self, **kwargs):
@@ -271,29 +273,66 @@ class PathViewSet(MapEntityViewSet):
         return Path.objects.annotate(api_geom=Transform("geom", settings.API_SRID))
 
 
+def store_graph(cache, key, graph):
+    """
+    Store the routing graph in cache, unless a graph of the same version was
+    already stored by another process (compare-and-set on the version).
+    """
+    if cache.add('{}_{}'.format(key, graph.version), True):
+        cache.set(key, graph)
+
+
 @login_required
 @cache_control(max_age=0, must_revalidate=True)
 @cache_last_modified(lambda x: Path.latest_updated())
 def get_graph_json(request):
+    """
+    Returns the routing graph of paths.
+    With a ``since`` parameter (value of ``X-Graph-Version`` header of a
+    previous response), only returns the changes since this version.
+    """
     cache = caches['fat']
-    key = 'path_graph_json'
-
-    result = cache.get(key)
-    latest = Path.latest_updated()
-
-    if result and latest:
-        cache_latest, json_graph = result
-        # Not empty and still valid
-        if cache_latest and cache_latest >= latest:
-            return HttpJSONResponse(json_graph)
+    key = 'path_graph'
+    qs = graph_lib.routable_paths()
+
+    graph = cache.get(key)
+    if graph is not None and graph.is_stale():
+        # Journal entries since last refresh may have been purged
+        graph = None
+    if graph is None:
+        graph = graph_lib.PathGraph.build(qs)
+        store_graph(cache, key, graph)
+    elif graph.refresh(qs):
+        store_graph(cache, key, graph)
+
+    since = request.GET.get('since')
+    delta = graph.delta(since) if since else None
+    if delta is not None:
+        response = HttpJSONResponse(json.dumps(delta))
+    else:
+        # Whole graph, with a flag if an unknown version was requested
+        extra = {'version': graph.version, 'full': True} if since else None
+        response = StreamingHttpResponse(graph.iter_json(extra), content_type='application/json')
+    response['X-Graph-Version'] = graph.version
+    return response
 
-    # cache does not exist or is not up to date
-    # rebuild the graph and cache the json
-    graph = graph_lib.graph_edges_nodes_of_qs(Path.objects.exclude(draft=True))
-    json_graph = json.dumps(graph)
 
-    cache.set(key, (latest, json_graph))
-    return HttpJSONResponse(json_graph)
+@login_required
+def get_route_json(request):
+    """
+    Returns the shortest route between steps, as a serialized topology.
+    ``steps`` parameter is a JSON list of points: ``[{"lat": ..., "lng": ..., "snap": ...}, ...]``,
+    ``snap`` (optional) being the pk of the path to snap the point on.
+    """
+    try:
+        steps = json.loads(request.GET.get('steps', ''))
+        if not isinstance(steps, list) or len(steps) < 2:
+            raise ValueError(_("At least two steps are required"))
+        steps = [(Point(step['lng'], step['lat'], srid=settings.API_SRID), step.get('snap')) for step in steps]
+        serialized = TopologyHelper.route(steps)
+    except (ValueError, KeyError, TypeError) as exc:
+        return JsonResponse({'error': '%s' % exc}, status=400)
+    return JsonResponse({'topology': serialized})
 
 
 class TrailLayer(MapEntityLayer):
@@ -1,3 +1,5 @@
+from django.db.models import F
+
 from mapentity.views import (MapEntityLayer, MapEntityList, MapEntityJsonList, MapEntityFormat,
                              MapEntityDetail, MapEntityDocument, MapEntityCreate, MapEntityUpdate, MapEntityDelete)
 
@@ -12,6 +14,7 @@ from .forms import PhysicalEdgeForm, LandEdgeForm, CompetenceEdgeForm, WorkManag
 class PhysicalEdgeLayer(MapEntityLayer):
     queryset = PhysicalEdge.objects.existing()
     properties = ['color_index', 'name']
+    tile_properties = {'color_index': F('physical_type'), 'name': F('physical_type__name')}
 
 
 class PhysicalEdgeList(MapEntityList):
@@ -57,6 +60,7 @@ class PhysicalEdgeDelete(MapEntityDelete):
 class LandEdgeLayer(MapEntityLayer):
     queryset = LandEdge.objects.existing()
     properties = ['color_index', 'name']
+    tile_properties = {'color_index': F('land_type'), 'name': F('land_type__name')}
 
 
 class LandEdgeList(MapEntityList):
@@ -102,6 +106,7 @@ class LandEdgeDelete(MapEntityDelete):
 class CompetenceEdgeLayer(MapEntityLayer):
     queryset = CompetenceEdge.objects.existing()
     properties = ['color_index', 'name']
+    tile_properties = {'color_index': F('organization'), 'name': F('organization__organism')}
 
 
 class CompetenceEdgeList(MapEntityList):
@@ -147,6 +152,7 @@ class CompetenceEdgeDelete(MapEntityDelete):
 class WorkManagementEdgeLayer(MapEntityLayer):
     queryset = WorkManagementEdge.objects.existing()
     properties = ['color_index', 'name']
+    tile_properties = {'color_index': F('organization'), 'name': F('organization__organism')}
 
 
 class WorkManagementEdgeList(MapEntityList):
@@ -192,6 +198,7 @@ class WorkManagementEdgeDelete(MapEntityDelete):
 class SignageManagementEdgeLayer(MapEntityLayer):
     queryset = SignageManagementEdge.objects.existing()
     properties = ['color_index', 'name']
+    tile_properties = {'color_index': F('organization'), 'name': F('organization__organism')}
 
 
 class SignageManagementEdgeList(MapEntityList):
@@ -388,6 +388,9 @@ MAPENTITY_CONFIG = {
     'GPX_FIELD_NAME': 'geom_3d'
 }
 
+LAYERS_PRECOMPUTE_ENABLED = False  # Refresh map layers in background (celery) after each change
+LAYERS_PRECOMPUTE_DELAY = 10  # Seconds to wait for other changes before refreshing map layers
+
 DEFAULT_STRUCTURE_NAME = os.getenv('DEFAULT_STRUCTURE', 'My structure')
 
 VIEWPORT_MARGIN = 0.1  # On list page, around SPATIAL_EXTENT
@@ -396,6 +399,7 @@ PATHS_LINE_MARKER = 'dotL'
 PATH_SNAPPING_DISTANCE = 1  # Distance of path snapping in meters
 SNAP_DISTANCE = 30  # Distance of snapping in pixels
 PATH_MERGE_SNAPPING_DISTANCE = 2  # minimum distance to merge paths
+PATH_GRAPH_SNAPPING_TOLERANCE = None  # Size of grid on which path extremities are snapped to be merged in routing graph nodes
 
 ALTIMETRIC_PROFILE_PRECISION = 25  # Sampling precision in meters
 ALTIMETRIC_PROFILE_AVERAGE = 2  # nb of points for altimetry moving average
@@ -408,7 +412,9 @@ ALTIMETRIC_PROFILE_FONTSIZE = 25
 ALTIMETRIC_PROFILE_FONT = 'ubuntu'
 ALTIMETRIC_PROFILE_MIN_YSCALE = 1200  # Minimum y scale (in meters)
 ALTIMETRIC_AREA_MAX_RESOLUTION = 150  # Maximum number of points (by width/height)
+ALTIMETRIC_AREA_RESOLUTIONS = [38, 75, 150]  # Resolutions available with ``resolution`` parameter of DEM area
 ALTIMETRIC_AREA_MARGIN = 0.15
+ALTIMETRIC_DEM_OVERVIEWS = [2, 4, 8, 16]  # Overview levels of DEM created by loaddem
 
 # Let this be defined at instance-level
 LEAFLET_CONFIG = {
@@ -603,6 +609,9 @@ MOBILE_TILES_RADIUS_SMALL = 0.005  # ~500 m
 MOBILE_TILES_GLOBAL_ZOOMS = list(range(13))
 MOBILE_TILES_LOW_ZOOMS = list(range(13, 15))
 MOBILE_TILES_HIGH_ZOOMS = list(range(15, 17))
+MOBILE_TILES_WORKERS = 4  # Number of concurrent tiles downloads
+MOBILE_TILES_STORE = os.path.join(VAR_DIR, 'tiles', 'store.sqlite')  # Tiles reused by next syncs (None to disable)
+MOBILE_TILES_STORE_MAX_AGE = 30  # Days before downloading stored tiles again
 MOBILE_CATEGORY_PICTO_SIZE = 32
 MOBILE_POI_PICTO_SIZE = 32
 MOBILE_INFORMATIONDESKTYPE_PICTO_SIZE = 32
@@ -779,6 +788,9 @@ REPORT_FILETYPE = "Report"
 PARSER_RETRY_SLEEP_TIME = 60  # time of sleep between requests
 PARSER_NUMBER_OF_TRIES = 3  # number of requests to try before abandon
 PARSER_RETRY_HTTP_STATUS = [503]
+PARSER_ATTACHMENTS_WORKERS = 4  # number of concurrent attachments downloads
+PARSER_ATTACHMENTS_HOST_RATE = None  # maximum number of attachments requests per second to a host (None: no limit)
+PARSER_PREFETCH_PAGES = 2  # number of API pages fetched in background while parsing previous ones
 
 USE_BOOKLET_PDF = False
 
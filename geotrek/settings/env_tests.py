@@ -22,6 +22,8 @@ MODELTRANSLATION_LANGUAGES = ('en', 'es', 'fr', 'it')
 
 LAND_BBOX_AREAS_ENABLED = True
 
+MOBILE_TILES_STORE = None
+
 
 class DisableMigrations():
     def __contains__(self, item):
@@ -1,10 +1,14 @@
 import csv
 
+from django.db.models import Count, Max, Prefetch
+
 from geotrek.authent.serializers import StructureSerializer
 from geotrek.common.serializers import PictogramSerializerMixin, BasePublishableSerializerMixin
 from geotrek.signage import models as signage_models
 
 from mapentity.serializers.commasv import CSVSerializer
+from mapentity.serializers.helpers import iter_chunks, StreamBuffer
+from mapentity.serializers.planning import ColumnsPlan
 from mapentity.serializers.shapefile import ZipShapeSerializer
 
 from rest_framework import serializers as rest_serializers
@@ -70,7 +74,7 @@ class BladeGeojsonSerializer(GeoFeatureModelSerializer, BladeSerializer):
 
 
 class CSVBladeSerializer(CSVSerializer):
-    def serialize(self, queryset, **options):
+    def iter_serialize(self, queryset, **options):
         """
         Uses self.columns, containing fieldnames to produce the CSV.
         The header of the csv is made of the verbose name of each field.
@@ -79,9 +83,8 @@ class CSVBladeSerializer(CSVSerializer):
         columns = options.pop('fields')
         columns_lines = options.pop('line_fields')
         model_line = signage_models.Line
-        stream = options.pop('stream')
         ascii = options.get('ensure_ascii', True)
-        max_lines = max([value.lines.count() for value in queryset])
+        max_lines = queryset.annotate(nb_lines=Count('lines')).aggregate(max_lines=Max('nb_lines'))['max_lines'] or 0
 
         header = self.get_csv_header(columns, model_blade)
 
@@ -95,16 +98,29 @@ class CSVBladeSerializer(CSVSerializer):
 
         getters_lines = self.getters_csv(columns_lines, model_line, ascii)
 
+        # Relations of blades, their lines and cities of their signage are fetched chunk by chunk
+        plan = ColumnsPlan(model_blade, columns)
+        signage_plan = ColumnsPlan(signage_models.Signage, ['cities'])
+        lines = ColumnsPlan(model_line, columns_lines).prepare(model_line.objects.order_by('number'))
+        blades = plan.prepare(queryset.order_by('signage__code', 'number')) \
+            .select_related('signage', 'topology').prefetch_related(Prefetch('lines', queryset=lines))
+
         def get_lines():
             yield header
-            for blade in queryset.order_by('signage__code', 'number'):
-                column_getter = [getters[field](blade, field) for field in columns]
-                for obj in blade.lines.order_by('number'):
-                    column_getter.extend(getters_lines[field](obj, field) for field in columns_lines)
-                yield column_getter
-
-        writer = csv.writer(stream)
-        writer.writerows(get_lines())
+            for chunk in iter_chunks(blades):
+                plan.resolve(chunk)
+                signage_plan.resolve([blade.signage for blade in chunk])
+                for blade in chunk:
+                    column_getter = [getters[field](blade, field) for field in columns]
+                    for obj in blade.lines.all():
+                        column_getter.extend(getters_lines[field](obj, field) for field in columns_lines)
+                    yield column_getter
+
+        buffr = StreamBuffer()
+        writer = csv.writer(buffr)
+        for line in get_lines():
+            writer.writerow(line)
+            yield from buffr.pop()
 
 
 class ZipBladeShapeSerializer(ZipShapeSerializer):
@@ -2,7 +2,9 @@ from collections import OrderedDict
 
 from django.conf import settings
 from django.contrib.auth.models import Permission
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from geotrek.common.tests import CommonTest
 from geotrek.authent.tests import AuthentFixturesTest
@@ -157,10 +159,23 @@ class BladeViewsTest(CommonTest):
         LineFactory.create(blade=blade, number=3)
         response = self.client.get(self.model.get_format_list_url() + '?format=csv')
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.content.split(b'\r\n')[0], b"ID,City,Signage,Printed elevation,Code,Type,Color,"
-                                                             b"Direction,Condition,Coordinates (WGS 84 / Pseudo-Mercator),Number 1,Text 1,"
-                                                             b"Distance 1,Time 1,Pictogram 1,Number 2,Text 2,"
-                                                             b"Distance 2,Time 2,Pictogram 2")
+        content = b''.join(response.streaming_content)
+        self.assertEqual(content.split(b'\r\n')[0], b"ID,City,Signage,Printed elevation,Code,Type,Color,"
+                                                    b"Direction,Condition,Coordinates (WGS 84 / Pseudo-Mercator),Number 1,Text 1,"
+                                                    b"Distance 1,Time 1,Pictogram 1,Number 2,Text 2,"
+                                                    b"Distance 2,Time 2,Pictogram 2")
+
+    def test_csv_format_queries_do_not_depend_on_blades(self):
+        self.login()
+        LineFactory.create(blade=BladeFactory.create(), number=3)
+        url = self.model.get_format_list_url() + '?format=csv'
+        with CaptureQueriesContext(connection) as one_blade:
+            b''.join(self.client.get(url).streaming_content)
+        for blade in BladeFactory.create_batch(3):
+            LineFactory.create(blade=blade, number=3)
+        with CaptureQueriesContext(connection) as many_blades:
+            b''.join(self.client.get(url).streaming_content)
+        self.assertEqual(len(many_blades), len(one_blade))
 
     def test_set_structure_with_permission(self):
         # The structure do not change because it changes with the signage form.
@@ -1,6 +1,6 @@
 from django.conf import settings
 from django.contrib.gis.db.models.functions import Transform
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 
 import logging
 from mapentity.views import (MapEntityLayer, MapEntityList, MapEntityJsonList, MapEntityFormat, MapEntityViewSet,
@@ -195,16 +195,13 @@ class BladeFormatList(MapEntityFormat, BladeList):
 
     def csv_view(self, request, context, **kwargs):
         serializer = CSVBladeSerializer()
-        response = HttpResponse(content_type='text/csv')
-        serializer.serialize(queryset=self.get_queryset(), stream=response,
-                             model=self.get_model(), fields=self.columns, line_fields=self.columns_line,
-                             ensure_ascii=True)
-        return response
+        return StreamingHttpResponse(
+            serializer.iter_serialize(queryset=self.get_queryset(), model=self.get_model(), fields=self.columns,
+                                      line_fields=self.columns_line, ensure_ascii=True),
+            content_type='text/csv')
 
     def shape_view(self, request, context, **kwargs):
         serializer = ZipBladeShapeSerializer()
-        response = HttpResponse(content_type='application/zip')
-        serializer.serialize(queryset=self.get_queryset(), model=Blade,
-                             stream=response, fields=self.columns)
-        response['Content-length'] = str(len(response.content))
-        return response
+        return StreamingHttpResponse(
+            serializer.iter_serialize(queryset=self.get_queryset(), model=Blade, fields=self.columns),
+            content_type='application/zip')
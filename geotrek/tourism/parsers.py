@@ -95,24 +95,25 @@ class ApidaeParser(AttachmentParserMixin, Parser):
             return []
         return self.root['objetsTouristiques']
 
+    def page_count(self, page):
+        return int(page['numFound'])
+
+    def page_request(self, skip):
+        params = {
+            'apiKey': self.api_key,
+            'projetId': self.project_id,
+            'selectionIds': [self.selection_id],
+            'count': self.size,
+            'first': skip,
+            'responseFields': self.responseFields
+        }
+        return self.url, {'params': {'query': json.dumps(params)}}
+
     def next_row(self):
-        while True:
-            params = {
-                'apiKey': self.api_key,
-                'projetId': self.project_id,
-                'selectionIds': [self.selection_id],
-                'count': self.size,
-                'first': self.skip,
-                'responseFields': self.responseFields
-            }
-            response = self.request_or_retry(self.url, params={'query': json.dumps(params)})
-            self.root = response.json()
-            self.nb = int(self.root['numFound'])
+        for self.root in self.fetch_pages(size=self.size, skip=self.skip):
+            self.nb = self.page_count(self.root)
             for row in self.items:
                 yield row
-            self.skip += self.size
-            if self.skip >= self.nb:
-                return
 
     def normalize_field_name(self, name):
         return name
@@ -521,12 +522,10 @@ class EspritParcParser(AttachmentParserMixin, Parser):
         return self.root['responseData']
 
     def next_row(self):
-        response = self.request_or_retry(self.url)
-        self.root = response.json()
-        self.nb = int(self.root['numFound'])
-
-        for row in self.items:
-            yield row
+        for self.root in self.fetch_pages():
+            self.nb = int(self.root['numFound'])
+            for row in self.items:
+                yield row
 
     def normalize_field_name(self, name):
         return name
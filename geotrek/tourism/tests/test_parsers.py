@@ -8,6 +8,7 @@ import os
 from django.test import TestCase, override_settings
 from django.core.management import call_command
 from django.core.management.base import CommandError
+from django.db import DatabaseError
 
 from geotrek.common.factories import RecordSourceFactory, TargetPortalFactory
 from geotrek.common.models import Attachment, FileType
@@ -78,7 +79,7 @@ class FMA28(TouristicEventTourInSoftParser):
 
 
 class ParserTests(TranslationResetMixin, TestCase):
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_apidae_failed(self, mocked):
         mocked.return_value.status_code = 404
         FileType.objects.create(type="Photographie")
@@ -88,7 +89,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         with self.assertRaises(CommandError):
             call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser', verbosity=2)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_espritparc_failed(self, mocked):
         mocked.return_value.status_code = 404
         FileType.objects.create(type="Photographie")
@@ -103,7 +104,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         with self.assertRaises(CommandError):
             call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser', verbosity=2)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     @override_settings(PARSER_RETRY_SLEEP_TIME=0)
     @mock.patch('geotrek.common.parsers.AttachmentParserMixin.download_attachments', False)
     def test_create_content_espritparc_retry(self, mocked):
@@ -131,7 +132,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser')
         self.assertEqual(TouristicContent.objects.count(), 1)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     @override_settings(PARSER_RETRY_SLEEP_TIME=0)
     def test_create_content_espritparc_retry_fail(self, mocked):
         def mocked_json():
@@ -154,7 +155,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         with self.assertRaisesRegex(CommandError, "Failed to download %s. HTTP status code 503" % EauViveParser.url):
             call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser')
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_espritparc_not_fail_type1_does_not_exist(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'espritparc.json')
@@ -175,7 +176,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertIn("Type 1 'Miel' does not exist for category 'Miels et produits de la ruche'. Please add it,",
                       output.getvalue())
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_espritparc_not_fail_type2_does_not_exist(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'espritparc.json')
@@ -197,7 +198,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertIn("Type 2 'Bienvenue à la ferme' does not exist for category 'Miels et produits de la ruche'. Please add it",
                       output.getvalue())
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_apidae(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeContent.json')
@@ -237,7 +238,62 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertEqual(Attachment.objects.count(), 3)
         self.assertEqual(Attachment.objects.first().content_object, content)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
+    def test_create_content_apidae_bulk(self, mocked):
+        def mocked_json():
+            filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeContent.json')
+            with open(filename, 'r') as f:
+                return json.load(f)
+        mocked.return_value.status_code = 200
+        mocked.return_value.json = mocked_json
+        mocked.return_value.content = b'Fake image'
+        mocked.return_value.headers = {}
+        FileType.objects.create(type="Photographie")
+        category = TouristicContentCategoryFactory(label="Eau vive")
+        TouristicContentType1Factory(label="Type A")
+        TouristicContentType1Factory(label="Type B")
+        call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser', bulk=True, verbosity=0)
+        content = TouristicContent.objects.get()
+        self.assertEqual(content.eid, "479743")
+        self.assertEqual(content.name, "Quey' Raft")
+        self.assertEqual(content.category, category)
+        self.assertTrue(content.published)
+        self.assertEqual(content.publication_date, date.today())
+        self.assertQuerysetEqual(
+            content.type1.all(),
+            ['<TouristicContentType1: Type A>', '<TouristicContentType1: Type B>']
+        )
+        self.assertEqual(Attachment.objects.count(), 3)
+        self.assertEqual(Attachment.objects.first().content_object, content)
+        content.type1.clear()
+        call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser', bulk=True, verbosity=0)
+        self.assertEqual(TouristicContent.objects.get().pk, content.pk)
+        self.assertEqual(content.type1.count(), 2)
+
+    @mock.patch('requests.Session.get')
+    def test_create_content_apidae_bulk_m2m_fail(self, mocked):
+        def mocked_json():
+            filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeContent.json')
+            with open(filename, 'r') as f:
+                return json.load(f)
+        mocked.return_value.status_code = 200
+        mocked.return_value.json = mocked_json
+        mocked.return_value.content = b'Fake image'
+        mocked.return_value.headers = {}
+        FileType.objects.create(type="Photographie")
+        TouristicContentCategoryFactory(label="Eau vive")
+        TouristicContentType1Factory(label="Type A")
+        TouristicContentType1Factory(label="Type B")
+        # Relations are then set object by object
+        with mock.patch.object(TouristicContent.type1.through.objects, 'bulk_create', side_effect=DatabaseError):
+            call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser', bulk=True, verbosity=0)
+        content = TouristicContent.objects.get()
+        self.assertQuerysetEqual(
+            content.type1.all(),
+            ['<TouristicContentType1: Type A>', '<TouristicContentType1: Type B>']
+        )
+
+    @mock.patch('requests.Session.get')
     def test_filetype_structure_none(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeContent.json')
@@ -254,7 +310,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser', verbosity=0)
         self.assertEqual(TouristicContent.objects.count(), 1)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_no_event_apidae(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeNoEvent.json')
@@ -268,7 +324,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         call_command('import', 'geotrek.tourism.parsers.TouristicEventApidaeParser', verbosity=2, stdout=output)
         self.assertEqual(TouristicEvent.objects.count(), 0)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_event_apidae(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeEvent.json')
@@ -308,7 +364,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         )
         self.assertEqual(Attachment.objects.count(), 3)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_event_apidae_constant_fields(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeEvent.json')
@@ -333,7 +389,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertQuerysetEqual(event.source.all(), ["Source 1", "Source 2"], transform=str)
         self.assertQuerysetEqual(event.portal.all(), ["Portal 1", "Portal 2"], transform=str)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_apidae_constant_fields(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeContent.json')
@@ -360,7 +416,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertQuerysetEqual(content.source.all(), ["Source 1", "Source 2"], transform=str)
         self.assertQuerysetEqual(content.portal.all(), ["Portal 1", "Portal 2"], transform=str)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_esprit(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'espritparc.json')
@@ -401,7 +457,7 @@ class ParserTests(TranslationResetMixin, TestCase):
             self.assertIn(one.name.lower(), name)
             self.assertEqual(one.category, category)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_tourinsoft_v2(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'tourinsoftContent.json')
@@ -438,7 +494,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertEqual(Attachment.objects.count(), 3)
         self.assertEqual(Attachment.objects.first().content_object, content)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_tourinsoft_v3(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'tourinsoftContentV3.json')
@@ -475,7 +531,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertEqual(Attachment.objects.count(), 3)
         self.assertEqual(Attachment.objects.first().content_object, content)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_event_tourinsoft(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'tourinsoftEvent.json')
@@ -40,8 +40,14 @@ class SyncRando:
         if self.global_sync.portal:
             treks = treks.filter(Q(portal__name=self.global_sync.portal) | Q(portal=None))
 
-        for trek in treks:
-            self.sync_detail(lang, trek)
+        models.Trek.prepare_elevation_profiles(treks)
+        self.global_sync.sync_objects(lang, treks, self.sync_detail, self.signature(lang))
+
+    def signature(self, lang):
+        def trek_signature(trek):
+            related = list(trek.parents) + list(trek.children)
+            return self.global_sync.object_signature(lang, trek, related)
+        return trek_signature
 
     def sync_detail(self, lang, trek):
         zipname = os.path.join('zip', 'treks', lang, '{pk}.zip'.format(pk=trek.pk))
@@ -23,6 +23,8 @@ class Command(BaseCommand):
         parser.add_argument('--description-field', '-d', action='store', dest='description_field', help='Name of the field that contains the description of the POI (optional)')
         parser.add_argument('--name-default', action='store', dest='name_default', help='Default value for POI name. Use only if --name-field is not set')
         parser.add_argument('--type-default', action='store', dest='type_default', help='Default value for POI Type. Use only if --type-field is not set')
+        parser.add_argument('--bulk', '-b', action='store_true', dest='bulk', default=False,
+                            help='Snap and save POIs of each layer at once (faster for large files)')
 
     def handle(self, *args, **options):
         filename = options['point_layer']
@@ -36,6 +38,7 @@ class Command(BaseCommand):
         field_name = options.get('name_field')
         field_poitype = options.get('type_field')
         field_description = options.get('description_field')
+        bulk = options.get('bulk') and settings.TREKKING_TOPOLOGY_ENABLED
 
         sid = transaction.savepoint()
 
@@ -60,14 +63,22 @@ class Command(BaseCommand):
                         "Set it with --type-field, or set a default value with --type-default"))
                     break
 
+                features = []
                 for feature in layer:
                     feature_geom = feature.geom
                     name = feature.get(field_name) if field_name in available_fields else options.get('name_default')
                     poitype = feature.get(field_poitype) if field_poitype in available_fields else options.get('type_default')
                     description = feature.get(field_description) if field_description in available_fields else ""
+                    if bulk:
+                        features.append((feature_geom, name, poitype, description))
+                        continue
                     self.create_poi(feature_geom, name, poitype, description)
                     if verbosity >= 2:
                         self.stdout.write(self.style.NOTICE("{} POI created.".format(name)))
+                if features:
+                    for poi in self.create_pois(features):
+                        if verbosity >= 2:
+                            self.stdout.write(self.style.NOTICE("{} POI created.".format(poi.name)))
 
             transaction.savepoint_commit(sid)
             if verbosity >= 2:
@@ -98,3 +109,23 @@ class Command(BaseCommand):
         self.counter += 1
 
         return poi
+
+    def create_pois(self, features):
+        """
+        Same as ``create_poi`` for a list of ``(geometry, name, poitype, description)``,
+        snapping all POIs on paths at once.
+        """
+        poitypes = {}
+        pois = []
+        points = []
+        for geometry, name, poitype, description in features:
+            if poitype not in poitypes:
+                poitypes[poitype], created = POIType.objects.get_or_create(label=poitype)
+            pois.append(POI(name=name, type=poitypes[poitype], description=description))
+            geometry = geometry.transform(settings.API_SRID, clone=True)
+            geometry.coord_dim = 2
+            points.append(Point(geometry.x, geometry.y, srid=settings.API_SRID))
+        POI.bulk_create_points(points, pois)
+        self.counter += len(pois)
+
+        return pois
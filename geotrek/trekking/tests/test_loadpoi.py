@@ -87,3 +87,14 @@ class LoadPOITest(TestCase):
         geom = GEOSGeometry('POINT(1 1)', srid=4326)
         poi = self.cmd.create_poi(geom, 'bridge', 'infra', 'description')
         self.assertEqual([self.path], list(poi.paths.all()))
+
+    @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+    def test_pois_are_created_in_bulk(self):
+        output = StringIO()
+        call_command('loadpoi', self.filename, verbosity=2, name_field='name', type_field='type', bulk=True,
+                     stdout=output)
+        self.assertIn('pont POI created.', output.getvalue())
+        self.assertEqual(POI.objects.count(), 2)
+        for poi in POI.objects.all():
+            self.assertEqual([self.path], list(poi.paths.all()))
+            self.assertIsNotNone(poi.geom)
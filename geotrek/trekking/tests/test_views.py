@@ -144,7 +144,9 @@ class POIViewsTest(CommonTest):
             self.client.get(self.model.get_jsonlist_url())
 
         with self.assertNumQueries(9):
-            self.client.get(self.model.get_format_list_url())
+            response = self.client.get(self.model.get_format_list_url())
+            # Streamed content is fetched while being read
+            b''.join(response.streaming_content)
 
     def test_pois_on_treks_do_not_exist(self):
         self.login()
@@ -431,7 +433,7 @@ class TrekViewsTest(CommonTest):
         self.assertEqual(response.get('Content-Type'), 'text/csv')
 
         # Read the csv
-        reader = csv.DictReader(StringIO(response.content.decode("utf-8")), delimiter=',')
+        reader = csv.DictReader(StringIO(b''.join(response.streaming_content).decode("utf-8")), delimiter=',')
         for row in reader:
             self.assertEqual(row['Cities'], "Trifouilli, Refouilli")
             self.assertEqual(row['Districts'], self.district.name)
@@ -1503,7 +1505,8 @@ class ServiceViewsTest(CommonTest):
 
         # 1) session, 2) user, 3) user perms, 4) group perms, 5) list
         with self.assertNumQueries(5):
-            self.client.get(self.model.get_format_list_url())
+            response = self.client.get(self.model.get_format_list_url())
+            b''.join(response.streaming_content)
 
     def test_services_on_treks_do_not_exist(self):
         self.login()
@@ -0,0 +1,57 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+
+
+# Position of the first intersection with zone along linear objects (see zoning_position() SQL function)
+POSITION = """CASE WHEN GeometryType(o.geom) = 'LINESTRING' THEN
+    (SELECT min(ST_LineLocatePoint(o.geom, ST_StartPoint(d.geom))) FROM ST_Dump(ST_Intersection(o.geom, z.geom)) AS d)
+END"""
+
+FILL_MEMBERSHIPS = ";".join(
+    """INSERT INTO zoning_zoningmembership ({fk}, {zone_fk}, position)
+       SELECT o.id, z.{zone_pk}, {position} FROM {table} o JOIN {zone_table} z ON ST_Intersects(o.geom, z.geom)
+       {where}""".format(fk=fk, table=table, where=where, zone_fk=zone_fk, zone_pk=zone_pk, zone_table=zone_table,
+                         position=POSITION)
+    for fk, table, where in (
+        ('topology_id', 'core_topology', "WHERE o.kind NOT IN ('CITYEDGE', 'DISTRICTEDGE', 'RESTRICTEDAREAEDGE')"),
+        ('touristic_content_id', 'tourism_touristiccontent', ''),
+        ('touristic_event_id', 'tourism_touristicevent', ''),
+    )
+    for zone_fk, zone_pk, zone_table in (
+        ('city_id', 'code', 'zoning_city'),
+        ('district_id', 'id', 'zoning_district'),
+        ('restricted_area_id', 'id', 'zoning_restrictedarea'),
+    )
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_auto_20201117_1302'),
+        ('tourism', '0014_auto_20201117_1302'),
+        ('zoning', '0005_auto_20201126_0706'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZoningMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.FloatField(null=True)),
+                ('city', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='zoning.city')),
+                ('district', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='zoning.district')),
+                ('restricted_area', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='zoning.restrictedarea')),
+                ('topology', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='zoning_memberships', to='core.topology')),
+                ('touristic_content', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='zoning_memberships', to='tourism.touristiccontent')),
+                ('touristic_event', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='zoning_memberships', to='tourism.touristicevent')),
+            ],
+            options={
+                'verbose_name': 'Zoning membership',
+                'verbose_name_plural': 'Zoning memberships',
+                'ordering': [django.db.models.expressions.OrderBy(django.db.models.expressions.F('position'), nulls_last=True), 'city', 'district', 'restricted_area'],
+            },
+        ),
+        migrations.RunSQL(FILL_MEMBERSHIPS, migrations.RunSQL.noop),
+    ]
@@ -4,10 +4,13 @@
    (not MapEntity : just layers, on which intersections with objects is done in triggers)
 
 """
+from collections import defaultdict
+
 from django.conf import settings
 from django.contrib.gis.db import models
+from django.db.models import F
 from django.utils.translation import gettext_lazy as _
-from geotrek.common.utils import uniquify, intersecting
+from geotrek.common.utils import uniquify, intersecting, bulk_intersecting
 from geotrek.maintenance.models import Intervention, Project
 from geotrek.tourism.models import TouristicContent, TouristicEvent
 from operator import attrgetter
@@ -20,6 +23,16 @@ if 'geotrek.signage' in settings.INSTALLED_APPS:
     from geotrek.signage.models import Blade
 
 
+def point_zones(topology, zone_model, field):
+    """
+    Zones of a point topology. Zones associated within a distance of the topology
+    (see ``Topology.distance()``) are not in memberships and are still queried.
+    """
+    if topology.distance(zone_model):
+        return uniquify(intersecting(zone_model, topology))
+    return ZoningMembership.zones(topology, field)
+
+
 class RestrictedAreaType(models.Model):
     name = models.CharField(max_length=200, verbose_name=_("Name"))
 
@@ -84,8 +97,8 @@ if settings.TREKKING_TOPOLOGY_ENABLED:
                       _("Restricted areas"))
     Path.add_property('published_areas', lambda self: [area for area in self.areas if area.published], _("Published areas"))
     Topology.add_property('area_edges', RestrictedAreaEdge.topology_area_edges, _("Restricted area edges"))
-    Topology.add_property('areas', lambda self: uniquify(
-        intersecting(RestrictedArea, self)) if self.ispoint() else uniquify(
+    Topology.add_property('areas', lambda self: point_zones(
+        self, RestrictedArea, 'restricted_area') if self.ispoint() else uniquify(
         map(attrgetter('restricted_area'), self.area_edges)), _("Restricted areas"))
     Intervention.add_property('area_edges', lambda self: self.target.area_edges if self.target and self.target else [],
                               _("Restricted area edges"))
@@ -95,16 +108,16 @@ if settings.TREKKING_TOPOLOGY_ENABLED:
     Project.add_property('areas', lambda self: uniquify(map(attrgetter('restricted_area'), self.area_edges)),
                          _("Restricted areas"))
 else:
-    Topology.add_property('areas', lambda self: uniquify(intersecting(RestrictedArea, self, distance=0)),
+    Topology.add_property('areas', lambda self: ZoningMembership.zones(self, 'restricted_area'),
                           _("Restricted areas"))
     Project.add_property('areas', lambda self: uniquify(intersecting(RestrictedArea, self, distance=0)),
                          _("Restricted areas"))
     Intervention.add_property('areas', lambda self: uniquify(intersecting(RestrictedArea, self, distance=0)),
                               _("Restricted areas"))
 
-TouristicContent.add_property('areas', lambda self: intersecting(RestrictedArea, self, distance=0),
+TouristicContent.add_property('areas', lambda self: ZoningMembership.zones(self, 'restricted_area'),
                               _("Restricted areas"))
-TouristicEvent.add_property('areas', lambda self: intersecting(RestrictedArea, self, distance=0),
+TouristicEvent.add_property('areas', lambda self: ZoningMembership.zones(self, 'restricted_area'),
                             _("Restricted areas"))
 if 'geotrek.diving' in settings.INSTALLED_APPS:
     Dive.add_property('areas', lambda self: uniquify(intersecting(RestrictedArea, self, distance=0)), _("Restricted areas"))
@@ -161,20 +174,19 @@ if settings.TREKKING_TOPOLOGY_ENABLED:
     Path.add_property('cities', lambda self: uniquify(map(attrgetter('city'), self.city_edges)), _("Cities"))
     Path.add_property('published_cities', lambda self: [city for city in self.cities if city.published], _("Published cities"))
     Topology.add_property('city_edges', CityEdge.topology_city_edges, _("City edges"))
-    Topology.add_property('cities',
-                          lambda self: uniquify(intersecting(City, self, distance=0)), _("Cities"))
+    Topology.add_property('cities', lambda self: ZoningMembership.zones(self, 'city'), _("Cities"))
     Intervention.add_property('city_edges', lambda self: self.target.city_edges if self.target else [],
                               _("City edges"))
     Intervention.add_property('cities', lambda self: self.target.cities if self.target else [], _("Cities"))
     Project.add_property('city_edges', lambda self: self.edges_by_attr('city_edges'), _("City edges"))
     Project.add_property('cities', lambda self: uniquify(map(attrgetter('city'), self.city_edges)), _("Cities"))
 else:
-    Topology.add_property('cities', lambda self: uniquify(intersecting(City, self, distance=0)), _("Cities"))
+    Topology.add_property('cities', lambda self: ZoningMembership.zones(self, 'city'), _("Cities"))
     Project.add_property('cities', lambda self: uniquify(intersecting(City, self, distance=0)), _("Cities"))
     Intervention.add_property('cities', lambda self: uniquify(intersecting(City, self, distance=0)), _("Cities"))
 
-TouristicContent.add_property('cities', lambda self: intersecting(City, self, distance=0), _("Cities"))
-TouristicEvent.add_property('cities', lambda self: intersecting(City, self, distance=0), _("Cities"))
+TouristicContent.add_property('cities', lambda self: ZoningMembership.zones(self, 'city'), _("Cities"))
+TouristicEvent.add_property('cities', lambda self: ZoningMembership.zones(self, 'city'), _("Cities"))
 if 'geotrek.diving' in settings.INSTALLED_APPS:
     Dive.add_property('cities', lambda self: uniquify(intersecting(City, self, distance=0)), _("Cities"))
     Dive.add_property('published_cities', lambda self: [city for city in self.cities if city.published], _("Published cities"))
@@ -229,8 +241,8 @@ if settings.TREKKING_TOPOLOGY_ENABLED:
                       _("Districts"))
     Path.add_property('published_districts', lambda self: [district for district in self.districts if district.published], _("Published districts"))
     Topology.add_property('district_edges', DistrictEdge.topology_district_edges, _("District edges"))
-    Topology.add_property('districts', lambda self: uniquify(
-        intersecting(District, self)) if self.ispoint() else uniquify(
+    Topology.add_property('districts', lambda self: point_zones(
+        self, District, 'district') if self.ispoint() else uniquify(
         map(attrgetter('district'), self.district_edges)), _("Districts"))
     Intervention.add_property('district_edges', lambda self: self.target.district_edges if self.target else [], _("District edges"))
     Intervention.add_property('districts', lambda self: self.target.districts if self.target else [],
@@ -239,15 +251,15 @@ if settings.TREKKING_TOPOLOGY_ENABLED:
     Project.add_property('districts', lambda self: uniquify(map(attrgetter('district'), self.district_edges)),
                          _("Districts"))
 else:
-    Topology.add_property('districts', lambda self: uniquify(intersecting(District, self, distance=0)),
+    Topology.add_property('districts', lambda self: ZoningMembership.zones(self, 'district'),
                           _("Districts"))
     Project.add_property('districts', lambda self: uniquify(intersecting(District, self, distance=0)),
                          _("Districts"))
     Intervention.add_property('districts', lambda self: uniquify(intersecting(District, self, distance=0)),
                               _("Districts"))
 
-TouristicContent.add_property('districts', lambda self: intersecting(District, self, distance=0), _("Districts"))
-TouristicEvent.add_property('districts', lambda self: intersecting(District, self, distance=0), _("Districts"))
+TouristicContent.add_property('districts', lambda self: ZoningMembership.zones(self, 'district'), _("Districts"))
+TouristicEvent.add_property('districts', lambda self: ZoningMembership.zones(self, 'district'), _("Districts"))
 if 'geotrek.diving' in settings.INSTALLED_APPS:
     Dive.add_property('districts', lambda self: uniquify(intersecting(District, self, distance=0)), _("Districts"))
     Dive.add_property('published_districts', lambda self: [district for district in self.districts if district.published], _("Published districts"))
@@ -260,3 +272,91 @@ Project.add_property('published_districts', lambda self: [district for district
 Intervention.add_property('published_districts', lambda self: [district for district in self.districts if district.published], _("Published districts"))
 TouristicContent.add_property('published_districts', lambda self: [district for district in self.districts if district.published], _("Published districts"))
 TouristicEvent.add_property('published_districts', lambda self: [district for district in self.districts if district.published], _("Published districts"))
+
+
+class ZoningMembership(models.Model):
+    """
+    Zones (cities, districts, restricted areas) intersecting topologies, touristic contents
+    and touristic events, maintained by triggers when objects or zones geometries change.
+    ``position`` orders zones along linear objects, as ``intersecting()`` does.
+    Zoning edges topologies have no membership.
+    """
+    topology = models.ForeignKey(Topology, null=True, related_name='zoning_memberships', on_delete=models.CASCADE)
+    touristic_content = models.ForeignKey(TouristicContent, null=True, related_name='zoning_memberships',
+                                          on_delete=models.CASCADE)
+    touristic_event = models.ForeignKey(TouristicEvent, null=True, related_name='zoning_memberships',
+                                        on_delete=models.CASCADE)
+    city = models.ForeignKey(City, null=True, related_name='memberships', on_delete=models.CASCADE)
+    district = models.ForeignKey(District, null=True, related_name='memberships', on_delete=models.CASCADE)
+    restricted_area = models.ForeignKey(RestrictedArea, null=True, related_name='memberships',
+                                        on_delete=models.CASCADE)
+    position = models.FloatField(null=True)
+
+    class Meta:
+        verbose_name = _("Zoning membership")
+        verbose_name_plural = _("Zoning memberships")
+        # Zones along the object, then in their own ordering (as ``intersecting()`` does)
+        ordering = [F('position').asc(nulls_last=True), 'city', 'district', 'restricted_area']
+
+    @staticmethod
+    def object_field(obj):
+        if isinstance(obj, TouristicContent):
+            return 'touristic_content'
+        if isinstance(obj, TouristicEvent):
+            return 'touristic_event'
+        return 'topology'
+
+    @staticmethod
+    def sorted_zones(memberships, field):
+        """ Zones of memberships, which are fetched in order (see ``Meta.ordering``) """
+        return uniquify(getattr(membership, field) for membership in memberships)
+
+    @classmethod
+    def zones(cls, obj, field):
+        """
+        Zones of an object, ``field`` being ``city``, ``district`` or ``restricted_area``.
+        Memberships prefetched with ``prefetch_related('zoning_memberships__<field>')`` are used.
+        """
+        if 'zoning_memberships' in getattr(obj, '_prefetched_objects_cache', {}):
+            memberships = [m for m in obj.zoning_memberships.all() if getattr(m, '%s_id' % field) is not None]
+        else:
+            memberships = obj.zoning_memberships.filter(**{'%s__isnull' % field: False}).select_related(field)
+        return cls.sorted_zones(memberships, field)
+
+    @classmethod
+    def bulk_zones(cls, objects, field):
+        """
+        Same as ``zones()`` for many objects at once, in one query. Returns lists of zones by object pk.
+        """
+        result = {obj.pk: [] for obj in objects}
+        if not result:
+            return result
+        object_field = cls.object_field(objects[0])
+        memberships = cls.objects.filter(**{'%s__in' % object_field: list(result.keys()),
+                                            '%s__isnull' % field: False}).select_related(field)
+        by_object = defaultdict(list)
+        for membership in memberships:
+            by_object[getattr(membership, '%s_id' % object_field)].append(membership)
+        for pk, object_memberships in by_object.items():
+            result[pk] = cls.sorted_zones(object_memberships, field)
+        return result
+
+
+# Compute zoning of many objects at once in lists and exports
+if settings.TREKKING_TOPOLOGY_ENABLED:
+    Path.add_bulk_resolver('cities', lambda paths: CityEdge.bulk_path_topologies(paths, 'city'))
+    Path.add_bulk_resolver('districts', lambda paths: DistrictEdge.bulk_path_topologies(paths, 'district'))
+    Path.add_bulk_resolver('areas', lambda paths: RestrictedAreaEdge.bulk_path_topologies(paths, 'restricted_area'))
+    Topology.add_bulk_resolver('cities', lambda topologies: ZoningMembership.bulk_zones(topologies, 'city'))
+else:
+    Topology.add_bulk_resolver('cities', lambda topologies: ZoningMembership.bulk_zones(topologies, 'city'))
+    Topology.add_bulk_resolver('districts', lambda topologies: ZoningMembership.bulk_zones(topologies, 'district'))
+    Topology.add_bulk_resolver('areas', lambda topologies: ZoningMembership.bulk_zones(topologies, 'restricted_area'))
+for model in (TouristicContent, TouristicEvent):
+    model.add_bulk_resolver('cities', lambda objects: ZoningMembership.bulk_zones(objects, 'city'))
+    model.add_bulk_resolver('districts', lambda objects: ZoningMembership.bulk_zones(objects, 'district'))
+    model.add_bulk_resolver('areas', lambda objects: ZoningMembership.bulk_zones(objects, 'restricted_area'))
+if 'geotrek.diving' in settings.INSTALLED_APPS:
+    Dive.add_bulk_resolver('cities', lambda dives: bulk_intersecting(City, dives))
+    Dive.add_bulk_resolver('districts', lambda dives: bulk_intersecting(District, dives))
+    Dive.add_bulk_resolver('areas', lambda dives: bulk_intersecting(RestrictedArea, dives))
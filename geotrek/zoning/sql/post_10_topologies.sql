@@ -84,47 +84,52 @@ FOR EACH ROW EXECUTE PROCEDURE auto_clean_topologies_sig_d();
 -- Sync when Troncon modified
 -------------------------------------------------------------------------------
 
-CREATE FUNCTION {# geotrek.zoning #}.auto_link_path_topologies_iu() RETURNS trigger SECURITY DEFINER AS $$
+CREATE FUNCTION {# geotrek.zoning #}.auto_link_path_topologies(pid integer, pgeom geometry, clear boolean) RETURNS void SECURITY DEFINER AS $$
 DECLARE
     rec record;
     tab varchar;
     eid integer;
 BEGIN
     -- Remove obsolete topology
-    IF TG_OP = 'UPDATE' THEN
+    IF clear THEN
         -- Related topology/zonage/secteur/commune will be cleared by another trigger
-        DELETE FROM core_pathaggregation et USING zoning_restrictedareaedge z WHERE et.path_id = OLD.id AND et.topo_object_id = z.topo_object_id;
-        DELETE FROM core_pathaggregation et USING zoning_districtedge s WHERE et.path_id = OLD.id AND et.topo_object_id = s.topo_object_id;
-        DELETE FROM core_pathaggregation et USING zoning_cityedge c WHERE et.path_id = OLD.id AND et.topo_object_id = c.topo_object_id;
+        DELETE FROM core_pathaggregation et USING zoning_restrictedareaedge z WHERE et.path_id = pid AND et.topo_object_id = z.topo_object_id;
+        DELETE FROM core_pathaggregation et USING zoning_districtedge s WHERE et.path_id = pid AND et.topo_object_id = s.topo_object_id;
+        DELETE FROM core_pathaggregation et USING zoning_cityedge c WHERE et.path_id = pid AND et.topo_object_id = c.topo_object_id;
     END IF;
 
     -- Add new topology
     -- Note: Column names differ between commune, secteur and zonage, we can not use an elegant loop.
 
     -- Commune
-    FOR rec IN EXECUTE 'SELECT id, ST_LineLocatePoint($1, COALESCE(ST_StartPoint(geom), geom)) as pk_a, CASE WHEN ST_EQUALS(ST_EndPoint(geom), ST_StartPoint($1)) THEN 1 ELSE ST_LineLocatePoint($1, COALESCE(ST_EndPoint(geom), geom)) END as pk_b FROM (SELECT code AS id, (ST_Dump(ST_Multi(ST_Intersection(geom, $1)))).geom AS geom FROM zoning_city WHERE ST_Intersects(geom, $1)) AS sub WHERE ST_GeometryType(geom)=''ST_LineString''' USING NEW.geom
+    FOR rec IN EXECUTE 'SELECT id, ST_LineLocatePoint($1, COALESCE(ST_StartPoint(geom), geom)) as pk_a, CASE WHEN ST_EQUALS(ST_EndPoint(geom), ST_StartPoint($1)) THEN 1 ELSE ST_LineLocatePoint($1, COALESCE(ST_EndPoint(geom), geom)) END as pk_b FROM (SELECT code AS id, (ST_Dump(ST_Multi(ST_Intersection(geom, $1)))).geom AS geom FROM zoning_city WHERE ST_Intersects(geom, $1)) AS sub WHERE ST_GeometryType(geom)=''ST_LineString''' USING pgeom
     LOOP
-        INSERT INTO core_topology (date_insert, date_update, kind, "offset", length, geom, deleted) VALUES (now(), now(), 'CITYEDGE', 0, 0, NEW.geom, FALSE) RETURNING id INTO eid;
-        INSERT INTO core_pathaggregation (path_id, topo_object_id, start_position, end_position) VALUES (NEW.id, eid, least(rec.pk_a, rec.pk_b), greatest(rec.pk_a, rec.pk_b));
+        INSERT INTO core_topology (date_insert, date_update, kind, "offset", length, geom, deleted) VALUES (now(), now(), 'CITYEDGE', 0, 0, pgeom, FALSE) RETURNING id INTO eid;
+        INSERT INTO core_pathaggregation (path_id, topo_object_id, start_position, end_position) VALUES (pid, eid, least(rec.pk_a, rec.pk_b), greatest(rec.pk_a, rec.pk_b));
         INSERT INTO zoning_cityedge (topo_object_id, city_id) VALUES (eid, rec.id);
     END LOOP;
 
     -- Secteur
-    FOR rec IN EXECUTE 'SELECT id, ST_LineLocatePoint($1,COALESCE(ST_StartPoint(geom), geom)) as pk_a, CASE WHEN ST_EQUALS(ST_EndPoint(geom), ST_StartPoint($1)) THEN 1 ELSE ST_LineLocatePoint($1, COALESCE(ST_EndPoint(geom), geom)) END as pk_b FROM (SELECT id, (ST_Dump(ST_Multi(ST_Intersection(geom, $1)))).geom AS geom FROM zoning_district WHERE ST_Intersects(geom, $1)) AS sub WHERE ST_GeometryType(geom)=''ST_LineString''' USING NEW.geom
+    FOR rec IN EXECUTE 'SELECT id, ST_LineLocatePoint($1,COALESCE(ST_StartPoint(geom), geom)) as pk_a, CASE WHEN ST_EQUALS(ST_EndPoint(geom), ST_StartPoint($1)) THEN 1 ELSE ST_LineLocatePoint($1, COALESCE(ST_EndPoint(geom), geom)) END as pk_b FROM (SELECT id, (ST_Dump(ST_Multi(ST_Intersection(geom, $1)))).geom AS geom FROM zoning_district WHERE ST_Intersects(geom, $1)) AS sub WHERE ST_GeometryType(geom)=''ST_LineString''' USING pgeom
     LOOP
-        INSERT INTO core_topology (date_insert, date_update, kind, "offset", length, geom, deleted) VALUES (now(), now(), 'DISTRICTEDGE', 0, 0, NEW.geom, FALSE) RETURNING id INTO eid;
-        INSERT INTO core_pathaggregation (path_id, topo_object_id, start_position, end_position) VALUES (NEW.id, eid, least(rec.pk_a, rec.pk_b), greatest(rec.pk_a, rec.pk_b));
+        INSERT INTO core_topology (date_insert, date_update, kind, "offset", length, geom, deleted) VALUES (now(), now(), 'DISTRICTEDGE', 0, 0, pgeom, FALSE) RETURNING id INTO eid;
+        INSERT INTO core_pathaggregation (path_id, topo_object_id, start_position, end_position) VALUES (pid, eid, least(rec.pk_a, rec.pk_b), greatest(rec.pk_a, rec.pk_b));
         INSERT INTO zoning_districtedge (topo_object_id, district_id) VALUES (eid, rec.id);
     END LOOP;
 
     -- Zonage
-    FOR rec IN EXECUTE 'SELECT id, ST_LineLocatePoint($1, COALESCE(ST_StartPoint(geom), geom)) as pk_a, CASE WHEN ST_EQUALS(ST_EndPoint(geom), ST_StartPoint($1)) THEN 1 ELSE ST_LineLocatePoint($1, COALESCE(ST_EndPoint(geom), geom)) END as pk_b FROM (SELECT id, (ST_Dump(ST_Multi(ST_Intersection(geom, $1)))).geom AS geom FROM zoning_restrictedarea WHERE ST_Intersects(geom, $1)) AS sub WHERE ST_GeometryType(geom)=''ST_LineString''' USING NEW.geom
+    FOR rec IN EXECUTE 'SELECT id, ST_LineLocatePoint($1, COALESCE(ST_StartPoint(geom), geom)) as pk_a, CASE WHEN ST_EQUALS(ST_EndPoint(geom), ST_StartPoint($1)) THEN 1 ELSE ST_LineLocatePoint($1, COALESCE(ST_EndPoint(geom), geom)) END as pk_b FROM (SELECT id, (ST_Dump(ST_Multi(ST_Intersection(geom, $1)))).geom AS geom FROM zoning_restrictedarea WHERE ST_Intersects(geom, $1)) AS sub WHERE ST_GeometryType(geom)=''ST_LineString''' USING pgeom
     LOOP
-        INSERT INTO core_topology (date_insert, date_update, kind, "offset", length, geom, deleted) VALUES (now(), now(), 'RESTRICTEDAREAEDGE', 0, 0, NEW.geom, FALSE) RETURNING id INTO eid;
-        INSERT INTO core_pathaggregation (path_id, topo_object_id, start_position, end_position) VALUES (NEW.id, eid, least(rec.pk_a, rec.pk_b), greatest(rec.pk_a, rec.pk_b));
+        INSERT INTO core_topology (date_insert, date_update, kind, "offset", length, geom, deleted) VALUES (now(), now(), 'RESTRICTEDAREAEDGE', 0, 0, pgeom, FALSE) RETURNING id INTO eid;
+        INSERT INTO core_pathaggregation (path_id, topo_object_id, start_position, end_position) VALUES (pid, eid, least(rec.pk_a, rec.pk_b), greatest(rec.pk_a, rec.pk_b));
         INSERT INTO zoning_restrictedareaedge (topo_object_id, restricted_area_id) VALUES (eid, rec.id);
     END LOOP;
+END;
+$$ LANGUAGE plpgsql;
 
+CREATE FUNCTION {# geotrek.zoning #}.auto_link_path_topologies_iu() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    PERFORM auto_link_path_topologies(NEW.id, NEW.geom, TG_OP = 'UPDATE');
     RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
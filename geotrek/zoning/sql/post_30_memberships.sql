@@ -0,0 +1,150 @@
+-------------------------------------------------------------------------------
+-- Zoning memberships of topologies, touristic contents and touristic events
+-------------------------------------------------------------------------------
+
+-- Position of the first intersection with zone along linear objects (see intersecting())
+CREATE FUNCTION {# geotrek.zoning #}.zoning_position(ogeom geometry, zgeom geometry) RETURNS float AS $$
+    SELECT CASE WHEN GeometryType(ogeom) = 'LINESTRING' THEN
+        (SELECT min(ST_LineLocatePoint(ogeom, ST_StartPoint(d.geom))) FROM ST_Dump(ST_Intersection(ogeom, zgeom)) AS d)
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE FUNCTION {# geotrek.zoning #}.update_zoning_memberships(fk_name varchar, oid integer, ogeom geometry) RETURNS void SECURITY DEFINER AS $$
+BEGIN
+    EXECUTE 'DELETE FROM zoning_zoningmembership WHERE '|| quote_ident(fk_name) ||' = $1' USING oid;
+    IF ogeom IS NULL THEN
+        RETURN;
+    END IF;
+    EXECUTE 'INSERT INTO zoning_zoningmembership ('|| quote_ident(fk_name) ||', city_id, position)
+             SELECT $1, code, zoning_position($2, geom) FROM zoning_city WHERE ST_Intersects(geom, $2)' USING oid, ogeom;
+    EXECUTE 'INSERT INTO zoning_zoningmembership ('|| quote_ident(fk_name) ||', district_id, position)
+             SELECT $1, id, zoning_position($2, geom) FROM zoning_district WHERE ST_Intersects(geom, $2)' USING oid, ogeom;
+    EXECUTE 'INSERT INTO zoning_zoningmembership ('|| quote_ident(fk_name) ||', restricted_area_id, position)
+             SELECT $1, id, zoning_position($2, geom) FROM zoning_restrictedarea WHERE ST_Intersects(geom, $2)' USING oid, ogeom;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-------------------------------------------------------------------------------
+-- Sync when objects are modified
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {# geotrek.zoning #}.zoning_memberships_iu() RETURNS trigger SECURITY DEFINER AS $$
+DECLARE
+    fk_name varchar := TG_ARGV[0];
+BEGIN
+    -- Zoning edges are not members of zones
+    IF TG_TABLE_NAME = 'core_topology' THEN
+        IF NEW.kind IN ('CITYEDGE', 'DISTRICTEDGE', 'RESTRICTEDAREAEDGE') THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    PERFORM update_zoning_memberships(fk_name, NEW.id, NEW.geom);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION {# geotrek.zoning #}.zoning_memberships_d() RETURNS trigger SECURITY DEFINER AS $$
+DECLARE
+    fk_name varchar := TG_ARGV[0];
+BEGIN
+    EXECUTE 'DELETE FROM zoning_zoningmembership WHERE '|| quote_ident(fk_name) ||' = $1' USING OLD.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_topology_zoning_memberships_iu_tgr
+AFTER INSERT OR UPDATE OF geom ON core_topology
+FOR EACH ROW EXECUTE PROCEDURE zoning_memberships_iu('topology_id');
+
+CREATE TRIGGER core_topology_zoning_memberships_d_tgr
+AFTER DELETE ON core_topology
+FOR EACH ROW EXECUTE PROCEDURE zoning_memberships_d('topology_id');
+
+CREATE TRIGGER tourism_touristiccontent_zoning_memberships_iu_tgr
+AFTER INSERT OR UPDATE OF geom ON tourism_touristiccontent
+FOR EACH ROW EXECUTE PROCEDURE zoning_memberships_iu('touristic_content_id');
+
+CREATE TRIGGER tourism_touristiccontent_zoning_memberships_d_tgr
+AFTER DELETE ON tourism_touristiccontent
+FOR EACH ROW EXECUTE PROCEDURE zoning_memberships_d('touristic_content_id');
+
+CREATE TRIGGER tourism_touristicevent_zoning_memberships_iu_tgr
+AFTER INSERT OR UPDATE OF geom ON tourism_touristicevent
+FOR EACH ROW EXECUTE PROCEDURE zoning_memberships_iu('touristic_event_id');
+
+CREATE TRIGGER tourism_touristicevent_zoning_memberships_d_tgr
+AFTER DELETE ON tourism_touristicevent
+FOR EACH ROW EXECUTE PROCEDURE zoning_memberships_d('touristic_event_id');
+
+
+-------------------------------------------------------------------------------
+-- Sync when City/District/Restrictedarea are modified
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {# geotrek.zoning #}.zone_memberships_iu() RETURNS trigger SECURITY DEFINER AS $$
+DECLARE
+    fk_name varchar := TG_ARGV[0];
+    obj record;
+BEGIN
+    -- Harmonize ID name
+    BEGIN
+        SELECT NEW.code AS id INTO obj;
+    EXCEPTION
+        WHEN undefined_column THEN
+            SELECT NEW.id AS id INTO obj;
+    END;
+
+    EXECUTE 'DELETE FROM zoning_zoningmembership WHERE '|| quote_ident(fk_name) ||' = $1' USING obj.id;
+    EXECUTE 'INSERT INTO zoning_zoningmembership (topology_id, '|| quote_ident(fk_name) ||', position)
+             SELECT id, $1, zoning_position(geom, $2) FROM core_topology
+             WHERE ST_Intersects(geom, $2) AND kind NOT IN (''CITYEDGE'', ''DISTRICTEDGE'', ''RESTRICTEDAREAEDGE'')' USING obj.id, NEW.geom;
+    EXECUTE 'INSERT INTO zoning_zoningmembership (touristic_content_id, '|| quote_ident(fk_name) ||', position)
+             SELECT id, $1, zoning_position(geom, $2) FROM tourism_touristiccontent WHERE ST_Intersects(geom, $2)' USING obj.id, NEW.geom;
+    EXECUTE 'INSERT INTO zoning_zoningmembership (touristic_event_id, '|| quote_ident(fk_name) ||', position)
+             SELECT id, $1, zoning_position(geom, $2) FROM tourism_touristicevent WHERE ST_Intersects(geom, $2)' USING obj.id, NEW.geom;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION {# geotrek.zoning #}.zone_memberships_d() RETURNS trigger SECURITY DEFINER AS $$
+DECLARE
+    fk_name varchar := TG_ARGV[0];
+    obj record;
+BEGIN
+    -- Harmonize ID name
+    BEGIN
+        SELECT OLD.code AS id INTO obj;
+    EXCEPTION
+        WHEN undefined_column THEN
+            SELECT OLD.id AS id INTO obj;
+    END;
+
+    EXECUTE 'DELETE FROM zoning_zoningmembership WHERE '|| quote_ident(fk_name) ||' = $1' USING obj.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER city_memberships_iu_tgr
+AFTER INSERT OR UPDATE OF geom ON zoning_city
+FOR EACH ROW EXECUTE PROCEDURE zone_memberships_iu('city_id');
+
+CREATE TRIGGER city_memberships_d_tgr
+AFTER DELETE ON zoning_city
+FOR EACH ROW EXECUTE PROCEDURE zone_memberships_d('city_id');
+
+CREATE TRIGGER district_memberships_iu_tgr
+AFTER INSERT OR UPDATE OF geom ON zoning_district
+FOR EACH ROW EXECUTE PROCEDURE zone_memberships_iu('district_id');
+
+CREATE TRIGGER district_memberships_d_tgr
+AFTER DELETE ON zoning_district
+FOR EACH ROW EXECUTE PROCEDURE zone_memberships_d('district_id');
+
+CREATE TRIGGER restrictedarea_memberships_iu_tgr
+AFTER INSERT OR UPDATE OF geom ON zoning_restrictedarea
+FOR EACH ROW EXECUTE PROCEDURE zone_memberships_iu('restricted_area_id');
+
+CREATE TRIGGER restrictedarea_memberships_d_tgr
+AFTER DELETE ON zoning_restrictedarea
+FOR EACH ROW EXECUTE PROCEDURE zone_memberships_d('restricted_area_id');
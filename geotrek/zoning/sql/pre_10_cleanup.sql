@@ -20,10 +20,20 @@ DROP FUNCTION IF EXISTS auto_clean_topologies_sig_d() CASCADE;
 
 DROP FUNCTION IF EXISTS lien_auto_troncon_couches_sig_iu() CASCADE;
 DROP FUNCTION IF EXISTS auto_link_path_topologies_iu() CASCADE;
+DROP FUNCTION IF EXISTS auto_link_path_topologies(integer, geometry, boolean) CASCADE;
 
 DROP FUNCTION IF EXISTS lien_auto_couches_sig_troncon_iu() CASCADE;
 DROP FUNCTION IF EXISTS auto_link_topologies_path_iu() CASCADE;
 
+-- 30
+
+DROP FUNCTION IF EXISTS zone_memberships_iu() CASCADE;
+DROP FUNCTION IF EXISTS zone_memberships_d() CASCADE;
+DROP FUNCTION IF EXISTS zoning_memberships_iu() CASCADE;
+DROP FUNCTION IF EXISTS zoning_memberships_d() CASCADE;
+DROP FUNCTION IF EXISTS update_zoning_memberships(varchar, integer, geometry) CASCADE;
+DROP FUNCTION IF EXISTS zoning_position(geometry, geometry) CASCADE;
+
 -- 20
 
 DROP VIEW IF EXISTS f_v_commune CASCADE;
@@ -3,11 +3,15 @@ from django.test import TestCase
 from django.conf import settings
 from django.contrib.gis.geos import LineString, Polygon, MultiPolygon
 
-from geotrek.core.models import Topology
-from geotrek.core.factories import PathFactory
+from mapentity.serializers.planning import ColumnsPlan, get_bulk_resolvers
+
+from geotrek.core.models import Path, Topology
+from geotrek.core.factories import PathFactory, TopologyFactory
 from geotrek.land.tests.test_views import EdgeHelperTest
 from geotrek.signage.factories import SignageFactory
-from geotrek.zoning.models import City
+from geotrek.tourism.factories import TouristicContentFactory
+from geotrek.tourism.models import TouristicContent
+from geotrek.zoning.models import City, ZoningMembership
 from geotrek.zoning.factories import (DistrictEdgeFactory, CityEdgeFactory, CityFactory, DistrictFactory,
                                       RestrictedAreaFactory, RestrictedAreaTypeFactory, RestrictedAreaEdgeFactory)
 
@@ -452,3 +456,87 @@ class ZoningModelsTest(TestCase):
         restricted_area_edge = RestrictedAreaEdgeFactory()
         self.assertEqual(str(restricted_area_edge), "Restricted area edge: {} - {}".format(restricted_area_edge.restricted_area.area_type,
                                                                                            restricted_area_edge.restricted_area.name))
+
+
+class BulkResolversTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.city1 = CityFactory.create(geom=MultiPolygon(Polygon.from_bbox((0, 0, 10, 10)), srid=settings.SRID))
+        cls.city2 = CityFactory.create(geom=MultiPolygon(Polygon.from_bbox((10, 0, 20, 10)), srid=settings.SRID))
+        DistrictFactory.create(geom=MultiPolygon(Polygon.from_bbox((0, 0, 20, 10)), srid=settings.SRID))
+        RestrictedAreaFactory.create(geom=MultiPolygon(Polygon.from_bbox((5, 0, 15, 10)), srid=settings.SRID))
+        # From city 2 to city 1
+        cls.path = PathFactory.create(geom=LineString((15, 5), (5, 5), srid=settings.SRID))
+        PathFactory.create(geom=LineString((1, 1), (2, 2), srid=settings.SRID))
+        PathFactory.create(geom=LineString((100, 100), (200, 200), srid=settings.SRID))
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            cls.topology = TopologyFactory.create(paths=[cls.path])
+        else:
+            cls.topology = TopologyFactory.create(geom='SRID=%s;LINESTRING(15 5, 5 5)' % settings.SRID)
+        TouristicContentFactory.create(geom='SRID=%s;POINT(12 5)' % settings.SRID)
+        TouristicContentFactory.create(geom='SRID=%s;POINT(100 100)' % settings.SRID)
+
+    def assertBulkResolved(self, model, names):
+        objects = list(model.objects.all())
+        resolvers = get_bulk_resolvers(model)
+        for name in names:
+            values = resolvers[name](objects)
+            for obj in objects:
+                self.assertEqual(values[obj.pk], list(getattr(obj, name)))
+
+    @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+    def test_paths(self):
+        self.assertBulkResolved(Path, ['cities', 'districts', 'areas'])
+        self.assertEqual(len(get_bulk_resolvers(Path)['cities']([self.path])[self.path.pk]), 2)
+
+    def test_topologies(self):
+        self.assertBulkResolved(Topology, ['cities'])
+        topology = Topology.objects.get(pk=self.topology.pk)
+        self.assertEqual(get_bulk_resolvers(Topology)['cities']([topology]), {topology.pk: [self.city2, self.city1]})
+
+    def test_touristic_contents(self):
+        self.assertBulkResolved(TouristicContent, ['cities', 'districts', 'areas'])
+
+    def test_columns_plan(self):
+        plan = ColumnsPlan(TouristicContent, ['id', 'cities', 'category'])
+        with self.assertNumQueries(2):
+            contents = list(plan.iter_objects(TouristicContent.objects.order_by('pk')))
+            self.assertEqual([content.cities for content in contents], [[self.city2], []])
+            self.assertTrue(all(content.category.label for content in contents))
+
+
+class ZoningMembershipTest(TestCase):
+    def test_zone_created_after_object(self):
+        content = TouristicContentFactory.create(geom='SRID=%s;POINT(5 5)' % settings.SRID)
+        self.assertEqual(ZoningMembership.zones(content, 'city'), [])
+        city = CityFactory.create(geom=MultiPolygon(Polygon.from_bbox((0, 0, 10, 10)), srid=settings.SRID))
+        self.assertEqual(ZoningMembership.zones(content, 'city'), [city])
+        city.geom = MultiPolygon(Polygon.from_bbox((20, 0, 30, 10)), srid=settings.SRID)
+        city.save()
+        self.assertEqual(ZoningMembership.zones(content, 'city'), [])
+
+    def test_object_moved_or_deleted(self):
+        district = DistrictFactory.create(geom=MultiPolygon(Polygon.from_bbox((0, 0, 10, 10)), srid=settings.SRID))
+        content = TouristicContentFactory.create(geom='SRID=%s;POINT(50 50)' % settings.SRID)
+        self.assertEqual(ZoningMembership.zones(content, 'district'), [])
+        content.geom = 'SRID=%s;POINT(5 5)' % settings.SRID
+        content.save()
+        self.assertEqual(ZoningMembership.zones(content, 'district'), [district])
+        content.delete()
+        self.assertFalse(district.memberships.exists())
+
+    def test_zones_ordered_along_object(self):
+        city_z = CityFactory.create(name="Z", geom=MultiPolygon(Polygon.from_bbox((0, 0, 10, 10)), srid=settings.SRID))
+        city_a = CityFactory.create(name="A", geom=MultiPolygon(Polygon.from_bbox((20, 0, 30, 10)), srid=settings.SRID))
+        content = TouristicContentFactory.create(geom='SRID=%s;LINESTRING(5 5, 25 5)' % settings.SRID)
+        self.assertEqual(ZoningMembership.zones(content, 'city'), [city_z, city_a])
+        self.assertEqual(ZoningMembership.bulk_zones([content], 'city'), {content.pk: [city_z, city_a]})
+        content = TouristicContent.objects.prefetch_related('zoning_memberships__city').get()
+        self.assertEqual(ZoningMembership.zones(content, 'city'), [city_z, city_a])
+
+    def test_prefetched_memberships(self):
+        city = CityFactory.create(geom=MultiPolygon(Polygon.from_bbox((0, 0, 10, 10)), srid=settings.SRID))
+        TouristicContentFactory.create(geom='SRID=%s;POINT(5 5)' % settings.SRID)
+        content = TouristicContent.objects.prefetch_related('zoning_memberships__city').get()
+        with self.assertNumQueries(0):
+            self.assertEqual(ZoningMembership.zones(content, 'city'), [city])
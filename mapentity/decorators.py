@@ -12,7 +12,7 @@ from django.views.generic.edit import BaseUpdateView
 from django.views.generic.detail import BaseDetailView
 
 from .settings import app_settings
-from .helpers import user_has_perm
+from .helpers import user_has_perm, layer_cache_entry, layer_cache_response
 from . import models as mapentity_models
 
 
@@ -88,38 +88,29 @@ def view_cache_response_content():
             response_class = self.response_class
             response_kwargs = dict()
 
-            # Do not cache if filters presents
-            params = self.request.GET.keys()
-            with_filters = all([not p.startswith('_') for p in params])
-            if len(params) > 0 and with_filters:
+            # Do not cache if filters presents (except cached variants of view)
+            # Parameters must match exactly one variant: the cache key only depends on declared values
+            params = {p: v for p, v in self.request.GET.items() if not p.startswith('_')}
+            variants = [{p: str(v) for p, v in variant.items()}
+                        for variant in getattr(self, 'cache_variants', [{}])]
+            if params not in variants:
                 return view_func(self, *args, **kwargs)
 
             # Restore from cache or store view result
             geojson_lookup = None
             if hasattr(self, 'view_cache_key'):
                 geojson_lookup = self.view_cache_key()
-            elif not self.request.GET:  # Do not cache filtered responses
-                view_model = self.get_model()
-                language = self.request.LANGUAGE_CODE
-                latest_saved = view_model.latest_updated()
-                if latest_saved:
-                    geojson_lookup = '%s_%s_%s_json_layer' % (
-                        language,
-                        view_model._meta.model_name,
-                        latest_saved.strftime('%y%m%d%H%M%S%f')
-                    )
+            if not geojson_lookup:
+                return view_func(self, *args, **kwargs)
 
             geojson_cache = caches[app_settings['GEOJSON_LAYERS_CACHE_BACKEND']]
 
-            if geojson_lookup:
-                content = geojson_cache.get(geojson_lookup)
-                if content:
-                    return response_class(content=content, **response_kwargs)
-
-            response = view_func(self, *args, **kwargs)
-            if geojson_lookup:
-                geojson_cache.set(geojson_lookup, response.content)
-            return response
+            entry = geojson_cache.get(geojson_lookup)
+            if not isinstance(entry, dict):  # Not in cache (or stored by previous versions)
+                response = view_func(self, *args, **kwargs)
+                entry = layer_cache_entry(response.content)
+                geojson_cache.set(geojson_lookup, entry)
+            return layer_cache_response(self.request, entry, response_class, **response_kwargs)
 
         return _wrapped_method
     return decorator
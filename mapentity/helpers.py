@@ -1,3 +1,5 @@
+import gzip
+import hashlib
 import itertools
 import json
 import logging
@@ -15,10 +17,11 @@ from django.conf import settings
 from django.contrib.gis.gdal.error import GDALException
 from django.contrib.gis.geos import GEOSException, fromstr
 from django.urls import resolve
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotModified
 from django.template.exceptions import TemplateDoesNotExist
 from django.template.loader import get_template
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
 from django.utils.translation import get_language
 
 from .settings import app_settings, API_SRID
@@ -334,3 +337,70 @@ def smart_get_template(model, suffix):
         except TemplateDoesNotExist:
             pass
     return None
+
+
+def layer_cache_entry(content):
+    """
+    Returns the cached form of a layer content: compressed once for all, along with its ETag.
+    """
+    return {
+        'etag': '"%s"' % hashlib.md5(content).hexdigest(),
+        'gzip': gzip.compress(content),
+    }
+
+
+def layer_cache_response(request, entry, response_class=HttpResponse, **response_kwargs):
+    """
+    Serve a layer from its cached form (see ``layer_cache_entry``).
+    """
+    if request.META.get('HTTP_IF_NONE_MATCH') == entry['etag']:
+        response = HttpResponseNotModified()
+    elif 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = response_class(content=entry['gzip'], **response_kwargs)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = response_class(content=gzip.decompress(entry['gzip']), **response_kwargs)
+    response['ETag'] = entry['etag']
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def precompute_layers(models=None, languages=None, force=False):
+    """
+    Render and cache the GeoJSON layers of registered models, for each language
+    and each variant declared by layer views (``cache_variants``).
+    Layers already in cache are skipped, unless ``force`` is True.
+
+    Returns the number of rendered layers.
+    """
+    from django.core.cache import caches
+    from django.test.client import RequestFactory
+    from django.utils import translation
+
+    from .middleware import get_internal_user
+    from .registry import registry
+
+    if languages is None:
+        languages = [code for code, name in app_settings['TRANSLATED_LANGUAGES']]
+    geojson_cache = caches[app_settings['GEOJSON_LAYERS_CACHE_BACKEND']]
+    factory = RequestFactory()
+    count = 0
+
+    for model, options in registry.registry.items():
+        layer_view = options.layer_view
+        if layer_view is None or (models is not None and model not in models):
+            continue
+        for language in languages:
+            for params in layer_view.cache_variants:
+                with translation.override(language):
+                    request = factory.get('/', params)
+                    request.LANGUAGE_CODE = language
+                    request.user = get_internal_user()
+                    view = layer_view()
+                    view.setup(request)
+                    geojson_lookup = view.view_cache_key()
+                    if not geojson_lookup or (not force and geojson_cache.get(geojson_lookup)):
+                        continue
+                    geojson_cache.set(geojson_lookup, layer_cache_entry(view.render_layer()))
+                    count += 1
+    return count
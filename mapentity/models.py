@@ -24,6 +24,7 @@ from .helpers import smart_urljoin, is_file_uptodate, capture_map_image, extract
 
 # Used to create the matching url name
 ENTITY_LAYER = "layer"
+ENTITY_TILE = "tile"
 ENTITY_LIST = "list"
 ENTITY_JSON_LIST = "json_list"
 ENTITY_FORMAT_LIST = "format_list"
@@ -37,7 +38,7 @@ ENTITY_DELETE = "delete"
 ENTITY_UPDATE_GEOM = "update_geom"
 
 ENTITY_KINDS = (
-    ENTITY_LAYER, ENTITY_LIST, ENTITY_JSON_LIST,
+    ENTITY_LAYER, ENTITY_TILE, ENTITY_LIST, ENTITY_JSON_LIST,
     ENTITY_FORMAT_LIST, ENTITY_DETAIL, ENTITY_MAPIMAGE, ENTITY_DOCUMENT, ENTITY_MARKUP, ENTITY_CREATE,
     ENTITY_UPDATE, ENTITY_DELETE, ENTITY_UPDATE_GEOM
 )
@@ -97,6 +98,7 @@ class MapEntityMixin(models.Model):
             ENTITY_DELETE: ENTITY_PERMISSION_DELETE,
             ENTITY_DETAIL: ENTITY_PERMISSION_READ,
             ENTITY_LAYER: ENTITY_PERMISSION_READ,
+            ENTITY_TILE: ENTITY_PERMISSION_READ,
             ENTITY_LIST: ENTITY_PERMISSION_READ,
             ENTITY_JSON_LIST: ENTITY_PERMISSION_READ,
             ENTITY_MARKUP: ENTITY_PERMISSION_READ,
@@ -150,6 +152,10 @@ class MapEntityMixin(models.Model):
     def get_layer_url(cls):
         return reverse(cls._entity.url_name(ENTITY_LAYER))
 
+    @classmethod
+    def get_tile_url(cls, z, x, y):
+        return reverse(cls._entity.url_name(ENTITY_TILE), kwargs={'z': z, 'x': x, 'y': y})
+
     @classmethod
     def get_list_url(cls):
         return reverse(cls._entity.url_name(ENTITY_LIST))
@@ -37,6 +37,7 @@ class MapEntityOptions(object):
     icon_small = ''
     icon_big = ''
     dynamic_views = None
+    layer_view = None
 
     def __init__(self, model):
         self.model = model
@@ -99,10 +100,16 @@ class MapEntityOptions(object):
             if not already_defined:
                 list_dependencies = (mapentity_views.MapEntityJsonList,
                                      mapentity_views.MapEntityFormat)
+                layer_view = next((view for view in picked
+                                   if view.get_entity_kind() == mapentity_models.ENTITY_LAYER), None)
                 if list_view and generic_view in list_dependencies:
                     # List view depends on JsonList and Format view
                     class dynamic_view(generic_view, list_view):
                         pass
+                elif layer_view and generic_view is mapentity_views.MapEntityTile:
+                    # Tiles have the queryset and properties of layer view
+                    class dynamic_view(generic_view, layer_view):
+                        pass
                 else:
                     # General case
                     class dynamic_view(generic_view):
@@ -123,6 +130,10 @@ class MapEntityOptions(object):
 
         self.rest_router.register(self.modelname + 's', rest_viewset, basename=self.modelname)
 
+        # Keep layer view for precomputation of layers
+        self.layer_view = next((view for view in picked
+                                if view.get_entity_kind() == mapentity_models.ENTITY_LAYER), None)
+
         # Returns Django URL patterns
         return self.__view_classes_to_url(*picked)
 
@@ -157,6 +168,7 @@ class MapEntityOptions(object):
     def _url_path(self, view_kind):
         kind_to_urlpath = {
             mapentity_models.ENTITY_LAYER: r'^api/{modelname}/{modelname}.geojson$',
+            mapentity_models.ENTITY_TILE: r'^api/{modelname}/tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+).pbf$',
             mapentity_models.ENTITY_LIST: r'^{modelname}/list/$',
             mapentity_models.ENTITY_JSON_LIST: r'^api/{modelname}/{modelname}s.json$',
             mapentity_models.ENTITY_FORMAT_LIST: r'^{modelname}/list/export/$',
@@ -3,6 +3,7 @@ from .commasv import CSVSerializer
 from .gpx import GPXSerializer
 from .datatables import DatatablesSerializer
 from .shapefile import ZipShapeSerializer
+from .planning import ColumnsPlan
 
 
 __all__ = ['plain_text',
@@ -11,4 +12,5 @@ __all__ = ['plain_text',
            'GPXSerializer',
            'DatatablesSerializer',
            'ZipShapeSerializer',
+           'ColumnsPlan',
            'json_django_dumps']
@@ -7,7 +7,8 @@ from django.utils.translation import gettext as _
 from django.db.models.fields.related import ForeignKey, ManyToManyField
 from django.core.exceptions import FieldDoesNotExist
 
-from .helpers import smart_plain_text, field_as_string
+from .helpers import smart_plain_text, field_as_string, StreamBuffer
+from .planning import ColumnsPlan
 
 
 class CSVSerializer(Serializer):
@@ -48,9 +49,16 @@ class CSVSerializer(Serializer):
         Uses self.columns, containing fieldnames to produce the CSV.
         The header of the csv is made of the verbose name of each field.
         """
+        stream = options.pop('stream')
+        for chunk in self.iter_serialize(queryset, **options):
+            stream.write(chunk)
+
+    def iter_serialize(self, queryset, **options):
+        """
+        Same as ``serialize``, but yields the CSV content row by row.
+        """
         model = options.pop('model', None) or queryset.model
         columns = options.pop('fields')
-        stream = options.pop('stream')
         ascii = options.get('ensure_ascii', True)
 
         headers = self.get_csv_header(columns, model)
@@ -59,7 +67,10 @@ class CSVSerializer(Serializer):
 
         def get_lines():
             yield headers
-            for obj in queryset:
+            for obj in ColumnsPlan(model, columns).iter_objects(queryset):
                 yield [getters[field](obj, field) for field in columns]
-        writer = csv.writer(stream)
-        writer.writerows(get_lines())
+        buffr = StreamBuffer()
+        writer = csv.writer(buffr)
+        for line in get_lines():
+            writer.writerow(line)
+            yield from buffr.pop()
@@ -4,6 +4,8 @@ from django.core.serializers.base import Serializer
 from django.utils.translation import gettext_lazy as _
 from django.db.models.fields.related import ForeignKey, ManyToManyField
 
+from .planning import ColumnsPlan
+
 
 class DatatablesSerializer(Serializer):
     def serialize(self, queryset, **options):
@@ -30,7 +32,7 @@ class DatatablesSerializer(Serializer):
         # Build list with fields
         map_obj_pk = []
         data_table_rows = []
-        for obj in queryset:
+        for obj in ColumnsPlan(model, columns).iter_objects(queryset):
             row = [getters[field](obj, field) for field in columns]
             data_table_rows.append(row)
             map_obj_pk.append(obj.pk)
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
+from functools import partial
+import tempfile
+
 from django.conf import settings
 from django.core.serializers.base import Serializer
 from django.utils.translation import gettext_lazy as _
+from django.contrib.gis.gdal import CoordTransform, SpatialReference
 from django.contrib.gis.geos.collections import GeometryCollection
 from django.contrib.gis.geos import Point, LineString, Polygon
 
@@ -9,6 +13,10 @@ import gpxpy.gpx
 
 from ..templatetags.mapentity_tags import humanize_timesince
 from ..settings import app_settings
+from .helpers import iter_queryset
+
+# Size of GPX tracks kept in memory before being written on disk
+GPX_SPOOL_SIZE = 1024 * 1024
 
 
 class GPXSerializer(Serializer):
@@ -24,16 +32,45 @@ class GPXSerializer(Serializer):
     """
     def __init__(self, *args, **kwargs):
         self.gpx = None
+        # GPX uses WGS84
+        self.transformation = CoordTransform(SpatialReference(settings.SRID), SpatialReference(4326))
 
     def serialize(self, queryset, **options):
-        self.gpx = gpxpy.gpx.GPX()
+        stream = options.pop('stream')
+        for chunk in self.iter_serialize(queryset, **options):
+            stream.write(chunk)
+
+    def iter_serialize(self, queryset, **options):
+        """
+        Same as ``serialize``, but yields the GPX content object by object.
+        Since GPX requires waypoints before tracks, tracks are written
+        in a temporary file until all waypoints are yielded.
+        """
         self.options = options
+        header = gpxpy.gpx.GPX().to_xml()
+        header = header[:header.rindex('</gpx>')]
+        yield header
 
-        for obj in queryset:
-            self.end_object(obj)
+        with tempfile.SpooledTemporaryFile(max_size=GPX_SPOOL_SIZE, mode='w+') as tracks:
+            for obj in iter_queryset(queryset):
+                self.gpx = gpxpy.gpx.GPX()
+                self.end_object(obj)
+                if self.gpx.waypoints:
+                    yield self._xml_fragment(header, waypoints=self.gpx.waypoints)
+                if self.gpx.tracks:
+                    tracks.write(self._xml_fragment(header, tracks=self.gpx.tracks))
+            tracks.seek(0)
+            yield from iter(partial(tracks.read, GPX_SPOOL_SIZE), '')
+        yield '</gpx>'
 
-        stream = options.pop('stream')
-        stream.write(self.gpx.to_xml())
+    def _xml_fragment(self, header, **elements):
+        """ XML of GPX elements, without GPX document header and footer.
+        """
+        gpx = gpxpy.gpx.GPX()
+        for name, items in elements.items():
+            setattr(gpx, name, items)
+        xml = gpx.to_xml()
+        return xml[len(header):xml.rindex('</gpx>')]
 
     def end_object(self, obj):
         """ Single object serialization.
@@ -44,7 +81,7 @@ class GPXSerializer(Serializer):
         objupdate = obj.get_date_update()
         if objupdate:
             description += _('Modified') + ': ' + humanize_timesince(objupdate)
-        geom_field = self.options.pop('gpx_field', app_settings['GPX_FIELD_NAME'])
+        geom_field = self.options.get('gpx_field', app_settings['GPX_FIELD_NAME'])
         geom = getattr(obj, geom_field, None)
         if not geom:
             geom = getattr(obj, app_settings['GEOM_FIELD_NAME'], None)
@@ -52,14 +89,12 @@ class GPXSerializer(Serializer):
             assert geom.srid == settings.SRID, "Invalid SRID (!= %s)" % settings.SRID
             self.geomToGPX(geom, name, description)
 
-    def _point_to_GPX(self, point, klass=gpxpy.gpx.GPXWaypoint):
-        if isinstance(point, (tuple, list)):
-            point = Point(*point, srid=settings.SRID)
-        newpoint = point.transform(4326, clone=True)  # transformation: gps uses 4326
-        # transform looses the Z parameter
-        return klass(latitude=newpoint.y, longitude=newpoint.x, elevation=point.z)
+    def _points_to_GPX(self, coords, wgs84_coords, klass=gpxpy.gpx.GPXWaypoint):
+        # Elevation is taken from original coordinates, in case transformation looses it
+        return [klass(latitude=lat, longitude=lng, elevation=coord[2] if len(coord) > 2 else None)
+                for coord, (lng, lat, *_) in zip(coords, wgs84_coords)]
 
-    def geomToGPX(self, geom, name, description):
+    def geomToGPX(self, geom, name, description, wgs84_geom=None):
         """Convert a geometry to a gpx entity.
         Raise ValueError if it is not a Point, LineString or a collection of those
 
@@ -67,22 +102,26 @@ class GPXSerializer(Serializer):
         LineString -> add all Points in a Route
         Polygon -> add all Points of the external linering in a Route
         Collection (of LineString or Point) -> add as a route, concatening all points
+
+        The whole geometry is transformed to WGS84 at once, instead of point by point.
         """
+        if wgs84_geom is None:
+            wgs84_geom = geom.transform(self.transformation, clone=True)
         if isinstance(geom, GeometryCollection):
-            for i, g in enumerate(geom):
-                self.geomToGPX(g, "%s (%s)" % (name, i), description)
+            for i, (g, wgs84_g) in enumerate(zip(geom, wgs84_geom)):
+                self.geomToGPX(g, "%s (%s)" % (name, i), description, wgs84_g)
         elif isinstance(geom, Point):
-            wp = self._point_to_GPX(geom)
+            wp, = self._points_to_GPX([geom.coords], [wgs84_geom.coords])
             wp.name = name
             wp.description = description
             self.gpx.waypoints.append(wp)
         elif isinstance(geom, LineString):
             gpx_track = gpxpy.gpx.GPXTrack(name=name, description=description)
             gpx_segment = gpxpy.gpx.GPXTrackSegment()
-            gpx_segment.points = [self._point_to_GPX(point, klass=gpxpy.gpx.GPXTrackPoint) for point in geom]
+            gpx_segment.points = self._points_to_GPX(geom.coords, wgs84_geom.coords, klass=gpxpy.gpx.GPXTrackPoint)
             gpx_track.segments.append(gpx_segment)
             self.gpx.tracks.append(gpx_track)
         elif isinstance(geom, Polygon):
-            self.geomToGPX(geom[0], name, description)
+            self.geomToGPX(geom[0], name, description, wgs84_geom[0])
         else:
             raise ValueError("Unsupported geometry %s" % geom)
@@ -1,5 +1,6 @@
 from functools import partial
 import html
+from itertools import islice
 import json
 
 from django.core.serializers import serialize
@@ -66,3 +67,55 @@ class DjangoJSONEncoder(DjangoJSONEncoder):
 # partial function, we can now use dumps(my_dict) instead
 # of dumps(my_dict, cls=DjangoJSONEncoder)
 json_django_dumps = partial(json.dumps, cls=DjangoJSONEncoder)
+
+
+class StreamBuffer(object):
+    """
+    File-like object keeping written data until it is popped, used to
+    stream the output of writers (csv, zipfile...) chunk by chunk.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data) if isinstance(data, memoryview) else data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+def iter_chunks(queryset, chunk_size=2000):
+    """
+    Iterate on lists of objects fetched by chunks, so that memory usage does not depend on rows count.
+    Relations prefetched by the queryset (ignored by ``QuerySet.iterator()``) are fetched
+    chunk by chunk too.
+    """
+    if isinstance(queryset, QuerySet) and queryset._prefetch_related_lookups and not queryset.query.is_sliced:
+        pks = list(queryset.values_list('pk', flat=True))
+        for i in range(0, len(pks), chunk_size):
+            chunk = pks[i:i + chunk_size]
+            objects = {obj.pk: obj for obj in queryset.filter(pk__in=chunk)}
+            # Skip objects deleted meanwhile
+            yield [objects[pk] for pk in chunk if pk in objects]
+        return
+    if isinstance(queryset, QuerySet) and not queryset.query.is_sliced:
+        iterator = queryset.iterator(chunk_size=chunk_size)
+    else:
+        iterator = iter(queryset)
+    chunk = list(islice(iterator, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, chunk_size))
+
+
+def iter_queryset(queryset, chunk_size=2000):
+    """
+    Iterate on objects fetched by chunks (see ``iter_chunks``).
+    """
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield from chunk
@@ -0,0 +1,85 @@
+from inspect import getattr_static
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.query import QuerySet
+
+from .helpers import iter_chunks
+
+
+def get_bulk_resolvers(model):
+    """
+    Returns the bulk resolvers declared by the model and its parents in their
+    ``bulk_resolvers`` attribute, by column name.
+
+    A resolver declared by a class is ignored when the column attribute is
+    overridden by a subclass.
+    """
+    resolvers = {}
+    for klass in reversed(model.__mro__):
+        for name, resolver in klass.__dict__.get('bulk_resolvers', {}).items():
+            if getattr_static(model, name, None) is klass.__dict__.get(name):
+                resolvers[name] = resolver
+    return resolvers
+
+
+class ColumnsPlan(object):
+    """
+    Fetch the columns values of a list of objects in bulk, instead of once per object:
+
+    * foreign keys are fetched along with objects (``select_related``);
+    * many to many, reverse and generic relations are prefetched (``prefetch_related``);
+    * computed columns with a bulk resolver (see ``get_bulk_resolvers``) are resolved
+      once per chunk of objects. A resolver takes a list of objects and returns values
+      by object pk, which are stored in the ``_<column>`` attribute of objects.
+    """
+    def __init__(self, model, columns):
+        self.model = model
+        self.columns = columns
+        self.select_related = []
+        self.prefetch_related = []
+        self.resolvers = {}
+
+        bulk_resolvers = get_bulk_resolvers(model)
+        for column in columns:
+            if column in bulk_resolvers:
+                self.resolvers[column] = bulk_resolvers[column]
+                continue
+            try:
+                field = model._meta.get_field(column)
+            except FieldDoesNotExist:
+                continue
+            if not field.is_relation:
+                continue
+            if field.concrete and (field.many_to_one or field.one_to_one):
+                self.select_related.append(column)
+            else:
+                self.prefetch_related.append(column)
+
+    def prepare(self, queryset):
+        """
+        Returns the queryset fetching relations of columns.
+        """
+        if not isinstance(queryset, QuerySet):
+            return queryset
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+    def resolve(self, objects):
+        """
+        Run bulk resolvers on a list of objects.
+        """
+        for column, resolver in self.resolvers.items():
+            values = resolver(objects)
+            for obj in objects:
+                setattr(obj, '_%s' % column, values[obj.pk])
+
+    def iter_objects(self, queryset, chunk_size=2000):
+        """
+        Iterate on objects of the queryset, with columns values fetched chunk by chunk.
+        """
+        for chunk in iter_chunks(self.prepare(queryset), chunk_size):
+            self.resolve(chunk)
+            yield from chunk
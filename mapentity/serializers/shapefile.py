@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
+import copy
 import fiona
 from fiona.crs import from_epsg
-from io import BytesIO
+from functools import partial
+import itertools
 import json
 import os
 import shutil
@@ -9,7 +11,9 @@ import uuid
 import unicodedata
 import zipfile
 
+from django.db.models import CharField, Func
 from django.db.models.fields.related import ForeignKey, ManyToManyField
+from django.db.models.query import QuerySet
 from django.contrib.gis.db.models.fields import (GeometryField, GeometryCollectionField,
                                                  PointField, LineStringField, PolygonField,
                                                  MultiPointField, MultiLineStringField, MultiPolygonField)
@@ -21,31 +25,61 @@ from django.utils.encoding import smart_str
 from django.utils.translation import gettext as _
 
 from ..settings import app_settings
-from .helpers import smart_plain_text, field_as_string
+from .helpers import smart_plain_text, field_as_string, StreamBuffer
+from .planning import ColumnsPlan
 
 os.environ["SHAPE_ENCODING"] = "UTF-8"
 
+# Size of blocks read from shapefiles while zipping
+ZIP_BLOCK_SIZE = 64 * 1024
+
+# Layers of generic geometries, in the order of ``split_bygeom`` results
+SPLIT_GEOM_FIELDS = (PointField, LineStringField, PolygonField,
+                     MultiPointField, MultiLineStringField, MultiPolygonField)
+
+
+class GeometryType(Func):
+    function = 'GeometryType'
+    output_field = CharField()
+
 
 class ZipShapeSerializer(Serializer):
     def __init__(self, *args, **kwargs):
         super(ZipShapeSerializer, self).__init__(*args, **kwargs)
         self.path_directory = os.path.join(app_settings['TEMP_DIR'], str(uuid.uuid4()))
-        os.mkdir(self.path_directory)
 
     def serialize(self, queryset, **options):
-        columns = options.pop('fields')
         stream = options.pop('stream')
+        for chunk in self.iter_serialize(queryset, **options):
+            stream.write(chunk)
+
+    def iter_serialize(self, queryset, **options):
+        """
+        Same as ``serialize``, but yields the zip content while it is compressed.
+        """
+        columns = options.pop('fields')
         model = options.pop('model', None) or queryset.model
         delete = options.pop('delete', True)
-        filename = options.pop('filename', 'shp_download')
-        # Zip all shapefiles created temporarily
-        self._create_shape(self.path_directory, queryset, model, columns)
-        self.zip_shapefiles(self.path_directory, stream, filename)
-        if delete:
-            shutil.rmtree(self.path_directory)
+        options.pop('filename', 'shp_download')
+        try:
+            # Zip all shapefiles created temporarily
+            os.mkdir(self.path_directory)
+            self._create_shape(self.path_directory, queryset, model, columns)
+            yield from self.iter_zip_shapefiles(self.path_directory)
+        finally:
+            if delete:
+                shutil.rmtree(self.path_directory, ignore_errors=True)
 
     def zip_shapefiles(self, shape_directory, stream, filename):
-        buffr = BytesIO()
+        for chunk in self.iter_zip_shapefiles(shape_directory):
+            stream.write(chunk)
+
+    def iter_zip_shapefiles(self, shape_directory):
+        """
+        Yields the zip of shapefiles, file block by file block. The zip is written
+        without seeking (entries sizes are in data descriptors), so it is never kept in memory.
+        """
+        buffr = StreamBuffer()
         zipf = zipfile.ZipFile(buffr, "w", compression=zipfile.ZIP_DEFLATED)
         path = os.path.normpath(shape_directory)
         if path != os.curdir and path != shape_directory:
@@ -54,40 +88,70 @@ class ZipShapeSerializer(Serializer):
             for name in sorted(dirnames):
                 path = os.path.normpath(os.path.join(dirpath, name))
                 zipf.write(path, os.path.relpath(path, shape_directory))
+                yield from buffr.pop()
             for name in filenames:
                 path = os.path.normpath(os.path.join(dirpath, name))
                 if os.path.isfile(path):
-                    zipf.write(path, os.path.relpath(path, shape_directory))
+                    zinfo = zipfile.ZipInfo.from_file(path, os.path.relpath(path, shape_directory))
+                    zinfo.compress_type = zipfile.ZIP_DEFLATED
+                    with open(path, 'rb') as src, zipf.open(zinfo, 'w') as dest:
+                        for block in iter(partial(src.read, ZIP_BLOCK_SIZE), b''):
+                            dest.write(block)
+                            yield from buffr.pop()
+                    yield from buffr.pop()
 
-        zipf.close()
-        buffr.flush()  # zip.close() writes stuff.
-        stream.write(buffr.getvalue())
-        buffr.close()
+        zipf.close()  # zip.close() writes stuff.
+        yield from buffr.pop()
 
     def _create_shape(self, shape_directory, queryset, model, columns):
         """Split a shapes into one or more shapes (one for point and one for linestring)
         """
         geo_field = geo_field_from_model(model, app_settings['GEOM_FIELD_NAME'])
         get_geom, geom_type, srid = info_from_geo_field(geo_field)
+        plan = ColumnsPlan(model, columns)
         if geom_type.upper() in (GeometryField.geom_type, GeometryCollectionField.geom_type):
+            if has_geometry_column(model, geo_field, queryset):
+                split = self.stream_bygeom(queryset, plan, geo_field.name)
+            else:
+                # Geometry computed by the model: objects are split in memory
+                split = self.split_bygeom(plan.iter_objects(queryset), geom_getter=get_geom)
 
-            by_points, by_linestrings, by_polygons, multipoints, multilinestrings, multipolygons = \
-                self.split_bygeom(queryset, geom_getter=get_geom)
-
-            for split_qs, split_geom_field in ((by_points, PointField),
-                                               (by_linestrings, LineStringField),
-                                               (by_polygons, PolygonField),
-                                               (multipoints, MultiPointField),
-                                               (multilinestrings, MultiLineStringField),
-                                               (multipolygons, MultiPolygonField)):
-                if len(split_qs) == 0:
+            for split_objects, split_geom_field in zip(split, SPLIT_GEOM_FIELDS):
+                split_objects = iter(split_objects)
+                first = next(split_objects, None)
+                if first is None:
                     continue
                 split_geom_type = split_geom_field.geom_class().geom_type
-                shape_write(shape_directory, split_qs, model, columns, get_geom, split_geom_type, srid)
+                shape_write(shape_directory, itertools.chain([first], split_objects), model, columns, get_geom,
+                            split_geom_type, srid)
 
         else:
             geom_type = geo_field.geom_class().geom_type
-            shape_write(shape_directory, queryset, model, columns, get_geom, geom_type, srid)
+            shape_write(shape_directory, plan.iter_objects(queryset), model, columns, get_geom, geom_type, srid)
+
+    def stream_bygeom(self, queryset, plan, geo_field_name):
+        """Same as ``split_bygeom``, but objects of each geometry type are read with their own
+        query, filtered on the geometry type, so that they are streamed instead of collected in lists
+        """
+        queryset = queryset.annotate(shape_geom_type=GeometryType(geo_field_name))
+
+        def by_type(geom_type):
+            return plan.iter_objects(queryset.filter(shape_geom_type=geom_type))
+
+        def collections_parts(geom_class, multi_class):
+            # Duplicate object, shapefile do not support geometry collections !
+            for obj in by_type('GEOMETRYCOLLECTION'):
+                geom = getattr(obj, geo_field_name)
+                parts = [part for part in geom if isinstance(part, geom_class)]
+                if parts:
+                    clone = copy.copy(obj)
+                    setattr(clone, geo_field_name, multi_class(parts, srid=geom.srid))
+                    yield clone
+
+        return (by_type('POINT'), by_type('LINESTRING'), by_type('POLYGON'),
+                itertools.chain(by_type('MULTIPOINT'), collections_parts(Point, MultiPoint)),
+                itertools.chain(by_type('MULTILINESTRING'), collections_parts(LineString, MultiLineString)),
+                itertools.chain(by_type('MULTIPOLYGON'), collections_parts(Polygon, MultiPolygon)))
 
     def split_bygeom(self, iterable, geom_getter=lambda x: x.geom):
         """Split an iterable in two list (points, linestring)"""
@@ -101,15 +165,15 @@ class ZipShapeSerializer(Serializer):
                 # Duplicate object, shapefile do not support geometry collections !
                 subpoints, sublines, subpolygons, pp, ll, yy = self.split_bygeom(geom, geom_getter=lambda geom: geom)
                 if subpoints:
-                    clone = x.__class__.objects.get(pk=x.pk)
+                    clone = copy.copy(x)
                     clone.geom = MultiPoint(subpoints, srid=geom.srid)
                     multipoints.append(clone)
                 if sublines:
-                    clone = x.__class__.objects.get(pk=x.pk)
+                    clone = copy.copy(x)
                     clone.geom = MultiLineString(sublines, srid=geom.srid)
                     multilinestrings.append(clone)
                 if subpolygons:
-                    clone = x.__class__.objects.get(pk=x.pk)
+                    clone = copy.copy(x)
                     clone.geom = MultiPolygon(subpolygons, srid=geom.srid)
                     multipolygons.append(clone)
             elif isinstance(geom, Point):
@@ -239,6 +303,16 @@ the 'geo_field' keyword. Available fields are: '%s'" % geo_fields_names())
     return geo_field
 
 
+def has_geometry_column(model, geo_field, queryset):
+    """Whether the geometry can be filtered in database (and not computed by the model)"""
+    if not isinstance(queryset, QuerySet):
+        return False
+    try:
+        return model._meta.get_field(geo_field.name) is geo_field
+    except FieldDoesNotExist:
+        return False
+
+
 def info_from_geo_field(geo_field):
     """Extract relevant info from geofield"""
 
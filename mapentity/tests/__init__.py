@@ -154,6 +154,7 @@ class MapEntityTest(TestCase):
         for fmt in ('csv', 'shp', 'gpx'):
             response = self.client.get(self.model.get_format_list_url() + '?format=' + fmt)
             self.assertEqual(response.status_code, 200, u"")
+            self.assertTrue(b''.join(response.streaming_content))
 
     def test_gpx_elevation(self):
         if self.model is None:
@@ -161,7 +162,7 @@ class MapEntityTest(TestCase):
         self.login()
         obj = self.modelfactory.create()
         response = self.client.get(self.model.get_format_list_url() + '?format=gpx')
-        parsed = BeautifulSoup(response.content, 'lxml')
+        parsed = BeautifulSoup(b''.join(response.streaming_content), 'lxml')
         if hasattr(obj, 'geom_3d'):
             self.assertGreater(len(parsed.findAll('ele')), 0)
         else:
@@ -190,7 +191,7 @@ class MapEntityTest(TestCase):
         self.assertEqual(response.get('Content-Type'), 'text/csv')
 
         # Read the csv
-        lines = list(csv.reader(StringIO(response.content.decode("utf-8")), delimiter=','))
+        lines = list(csv.reader(StringIO(b''.join(response.streaming_content).decode("utf-8")), delimiter=','))
 
         # There should be one more line in the csv than in the items: this is the header line
         self.assertEqual(len(lines), self.model.objects.all().count() + 1)
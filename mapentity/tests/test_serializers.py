@@ -1,16 +1,21 @@
 from tempfile import TemporaryDirectory
-from io import StringIO
+from io import BytesIO, StringIO
 import os
+import zipfile
+
+import gpxpy.gpx
 
 from django.test import TestCase
 from django.conf import settings
 from django.contrib.gis import gdal
 from django.contrib.gis.gdal import DataSource
+from django.contrib.gis.geos import LineString, MultiPoint, Point
 from django.http import HttpResponse
 from django.test.utils import override_settings
 from django.utils import translation
 
-from mapentity.serializers import ZipShapeSerializer, CSVSerializer
+from mapentity.serializers import ZipShapeSerializer, CSVSerializer, GPXSerializer
+from mapentity.serializers.helpers import iter_queryset
 from mapentity.serializers.shapefile import shape_write, info_from_geo_field, geo_field_from_model
 from mapentity.settings import app_settings
 
@@ -100,6 +105,26 @@ class ShapefileSerializer(TestCase):
         feature = layer_point[0]
         self.assertEqual(feature['name'].value, self.point1.name)
 
+    def test_streamed_zip(self):
+        serializer = ZipShapeSerializer()
+        chunks = list(serializer.iter_serialize(Dive.objects.all(), fields=['id', 'name']))
+        self.assertGreater(len(chunks), 1)
+        with zipfile.ZipFile(BytesIO(b''.join(chunks))) as zipf:
+            self.assertIsNone(zipf.testzip())
+            names = zipf.namelist()
+        self.assertIn('Point.shp', names)
+        self.assertIn('MultiPolygon.dbf', names)
+        self.assertFalse(os.path.exists(serializer.path_directory))
+
+    def test_temporary_directory_created_while_serializing(self):
+        serializer = ZipShapeSerializer()
+        self.assertFalse(os.path.exists(serializer.path_directory))
+        chunks = serializer.iter_serialize(Dive.objects.all(), fields=['id', 'name'])
+        next(chunks)
+        self.assertTrue(os.path.exists(serializer.path_directory))
+        chunks.close()
+        self.assertFalse(os.path.exists(serializer.path_directory))
+
     def test_serializer_model_no_geofield(self):
         self.serializer = ZipShapeSerializer()
         response = HttpResponse()
@@ -172,3 +197,41 @@ class CSVSerializerTests(TestCase):
                          ('ID,Nom\r\n{},'
                           'Test\r\n').format(self.point.pk))
         translation.deactivate()
+
+    def test_streamed_content(self):
+        chunks = list(self.serializer.iter_serialize(Dive.objects.all(), fields=['id', 'name']))
+        self.assertEqual(''.join(chunks), 'ID,Name\r\n{},Test\r\n'.format(self.point.pk))
+
+    def test_prefetched_queryset_by_chunks(self):
+        other = DiveFactory.create(name="Other")
+        queryset = Dive.objects.order_by('-pk').prefetch_related('themes')
+        with self.assertNumQueries(5):
+            dives = list(iter_queryset(queryset, chunk_size=1))
+            self.assertEqual(dives, [other, self.point])
+            self.assertEqual(len(dives[1].themes.all()), 2)
+
+
+class GPXSerializerTests(TestCase):
+    def setUp(self):
+        self.serializer = GPXSerializer()
+        self.serializer.gpx = gpxpy.gpx.GPX()
+
+    def test_line_transformed_at_once(self):
+        line = LineString((700000, 6600000, 100), (700100, 6600100, 200), srid=settings.SRID)
+        self.serializer.geomToGPX(line, 'line', '')
+        points = self.serializer.gpx.tracks[0].segments[0].points
+        for point, coords in zip(points, line.coords):
+            wgs84 = Point(*coords, srid=settings.SRID).transform(4326, clone=True)
+            self.assertAlmostEqual(point.longitude, wgs84.x)
+            self.assertAlmostEqual(point.latitude, wgs84.y)
+            self.assertEqual(point.elevation, coords[2])
+
+    def test_collection_of_points(self):
+        points = MultiPoint(Point(700000, 6600000), Point(700100, 6600100), srid=settings.SRID)
+        self.serializer.geomToGPX(points, 'points', '')
+        waypoints = self.serializer.gpx.waypoints
+        self.assertEqual([waypoint.name for waypoint in waypoints], ['points (0)', 'points (1)'])
+        wgs84 = Point(700100, 6600100, srid=settings.SRID).transform(4326, clone=True)
+        self.assertAlmostEqual(waypoints[1].longitude, wgs84.x)
+        self.assertAlmostEqual(waypoints[1].latitude, wgs84.y)
+        self.assertIsNone(waypoints[1].elevation)
@@ -1,3 +1,4 @@
+import gzip
 import json
 import os
 import shutil
@@ -16,6 +17,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.template.exceptions import TemplateDoesNotExist
 
 from mapentity.factories import UserFactory
+from mapentity.helpers import precompute_layers
 
 from mapentity.registry import app_settings
 from mapentity.views import serve_attachment, Convert, JSSettings, MapEntityList, map_screenshot
@@ -399,6 +401,71 @@ class MapEntityLayerViewTest(BaseTest):
         response = self.client.get(TouristicEvent.get_layer_url() + '?name=toto')
         self.assertEqual(len(json.loads(response.content.decode())['features']), 1)
 
+    def test_geojson_layer_is_compressed(self):
+        self.login()
+        response = self.client.get(TouristicEvent.get_layer_url(), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content).decode())['features']), 31)
+
+    def test_geojson_layer_not_modified(self):
+        self.login()
+        response = self.client.get(TouristicEvent.get_layer_url())
+        etag = response['ETag']
+        response = self.client.get(TouristicEvent.get_layer_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        TouristicEventFactory.create()
+        response = self.client.get(TouristicEvent.get_layer_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_geojson_layer_precomputed(self):
+        self.assertEqual(precompute_layers(models=[TouristicEvent], languages=[settings.LANGUAGE_CODE]), 1)
+        self.assertEqual(precompute_layers(models=[TouristicEvent], languages=[settings.LANGUAGE_CODE]), 0)
+        self.login()
+        with mock.patch('djgeojson.views.GeoJSONLayerView.render_to_response', side_effect=AssertionError):
+            response = self.client.get(TouristicEvent.get_layer_url())
+        self.assertEqual(len(json.loads(response.content.decode())['features']), 31)
+
+
+class MapEntityTileViewTest(BaseTest):
+    def setUp(self):
+        TouristicEventFactory.create_batch(3)
+        TouristicEventFactory.create(name='toto')
+
+        self.login()
+        self.user.is_superuser = True
+        self.user.save()
+        self.logout()
+
+    def test_tile_requires_permission(self):
+        response = self.client.get(TouristicEvent.get_tile_url(0, 0, 0))
+        self.assertEqual(response.status_code, 302)
+
+    def test_tile_contains_layer_features(self):
+        self.login()
+        response = self.client.get(TouristicEvent.get_tile_url(0, 0, 0))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertIn(b'touristicevent', response.content)
+        self.assertIn(b'toto', response.content)
+
+    def test_tile_can_be_filtered(self):
+        self.login()
+        response = self.client.get(TouristicEvent.get_tile_url(0, 0, 0) + '?name=toto')
+        self.assertIn(b'toto', response.content)
+        response = self.client.get(TouristicEvent.get_tile_url(0, 0, 0) + '?name=tata')
+        self.assertNotIn(b'toto', response.content)
+
+    def test_tile_outside_features_is_empty(self):
+        self.login()
+        response = self.client.get(TouristicEvent.get_tile_url(10, 0, 0))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+
+    def test_tile_out_of_range(self):
+        self.login()
+        response = self.client.get(TouristicEvent.get_tile_url(1, 2, 0))
+        self.assertEqual(response.status_code, 404)
+
 
 class DetailViewTest(BaseTest):
     def setUp(self):
@@ -1,6 +1,14 @@
 import logging
+import math
 
+from django.conf import settings
 from django.contrib.gis.db.models.functions import Transform
+from django.contrib.gis.geos import Polygon
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection
+from django.db.models import F
+from django.http import Http404, HttpResponse
+from django.utils.translation import get_language
 from django.views.generic.list import ListView
 
 from djgeojson.views import GeoJSONLayerView
@@ -15,9 +23,16 @@ from .. import serializers as mapentity_serializers
 from .base import BaseListView
 from .mixins import FilterListMixin, ModelViewMixin, JSONResponseMixin
 
+if 'modeltranslation' in settings.INSTALLED_APPS:
+    from modeltranslation.translator import translator, NotRegistered
+    from modeltranslation.utils import build_localized_fieldname
+
 
 logger = logging.getLogger(__name__)
 
+# Half of the Web Mercator (EPSG:3857) world width, in meters
+WEB_MERCATOR_HALF_SIZE = math.pi * 6378137
+
 
 class MapEntityLayer(FilterListMixin, ModelViewMixin, GeoJSONLayerView):
     """
@@ -27,6 +42,10 @@ class MapEntityLayer(FilterListMixin, ModelViewMixin, GeoJSONLayerView):
     force2d = True
     srid = API_SRID
     precision = app_settings.get('GEOJSON_PRECISION')
+    # GET parameters of the layer variants that are cached (see ``precompute_layers``)
+    cache_variants = [{}]
+    # Database expressions of properties which are not model fields (see ``MapEntityTile``)
+    tile_properties = {}
 
     def __init__(self, *args, **kwargs):
         super(MapEntityLayer, self).__init__(*args, **kwargs)
@@ -51,6 +70,149 @@ class MapEntityLayer(FilterListMixin, ModelViewMixin, GeoJSONLayerView):
     def render_to_response(self, context, **response_kwargs):
         return super(MapEntityLayer, self).render_to_response(context, **response_kwargs)
 
+    def view_cache_key(self):
+        """Used by the ``view_cache_response_content`` decorator.
+        """
+        view_model = self.get_model()
+        language = self.request.LANGUAGE_CODE
+        latest_saved = view_model.latest_updated()
+        geojson_lookup = None
+        if latest_saved:
+            geojson_lookup = '%s_%s_%s_json_layer' % (
+                language,
+                view_model._meta.model_name,
+                latest_saved.strftime('%y%m%d%H%M%S%f')
+            )
+        return geojson_lookup
+
+    def render_layer(self):
+        """
+        Returns the layer content, rendered without cache.
+        """
+        self.object_list = self.get_queryset()
+        context = self.get_context_data()
+        return super(MapEntityLayer, self).render_to_response(context).content
+
+
+class HttpMVTResponse(HttpResponse):
+    def __init__(self, content=b'', **kwargs):
+        kwargs['content_type'] = kwargs.get('content_type', 'application/vnd.mapbox-vector-tile')
+        super(HttpMVTResponse, self).__init__(content, **kwargs)
+
+
+class MapEntityTile(MapEntityLayer):
+    """
+    Serve the layer as Mapbox Vector Tiles, encoded by PostGIS.
+
+    Queryset, properties and cache variants are the ones of the model layer view.
+    Properties are computed in database: model fields are read as is, others have
+    to be declared as expressions in the layer ``tile_properties``, or are left out.
+    """
+    response_class = HttpMVTResponse
+    tile_extent = 4096
+    tile_buffer = 64
+
+    @classmethod
+    def get_entity_kind(cls):
+        return mapentity_models.ENTITY_TILE
+
+    def view_cache_key(self):
+        """Used by the ``view_cache_response_content`` decorator.
+        """
+        layer_lookup = super(MapEntityTile, self).view_cache_key()
+        if not layer_lookup:
+            return None
+        return '%s_tile_%s_%s_%s' % (layer_lookup, self.kwargs['z'], self.kwargs['x'], self.kwargs['y'])
+
+    def get_tile_bounds(self):
+        """
+        Returns the tile extent in Web Mercator.
+        """
+        z, x, y = int(self.kwargs['z']), int(self.kwargs['x']), int(self.kwargs['y'])
+        if x >= 2 ** z or y >= 2 ** z:
+            raise Http404
+        size = 2 * WEB_MERCATOR_HALF_SIZE / 2 ** z
+        xmin = -WEB_MERCATOR_HALF_SIZE + x * size
+        ymax = WEB_MERCATOR_HALF_SIZE - y * size
+        return xmin, ymax - size, xmin + size, ymax
+
+    def get_tile_properties(self):
+        """
+        Returns the database expressions of tile properties, by name.
+        """
+        model = self.get_model()
+        translated = []
+        if 'modeltranslation' in settings.INSTALLED_APPS:
+            try:
+                translated = translator.get_options_for_model(model).fields.keys()
+            except NotRegistered:
+                pass
+        expressions = {}
+        for name, attr in self.properties.items():
+            if name in self.tile_properties:
+                expressions[name] = self.tile_properties[name]
+                continue
+            if attr == 'pk':
+                expressions[name] = F('pk')
+                continue
+            try:
+                field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                field = None
+            if field is None or not field.concrete or field.many_to_many:
+                logger.debug("Property %s of %s is not a field, it is left out of tiles", attr, model)
+                continue
+            if attr in translated:
+                attr = build_localized_fieldname(attr, get_language())
+            expressions[name] = F(attr)
+        return expressions
+
+    @view_cache_response_content()
+    def render_to_response(self, context, **response_kwargs):
+        return self.response_class(self.render_layer(), **response_kwargs)
+
+    def render_layer(self):
+        """
+        Returns the tile content, rendered without cache.
+        """
+        geom_field = app_settings['GEOM_FIELD_NAME']
+        queryset = self.get_queryset()
+        srid = queryset.model._meta.get_field(geom_field).srid
+        bounds = self.get_tile_bounds()
+
+        # Objects lookup using spatial index, in the SRID of model
+        margin = (bounds[2] - bounds[0]) * self.tile_buffer / self.tile_extent
+        envelope = Polygon.from_bbox((bounds[0] - margin, bounds[1] - margin,
+                                      bounds[2] + margin, bounds[3] + margin))
+        envelope.srid = 3857
+        envelope.transform(srid)
+        queryset = queryset.filter(**{'%s__bboverlaps' % geom_field: envelope})
+
+        properties = self.get_tile_properties()
+        queryset = queryset.annotate(**{'tile_%s' % name: expression
+                                        for name, expression in properties.items()})
+        queryset = queryset.values(geom_field, *['tile_%s' % name for name in properties])
+        queryset_sql, queryset_params = queryset.query.sql_with_params()
+
+        qn = connection.ops.quote_name
+        columns = ''.join(['q.%s AS %s, ' % (qn('tile_%s' % name), qn(name)) for name in properties])
+        sql = """
+            WITH q AS ({queryset}),
+            features AS (
+                SELECT {columns}ST_AsMVTGeom(ST_Transform(q.{geom}::geometry, 3857),
+                                             ST_MakeEnvelope(%s, %s, %s, %s, 3857),
+                                             %s, %s, true) AS tile_geom
+                FROM q
+            )
+            SELECT ST_AsMVT(features, %s, %s, 'tile_geom') FROM features WHERE tile_geom IS NOT NULL
+        """.format(queryset=queryset_sql, columns=columns, geom=qn(geom_field))
+        params = list(queryset_params) + list(bounds) + [self.tile_extent, self.tile_buffer,
+                                                         self.get_model()._meta.model_name, self.tile_extent]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            content = cursor.fetchone()[0]
+        return bytes(content or b'')
+
 
 class MapEntityJsonList(JSONResponseMixin, BaseListView, ListView):
     """
@@ -4,7 +4,7 @@ import logging
 from datetime import datetime
 
 from django.conf import settings
-from django.http import HttpResponse, HttpResponseBadRequest
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.utils.translation import gettext_lazy as _
 from django.utils.decorators import method_decorator
 from django.utils.encoding import force_str
@@ -129,25 +129,24 @@ class MapEntityFormat(BaseListView, ListView):
 
     def csv_view(self, request, context, **kwargs):
         serializer = mapentity_serializers.CSVSerializer()
-        response = HttpResponse(content_type='text/csv')
-        serializer.serialize(queryset=self.get_queryset(), stream=response,
-                             model=self.get_model(), fields=self.columns, ensure_ascii=True)
-        return response
+        return StreamingHttpResponse(
+            serializer.iter_serialize(queryset=self.get_queryset(), model=self.get_model(),
+                                      fields=self.columns, ensure_ascii=True),
+            content_type='text/csv')
 
     def shape_view(self, request, context, **kwargs):
         serializer = mapentity_serializers.ZipShapeSerializer()
-        response = HttpResponse(content_type='application/zip')
-        serializer.serialize(queryset=self.get_queryset(), model=self.get_model(),
-                             stream=response, fields=self.columns)
-        response['Content-length'] = str(len(response.content))
-        return response
+        return StreamingHttpResponse(
+            serializer.iter_serialize(queryset=self.get_queryset(), model=self.get_model(),
+                                      fields=self.columns),
+            content_type='application/zip')
 
     def gpx_view(self, request, context, **kwargs):
         serializer = mapentity_serializers.GPXSerializer()
-        response = HttpResponse(content_type='application/gpx+xml')
-        serializer.serialize(self.get_queryset(), model=self.get_model(), stream=response,
-                             gpx_field=app_settings['GPX_FIELD_NAME'])
-        return response
+        return StreamingHttpResponse(
+            serializer.iter_serialize(self.get_queryset(), model=self.get_model(),
+                                      gpx_field=app_settings['GPX_FIELD_NAME']),
+            content_type='application/gpx+xml')
 
 
 class MapEntityMapImage(ModelViewMixin, DetailView):